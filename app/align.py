@@ -0,0 +1,146 @@
+# app/align.py
+import logging
+import cv2
+import numpy as np
+from app.config_watch import register_hook, affected_sensors
+
+LOG = logging.getLogger("reader")
+
+
+def fingerprint(gray: np.ndarray) -> np.ndarray:
+    """256-bit difference hash (16x16). Zmena číslic ho skoro nezmení, posun kamery o pár px áno."""
+    tiny = cv2.resize(gray, (17, 16), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return (tiny[:, 1:] > tiny[:, :-1]).ravel()
+
+
+def _hamming(a: np.ndarray, b: np.ndarray) -> int:
+    return int(np.count_nonzero(a != b))
+
+
+class _Ref:
+    __slots__ = ("shape", "small", "window", "scale", "patch", "patch_xy")
+
+
+class Aligner:
+    """
+    Kompenzácia posunu kamery pre roi_display.
+
+    Pri prvom akceptovanom OCR (ROI sedí) si senzor uloží referenciu:
+    zmenšený šedý snímok + výrez okolia ROI v plnom rozlíšení. Ďalej
+    sa posun odhadne fázovou koreláciou – hrubo na zmenšenom snímku,
+    presne na okolí ROI – a výrez sa posunie. Výsledok sa drží pre
+    odtlačok snímku (dHash) a prepočíta sa len keď sa odtlačok zmení.
+    Zmena roi_display v configu referenciu zahodí (nové ROI = nový základ)
+    a <sid>.roi_offset v State (st, nastaví main) vráti na [0, 0].
+    """
+
+    def __init__(self, width: int = 320, margin: int = 24, max_shift: float = 0.15,
+                 min_response: float = 0.08, hash_tolerance: int = 4):
+        self.width = width                  # šírka zmenšeného snímku pre hrubý odhad
+        self.margin = margin                # okraj okolo ROI pre presný odhad (px)
+        self.max_shift = max_shift          # väčší posun (časť šírky/výšky) = nedôveryhodný
+        self.min_response = min_response    # minimálna ostrosť korelačného vrcholu
+        self.hash_tolerance = hash_tolerance
+        self._refs = {}
+        self._cache = {}                    # sid -> (fingerprint, (dx, dy))
+        self.stats = {"computed": 0, "cached": 0, "rejected": 0}
+        self.st = None                      # State pre <sid>.roi_offset
+        register_hook(self._on_config)
+
+    def _on_config(self, diff: dict):
+        for sid in affected_sensors(diff):
+            self.reset(sid)
+
+    def reset(self, sid: str):
+        self._refs.pop(sid, None)
+        self._cache.pop(sid, None)
+        # starý posun už neplatí – roi_web by ho inak mohol použiť druhýkrát
+        if self.st is not None and self.st.get(f"{sid}.roi_offset", [0, 0]) != [0, 0]:
+            self.st[f"{sid}.roi_offset"] = [0, 0]
+
+    def has_reference(self, sid: str) -> bool:
+        return sid in self._refs
+
+    def _small(self, gray: np.ndarray):
+        h, w = gray.shape[:2]
+        scale = min(1.0, self.width / float(w))
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.float32), scale
+
+    def _patch_box(self, roi, shape):
+        x, y, w, h = roi
+        m = self.margin
+        x0, y0 = max(0, x - m), max(0, y - m)
+        x1, y1 = min(shape[1], x + w + m), min(shape[0], y + h + m)
+        return x0, y0, x1, y1
+
+    def confirm(self, sid: str, img: np.ndarray, roi):
+        """Ulož referenciu, ak ju senzor ešte nemá (volá sa po akceptovanom OCR pri nulovom posune)."""
+        if sid in self._refs:
+            return
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        ref = _Ref()
+        ref.shape = gray.shape[:2]
+        ref.small, ref.scale = self._small(gray)
+        ref.window = cv2.createHanningWindow(ref.small.shape[::-1], cv2.CV_32F)
+        x0, y0, x1, y1 = self._patch_box(roi, gray.shape)
+        ref.patch = gray[y0:y1, x0:x1].astype(np.float32)
+        ref.patch_xy = (x0, y0)
+        self._refs[sid] = ref
+        self._cache[sid] = (fingerprint(gray), (0, 0))
+        LOG.info("[%s] ROI alignment reference captured", sid, extra={"sid": sid})
+
+    def offset(self, sid: str, img: np.ndarray):
+        """Posun (dx, dy) v px voči referencii; (0, 0) bez referencie alebo pri neistote."""
+        ref = self._refs.get(sid)
+        if ref is None:
+            return 0, 0
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        if gray.shape[:2] != ref.shape:
+            LOG.warning("[%s] frame size changed → ROI alignment reset", sid, extra={"sid": sid})
+            self.reset(sid)
+            return 0, 0
+
+        fp = fingerprint(gray)
+        cached = self._cache.get(sid)
+        if cached is not None and _hamming(cached[0], fp) <= self.hash_tolerance:
+            self.stats["cached"] += 1
+            return cached[1]
+
+        self.stats["computed"] += 1
+        prev = cached[1] if cached is not None else (0, 0)
+        small, _ = self._small(gray)
+        (sx, sy), resp = cv2.phaseCorrelate(ref.small, small, ref.window)
+        dx, dy = sx / ref.scale, sy / ref.scale
+        if resp < self.min_response or abs(dx) > self.max_shift * ref.shape[1] \
+                or abs(dy) > self.max_shift * ref.shape[0]:
+            self.stats["rejected"] += 1
+            LOG.debug("[%s] ROI alignment rejected: shift (%.1f, %.1f) response %.2f", sid, dx, dy, resp,
+                      extra={"sid": sid})
+            self._cache[sid] = (fp, prev)
+            return prev
+
+        # presný odhad na okolí ROI (posunutom o hrubý odhad)
+        x0, y0 = ref.patch_xy
+        ph, pw = ref.patch.shape
+        cx, cy = x0 + int(round(dx)), y0 + int(round(dy))
+        if 0 <= cx and 0 <= cy and cx + pw <= gray.shape[1] and cy + ph <= gray.shape[0]:
+            cur = gray[cy:cy + ph, cx:cx + pw].astype(np.float32)
+            (rx, ry), fine_resp = cv2.phaseCorrelate(ref.patch, cur)
+            if fine_resp >= self.min_response:
+                dx, dy = round(dx) + rx, round(dy) + ry
+
+        off = (int(round(dx)), int(round(dy)))
+        self._cache[sid] = (fp, off)
+        if off != prev:
+            LOG.info("[%s] ROI drift: offset (%d, %d) px (response %.2f)", sid, off[0], off[1], resp,
+                     extra={"sid": sid})
+        return off
+
+
+def shift_roi(roi, dx: int, dy: int, shape):
+    """Posunie (x, y, w, h) a udrží ho v snímku."""
+    x, y, w, h = roi
+    x = min(max(0, x + dx), max(0, shape[1] - w))
+    y = min(max(0, y + dy), max(0, shape[0] - h))
+    return x, y, w, h
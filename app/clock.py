@@ -0,0 +1,80 @@
+# app/clock.py
+"""
+Zásuvné hodiny pre reader. Všetka logika, ktorá závisí od času (pulzy,
+publish interval, plánovanie OCR, HDO tarifa, EMA), ide cez now() /
+datetime_now() namiesto time.time() / datetime.now(), takže replay môže
+bežať na virtuálnom čase tak rýchlo, ako stíha CPU.
+
+Trvanie (rozpočet cyklu) meria monotonic() – na systémových hodinách
+time.monotonic(), aby ho neposunul NTP krok; na virtuálnych ten istý čas
+ako now(), takže replay je deterministický.
+
+Skutočný hardvér (streamy kamier, sledovanie súboru) ostáva na reálnom čase.
+"""
+import datetime, time
+
+
+class SystemClock:
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, s: float):
+        if s > 0:
+            time.sleep(s)
+
+
+class VirtualClock:
+    """Čas sa posúva len cez set()/advance()/sleep()."""
+
+    def __init__(self, start: float = 0.0):
+        self.t = float(start)
+
+    def time(self) -> float:
+        return self.t
+
+    def monotonic(self) -> float:
+        return self.t
+
+    def set(self, t: float):
+        if t < self.t:
+            raise ValueError("virtual clock cannot go backwards")
+        self.t = float(t)
+
+    def advance(self, dt: float):
+        self.set(self.t + dt)
+
+    def sleep(self, s: float):
+        if s > 0:
+            self.t += s
+
+
+_clock = SystemClock()
+
+
+def set_clock(clock):
+    global _clock
+    _clock = clock
+    return clock
+
+
+def get_clock():
+    return _clock
+
+
+def now() -> float:
+    return _clock.time()
+
+
+def monotonic() -> float:
+    return _clock.monotonic()
+
+
+def datetime_now(tz=None) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(_clock.time(), tz=tz)
+
+
+def sleep(s: float):
+    _clock.sleep(s)
@@ -1,11 +1,142 @@
 # app/config.py
 import yaml
 
+# podporované zdroje snímkov (pozri app/frames.py)
+SOURCE_KINDS = ("snapshot", "mjpeg", "rtsp", "capture")
+# pole s adresou zdroja podľa druhu (stačí jedno z nich)
+SOURCE_FIELDS = {
+    "snapshot": ("snapshot_url",),
+    "mjpeg": ("stream_url",),
+    "rtsp": ("stream_url",),
+    "capture": ("stream_url", "device"),   # device = index kamery pre VideoCapture
+}
+
+# varianty predspracovania OCR (názvy z app/ocr_paddle.VARIANTS)
+OCR_VARIANTS = ("color", "gray", "bin", "pre")
+
 def load_config(path: str):
     with open(path, "r") as f:
         cfg = yaml.safe_load(f)
-    if "global" not in cfg:
+    if cfg is None:
+        cfg = {}
+    if not isinstance(cfg, dict):
+        raise ValueError("config root must be a mapping")
+    if "global" not in cfg or cfg["global"] is None:
         cfg["global"] = {}
     if "sensors" not in cfg or not isinstance(cfg["sensors"], list):
         cfg["sensors"] = []
     return cfg
+
+def validate_config(cfg: dict):
+    """
+    Základná kontrola štruktúry pred nasadením nového configu.
+    Pri chybe hodí ValueError – volajúci si nechá starý config.
+    """
+    if not isinstance(cfg.get("global"), dict):
+        raise ValueError("'global' must be a mapping")
+    mode = cfg["global"].get("mqtt_mode", "legacy")
+    if mode not in ("legacy", "json"):
+        raise ValueError(f"global.mqtt_mode must be 'legacy' or 'json', got {mode!r}")
+    for key in ("cycle_budget_s", "overload_stretch", "shard_heartbeat_s", "shard_lease_s"):
+        if key in cfg["global"]:
+            try:
+                ok = float(cfg["global"][key]) > 0
+            except (TypeError, ValueError):
+                ok = False
+            if not ok:
+                raise ValueError(f"global.{key} must be a positive number")
+    variant = cfg["global"].get("fusion_variant", "gray")
+    if variant not in OCR_VARIANTS:
+        raise ValueError(f"global.fusion_variant must be one of {', '.join(OCR_VARIANTS)}, got {variant!r}")
+    hb = float(cfg["global"].get("shard_heartbeat_s", 5))
+    if float(cfg["global"].get("shard_lease_s", 3 * hb)) <= hb:
+        raise ValueError("global.shard_lease_s must be longer than shard_heartbeat_s")
+    seen = set()
+    for i, s in enumerate(cfg["sensors"]):
+        if not isinstance(s, dict):
+            raise ValueError(f"sensors[{i}] must be a mapping")
+        for key in ("id", "mqtt_topic_base"):
+            if not s.get(key):
+                raise ValueError(f"sensors[{i}] missing '{key}'")
+        sid = s["id"]
+        if sid in seen:
+            raise ValueError(f"duplicate sensor id '{sid}'")
+        seen.add(sid)
+        kind = s.get("source", "snapshot")
+        if kind not in SOURCE_KINDS:
+            raise ValueError(f"[{sid}] unknown source '{kind}' (use one of {', '.join(SOURCE_KINDS)})")
+        fields = SOURCE_FIELDS[kind]
+        if all(s.get(f) in (None, "") for f in fields):
+            raise ValueError(f"[{sid}] source '{kind}' requires {' or '.join(fields)}")
+        if "device" in s:
+            try:
+                ok = int(s["device"]) >= 0
+            except (TypeError, ValueError):
+                ok = False
+            if not ok:
+                raise ValueError(f"[{sid}] device must be a camera index (integer >= 0)")
+        quad = s.get("roi_quad")
+        if quad is not None:
+            try:
+                ok = len(quad) == 4 and all(len(p) == 2 for p in quad)
+                [float(v) for p in quad for v in p]
+            except (TypeError, ValueError):
+                ok = False
+            if not ok:
+                raise ValueError(f"[{sid}] roi_quad must be four [x, y] points")
+            size = s.get("roi_quad_size")
+            if size is not None:
+                try:
+                    ok = len(size) == 2 and all(int(v) > 0 for v in size)
+                except (TypeError, ValueError):
+                    ok = False
+                if not ok:
+                    raise ValueError(f"[{sid}] roi_quad_size must be [w, h]")
+        if "ocr_priority" in s:
+            try:
+                int(s["ocr_priority"])
+            except (TypeError, ValueError):
+                raise ValueError(f"[{sid}] ocr_priority must be an integer")
+        roi = s.get("roi_display")
+        if roi is not None:
+            if not isinstance(roi, (list, tuple)) or len(roi) != 4:
+                raise ValueError(f"[{sid}] roi_display must be [x, y, w, h]")
+            try:
+                [int(v) for v in roi]
+            except (TypeError, ValueError):
+                raise ValueError(f"[{sid}] roi_display must contain integers")
+    return cfg
+
+def diff_config(old: dict, new: dict) -> dict:
+    """
+    Štrukturálny rozdiel dvoch configov.
+    Vracia:
+        {
+          "global":  set kľúčov v global, ktoré sa zmenili,
+          "added":   set sensor id, ktoré pribudli,
+          "removed": set sensor id, ktoré zmizli,
+          "changed": {sensor id: set zmenených kľúčov},
+        }
+    """
+    og, ng = old.get("global", {}), new.get("global", {})
+    g_changed = {k for k in set(og) | set(ng) if og.get(k) != ng.get(k)}
+
+    old_s = {s["id"]: s for s in old.get("sensors", [])}
+    new_s = {s["id"]: s for s in new.get("sensors", [])}
+
+    changed = {}
+    for sid in set(old_s) & set(new_s):
+        o, n = old_s[sid], new_s[sid]
+        keys = {k for k in set(o) | set(n) if o.get(k) != n.get(k)}
+        if keys:
+            changed[sid] = keys
+
+    return {
+        "global": g_changed,
+        "added": set(new_s) - set(old_s),
+        "removed": set(old_s) - set(new_s),
+        "changed": changed,
+    }
+
+def diff_is_empty(diff: dict) -> bool:
+    return not (diff["global"] or diff["added"] or diff["removed"] or diff["changed"])
@@ -0,0 +1,160 @@
+# app/config_watch.py
+import os, time, logging
+from app.config import load_config, validate_config, diff_config, diff_is_empty
+
+try:
+    # Linux inotify (voliteľné); bez neho ideme cez polling mtime
+    from inotify_simple import INotify, flags as iflags
+except ImportError:
+    INotify = None
+
+LOG = logging.getLogger("reader")
+
+# moduly s per-sensor cache sa sem registrujú; volá sa fn(diff) po úspešnom reloade
+_hooks = []
+
+def register_hook(fn):
+    _hooks.append(fn)
+    return fn
+
+def affected_sensors(diff: dict) -> set:
+    """Sensor id, ktorým treba zahodiť cache (zmenené + odstránené)."""
+    return set(diff["changed"]) | set(diff["removed"])
+
+
+class ConfigWatcher:
+    """
+    Sleduje sensors.yaml (inotify, fallback polling) a vracia nový config
+    až keď sa súbor "upokojí" (debounce) – roi_web.save_cfg zapisuje priamo
+    do súboru, takže môžeme vidieť aj polovičný zápis.
+    Nevalidný config sa zaloguje a ostáva bežať starý.
+    """
+
+    def __init__(self, path: str, debounce_s: float = 0.5, poll_s: float = 1.0):
+        self.path = path
+        self.debounce_s = debounce_s
+        self.poll_s = poll_s
+
+        self._sig = self._stat()
+        self._last_poll = 0.0
+        self._pending_since = None   # čas prvej zmeny v dávke
+        self._last_event = 0.0       # čas poslednej zmeny v dávke
+
+        # diagnostika
+        self.reloads = 0
+        self.last_latency_s = None
+        self.last_error = None
+
+        self._inotify = None
+        if INotify is not None:
+            try:
+                self._inotify = INotify()
+                mask = (iflags.CLOSE_WRITE | iflags.MODIFY | iflags.MOVED_TO
+                        | iflags.CREATE | iflags.DELETE)
+                # sledujeme adresár, aby sme prežili aj atomický replace (nový inode)
+                self._inotify.add_watch(os.path.dirname(self.path) or ".", mask)
+                LOG.info("config watch: inotify on %s", self.path)
+            except OSError as e:
+                LOG.warning("config watch: inotify unavailable (%s) → polling", e)
+                self._inotify = None
+        if self._inotify is None:
+            LOG.info("config watch: polling %s every %.1fs", self.path, self.poll_s)
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._inotify is not None else "poll"
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except FileNotFoundError:
+            return None
+
+    def _mark(self, now: float):
+        if self._pending_since is None:
+            self._pending_since = now
+        self._last_event = now
+
+    def _collect_events(self, now: float):
+        if self._inotify is not None:
+            name = os.path.basename(self.path)
+            for ev in self._inotify.read(timeout=0):
+                if ev.name == name:
+                    self._sig = self._stat()
+                    self._mark(now)
+            return
+        if now - self._last_poll < self.poll_s:
+            return
+        self._last_poll = now
+        sig = self._stat()
+        if sig != self._sig:
+            self._sig = sig
+            self._mark(now)
+
+    def poll(self, cfg: dict, now: float = None):
+        """
+        Neblokujúca kontrola. Vracia (new_cfg, diff) ak sa config zmenil
+        a je platný, inak None. Nezmenené senzory si v new_cfg ponechajú
+        pôvodné dict objekty, takže cache kľúčované cez id ostávajú platné.
+        """
+        now = now or time.time()
+        self._collect_events(now)
+
+        if self._pending_since is None or now - self._last_event < self.debounce_s:
+            return None
+
+        # súbor sa ešte mení? počkaj ďalší debounce
+        sig = self._stat()
+        if sig is None:
+            LOG.warning("config file missing: %s", self.path)
+            self._pending_since = None
+            return None
+        if self._inotify is not None and sig != self._sig:
+            self._sig = sig
+            self._last_event = now
+            return None
+
+        started = self._pending_since
+        self._pending_since = None
+        try:
+            new_cfg = validate_config(load_config(self.path))
+        except Exception as e:
+            self.last_error = f"{e.__class__.__name__}: {e}"
+            LOG.error("config reload rejected (keeping previous): %s", self.last_error)
+            return None
+        self.last_error = None
+
+        diff = diff_config(cfg, new_cfg)
+        if diff_is_empty(diff):
+            LOG.debug("config touched but unchanged")
+            return None
+
+        # zachovaj identitu nezmenených senzorov
+        old_by_id = {s["id"]: s for s in cfg.get("sensors", [])}
+        dirty = affected_sensors(diff) | diff["added"]
+        new_cfg["sensors"] = [
+            s if s["id"] in dirty else old_by_id[s["id"]]
+            for s in new_cfg["sensors"]
+        ]
+
+        for fn in _hooks:
+            try:
+                fn(diff)
+            except Exception as e:
+                LOG.warning("config hook %s failed: %s", getattr(fn, "__name__", fn), e)
+
+        self.reloads += 1
+        self.last_latency_s = time.time() - started
+        LOG.info(
+            "config reloaded in %.0f ms (global=%s added=%s removed=%s changed=%s)",
+            self.last_latency_s * 1000.0,
+            sorted(diff["global"]), sorted(diff["added"]),
+            sorted(diff["removed"]), sorted(diff["changed"]),
+        )
+        return new_cfg, diff
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
@@ -1,10 +1,15 @@
 # app/ema_setup.py
+import os
+import logging
 import requests
-import time
+from app import clock
 from collections import deque
 
+LOG = logging.getLogger("ema")
+
+
 class EmaSetup:
-    URL = "http://192.168.30.150:8080/config"
+    URL = os.getenv("EMA_URL", "http://192.168.30.150:8080/config")
 
     # vzorkovanie
     TIMER = 0.9
@@ -47,7 +52,7 @@ class EmaSetup:
         self.is_running = False
 
     def _push_sample(self, value, now=None):
-        now = now or time.time()
+        now = now or clock.now()
         self.window.append((now, value))
         cutoff = now - self.WINDOW_SECONDS
         while self.window and self.window[0][0] < cutoff:
@@ -85,7 +90,7 @@ class EmaSetup:
             # print(f"[POST] {payload} -> {r.status_code}")
             self.last_post_time = now
         except requests.RequestException as e:
-            print(f"[POST ERROR] {e}")
+            LOG.warning("threshold POST failed: %s", e)
 
     def _compute_thresholds(self):
         if len(self.window) < self.MIN_SAMPLES:
@@ -137,10 +142,10 @@ class EmaSetup:
 
     def tick(self):
         # pevná perioda cez obyčajný čas – stačí, keď voláš tick často
-        if (time.time() - self.last_ema_time) <= self.TIMER:
+        if (clock.now() - self.last_ema_time) <= self.TIMER:
             return
 
-        now = time.time()
+        now = clock.now()
         try:
             response = requests.get(self.URL, timeout=self.SAMPLE_TIMEOUT)
             if response.status_code == 200:
@@ -168,10 +173,10 @@ class EmaSetup:
                 # print(f"{time.strftime('%H:%M:%S')} ema_R={ema_R} thr_off={self.threshold_off} thr_on={self.threshold_on} state={self.state}")
 
         except requests.Timeout:
-            print("HTTP timeout")
+            LOG.warning("EMA sample: HTTP timeout")
         except requests.RequestException as e:
-            print(f"HTTP error: {e}")
+            LOG.warning("EMA sample: HTTP error: %s", e)
         except ValueError as e:
-            print(f"JSON error: {e}")
+            LOG.warning("EMA sample: JSON error: %s", e)
         finally:
             self.last_ema_time = now
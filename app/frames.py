@@ -0,0 +1,291 @@
+# app/frames.py
+import abc, time, threading, logging
+import numpy as np, cv2, requests
+from app.utils import fetch_bgr
+from app.profiling import stage
+
+LOG = logging.getLogger("reader")
+
+
+class FrameCache:
+    """
+    Snímky kamier pre jeden cyklus OCR, kľúčované cez zdroj (URL).
+    Viac senzorov na tej istej kamere = jeden HTTP fetch + jeden decode;
+    každý si z neho len vyreže svoje ROI. Po cykle (with-blok) sa
+    snímky zahodia, nič sa nedrží medzi cyklami.
+    """
+
+    # kumulatívne počty za celý beh
+    total_fetches = 0
+    total_saved = 0
+
+    def __init__(self, fetch=fetch_bgr):
+        self._fetch = fetch
+        self._frames = {}     # kľúč -> img alebo výnimka
+        self.fetches = 0
+        self.hits = 0
+        self.peak_bytes = 0
+
+    def get(self, key: str, fetch=None):
+        """fetch: voliteľná funkcia bez argumentov (napr. FrameSource.read)."""
+        hit = self._frames.get(key)
+        if hit is not None:
+            self.hits += 1
+            FrameCache.total_saved += 1
+            if isinstance(hit, Exception):
+                raise hit          # kamera zlyhala už raz v tomto cykle
+            return hit
+        self.fetches += 1
+        FrameCache.total_fetches += 1
+        try:
+            img = fetch() if fetch is not None else self._fetch(key)
+            if img is None:
+                raise ValueError(f"cannot decode image from {key}")
+        except Exception as e:
+            self._frames[key] = e
+            raise
+        self._frames[key] = img
+        self.peak_bytes = max(self.peak_bytes, self.held_bytes())
+        return img
+
+    def held_bytes(self) -> int:
+        return sum(v.nbytes for v in self._frames.values() if hasattr(v, "nbytes"))
+
+    def clear(self):
+        self._frames.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.hits:
+            LOG.debug("frames: %d fetch(es), %d saved, %.1f MB held (total saved %d)",
+                      self.fetches, self.hits, self.peak_bytes / 1e6, FrameCache.total_saved)
+        self.clear()
+        return False
+
+
+# --- zdroje snímkov ---
+
+class SnapshotSource:
+    """Pôvodné správanie: jeden HTTP GET + decode na každé čítanie."""
+    kind = "snapshot"
+
+    def __init__(self, url: str):
+        self.url = url
+        self.key = f"{self.kind}:{url}"
+
+    def read(self):
+        return fetch_bgr(self.url)
+
+    def close(self):
+        pass
+
+
+class _StreamSource(abc.ABC):
+    """
+    Spoločný základ pre trvalé streamy: grabber vlákno drží len posledný
+    snímok, pri výpadku sa znovu pripája s exponenciálnym backoffom.
+    read() vráti posledný snímok, ak nie je starší než max_age_s.
+    """
+    kind = "stream"
+    BACKOFF_MIN_S = 1.0
+    BACKOFF_MAX_S = 30.0
+
+    def __init__(self, url: str, max_age_s: float = 5.0):
+        self.url = url
+        self.key = f"{self.kind}:{url}"
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._latest = None        # surové dáta posledného snímku
+        self._latest_t = 0.0
+        self._decoded = None       # (seq, img) – dekóduje sa len pri čítaní
+        self._seq = 0
+        self._stop = threading.Event()
+        self.frames_in = 0
+        self.reconnects = 0
+        self._thread = threading.Thread(target=self._run, name=f"grab-{url}", daemon=True)
+        self._thread.start()
+
+    def _set_latest(self, raw):
+        with self._lock:
+            self._latest = raw
+            self._latest_t = time.time()
+            self._seq += 1
+        self.frames_in += 1
+
+    def _decode(self, raw):
+        return raw
+
+    @abc.abstractmethod
+    def _grab(self):
+        """Jedno spojenie: čítaj snímky do _set_latest, kým nepríde _stop alebo chyba."""
+
+    def _run(self):
+        backoff = self.BACKOFF_MIN_S
+        while not self._stop.is_set():
+            t0 = time.time()
+            try:
+                self._grab()
+            except Exception as e:
+                LOG.warning("stream %s: %s: %s", self.url, e.__class__.__name__, e,
+                            extra={"key": ("stream.error", self.key)})
+            if self._stop.is_set():
+                break
+            # spojenie, ktoré chvíľu bežalo, resetuje backoff
+            if time.time() - t0 > self.BACKOFF_MAX_S:
+                backoff = self.BACKOFF_MIN_S
+            self.reconnects += 1
+            LOG.info("stream %s: reconnect in %.0fs", self.url, backoff,
+                     extra={"key": ("stream.reconnect", self.key)})
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, self.BACKOFF_MAX_S)
+
+    def read(self):
+        with self._lock:
+            raw, t, seq = self._latest, self._latest_t, self._seq
+        if raw is None or time.time() - t > self.max_age_s:
+            raise TimeoutError(f"no fresh frame from {self.url}")
+        dec = self._decoded
+        if dec is not None and dec[0] == seq:
+            return dec[1]
+        img = self._decode(raw)
+        self._decoded = (seq, img)
+        return img
+
+    def close(self):
+        self._stop.set()
+
+
+class MjpegSource(_StreamSource):
+    """HTTP multipart/x-mixed-replace (MJPEG); JPEG sa dekóduje až pri read()."""
+    kind = "mjpeg"
+    CHUNK = 64 * 1024
+    MAX_BUF = 8 * 1024 * 1024
+
+    def _decode(self, raw: bytes):
+        with stage("decode"):
+            return cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+
+    def _grab(self):
+        with requests.get(self.url, stream=True, timeout=(5, 10)) as r:
+            r.raise_for_status()
+            LOG.info("stream %s: connected (mjpeg)", self.url)
+            buf = b""
+            for chunk in r.iter_content(self.CHUNK):
+                if self._stop.is_set():
+                    return
+                buf += chunk
+                # hranice snímkov podľa JPEG SOI/EOI – nezávislé od boundary hlavičiek
+                last = None
+                while True:
+                    a = buf.find(b"\xff\xd8")
+                    if a < 0:
+                        buf = b""
+                        break
+                    b = buf.find(b"\xff\xd9", a + 2)
+                    if b < 0:
+                        buf = buf[a:]
+                        break
+                    last = buf[a:b + 2]
+                    buf = buf[b + 2:]
+                if last is not None:
+                    self._set_latest(last)   # staršie snímky z dávky zahodíme
+                if len(buf) > self.MAX_BUF:
+                    buf = b""
+
+
+class CaptureSource(_StreamSource):
+    """OpenCV VideoCapture (RTSP, HTTP stream, súbor…); drží posledný snímok."""
+    kind = "capture"
+
+    def _grab(self):
+        cap = cv2.VideoCapture(self.url)
+        try:
+            if not cap.isOpened():
+                raise ConnectionError("VideoCapture open failed")
+            try:
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            except Exception:
+                pass
+            LOG.info("stream %s: connected (capture)", self.url)
+            while not self._stop.is_set():
+                ok, img = cap.read()
+                if not ok:
+                    raise ConnectionError("VideoCapture read failed")
+                self._set_latest(img)
+        finally:
+            cap.release()
+
+
+SOURCE_KINDS = {
+    "snapshot": SnapshotSource,
+    "mjpeg": MjpegSource,
+    "rtsp": CaptureSource,
+    "capture": CaptureSource,
+}
+
+_sources = {}
+
+
+def source_spec(s: dict):
+    """(druh, url) pre senzor: snapshot_url, stream_url, pri capture aj device (index kamery)."""
+    kind = s.get("source", "snapshot")
+    if kind not in SOURCE_KINDS:
+        raise ValueError(f"unknown source '{kind}'")
+    if kind == "snapshot":
+        return kind, s["snapshot_url"]
+    url = s.get("stream_url")
+    if url in (None, "") and kind == "capture" and s.get("device") is not None:
+        url = int(s["device"])
+    if url in (None, ""):
+        raise KeyError("stream_url")
+    return kind, url
+
+
+def source_for(s: dict):
+    """Zdieľaný zdroj pre senzor (viac senzorov na jednej kamere = jeden stream)."""
+    kind, url = source_spec(s)
+    src = _sources.get((kind, url))
+    if src is None:
+        src = SOURCE_KINDS[kind](url)
+        _sources[(kind, url)] = src
+    return src
+
+
+def grab_once(s: dict, timeout_s: float = 5.0):
+    """
+    Jeden snímok bez trvalého zdroja (roi_web): otvorí vlastný stream, počká
+    najviac timeout_s na prvý snímok a zavrie ho – nekonkuruje readeru o kameru.
+    """
+    kind, url = source_spec(s)
+    src = SOURCE_KINDS[kind](url)
+    try:
+        deadline = time.monotonic() + timeout_s
+        while True:
+            try:
+                return src.read()
+            except TimeoutError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+    finally:
+        src.close()
+
+
+def register_source(s: dict, src):
+    """Vnúti vlastný zdroj pre senzor (replay, testy) – musí mať key/read/close."""
+    _sources[source_spec(s)] = src
+
+
+def prune_sources(cfg: dict):
+    """Zavrie streamy, ktoré po reloade configu už žiadny senzor nepoužíva."""
+    used = set()
+    for s in cfg.get("sensors", []):
+        try:
+            used.add(source_spec(s))
+        except (KeyError, ValueError):
+            pass
+    for spec in [k for k in _sources if k not in used]:
+        LOG.info("closing frame source %s:%s", *spec)
+        _sources.pop(spec).close()
@@ -0,0 +1,72 @@
+# app/fusion.py
+import math
+from collections import deque, defaultdict
+
+
+class DigitVoter:
+    """
+    Časová fúzia OCR: drží posledných N čítaní (po znakoch s konfidenciou
+    z rekognizéra) a hlasuje po pozíciách. Hodnotu vydá, až keď je stabilná:
+    na každej pozícii vyhráva ten istý znak v aspoň `min_agree` snímkoch
+    a s váhovým podielom >= `min_share`.
+
+    Čítania sa delia podľa registra (t1/t2), lebo displej sa medzi nimi
+    prepína – inak by sa hlasy miešali.
+    """
+
+    MIN_WEIGHT = 0.05   # aj neistý znak má malý hlas
+
+    def __init__(self, frames: int = 5, min_agree: int = None, min_share: float = 0.6):
+        self.frames = max(1, int(frames))
+        self.min_agree = int(min_agree) if min_agree else math.ceil(self.frames / 2)
+        self.min_share = float(min_share)
+        self._hist = defaultdict(lambda: deque(maxlen=self.frames))
+
+    @staticmethod
+    def params(cfg: dict):
+        """(frames, min_agree, min_share) z global configu; None ak je fúzia vypnutá."""
+        g = cfg.get("global", {})
+        n = int(g.get("fusion_frames", 0))
+        if n <= 0:
+            return None
+        return (n, g.get("fusion_min_agree"), float(g.get("fusion_min_share", 0.6)))
+
+    def reset(self, sid: str):
+        for key in [k for k in self._hist if k[0] == sid]:
+            del self._hist[key]
+
+    def push(self, sid: str, bucket: str, chars):
+        """chars = [(číslica, konf.), ...] s pevnou dĺžkou (TARGET_LEN)."""
+        if chars:
+            self._hist[(sid, bucket)].append(tuple(chars))
+
+    def vote(self, sid: str, bucket: str):
+        """Vráti (digits, conf) ak je výsledok stabilný, inak None."""
+        hist = self._hist.get((sid, bucket))
+        if not hist or len(hist) < self.min_agree:
+            return None
+        length = max(len(h) for h in hist)
+        digits, confs = [], []
+        for pos in range(length):
+            weight = defaultdict(float)
+            count = defaultdict(int)
+            best_conf = defaultdict(float)
+            for h in hist:
+                if len(h) != length:
+                    continue
+                ch, c = h[pos]
+                weight[ch] += max(c, self.MIN_WEIGHT)
+                count[ch] += 1
+                best_conf[ch] = max(best_conf[ch], c)
+            if not weight:
+                return None
+            ch = max(weight, key=weight.get)
+            share = weight[ch] / sum(weight.values())
+            if count[ch] < self.min_agree or share < self.min_share:
+                return None
+            digits.append(ch)
+            # konfidencia rekognizéra znížená nezhodou; domyslené nuly (konf. 0) sa
+            # do priemeru nerátajú – ako pri čítaní bez fúzie
+            if best_conf[ch] > 0:
+                confs.append(best_conf[ch] * share)
+        return "".join(digits), sum(confs) / len(confs) if confs else 0.0
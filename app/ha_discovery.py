@@ -0,0 +1,103 @@
+# app/ha_discovery.py
+import json, logging
+from app.startup import STATUS_TOPIC
+
+LOG = logging.getLogger("reader")
+
+# pole -> (názov, jednotka, device_class, state_class, entity_category)
+FIELDS = {
+    "t1":       ("T1", "kWh", "energy", "total_increasing", None),
+    "t2":       ("T2", "kWh", "energy", "total_increasing", None),
+    "total":    ("Total", "kWh", "energy", "total_increasing", None),
+    "ocr_conf": ("OCR confidence", None, None, "measurement", "diagnostic"),
+}
+
+
+def mqtt_mode(cfg: dict) -> str:
+    """global.mqtt_mode: legacy (téma na hodnotu) alebo json (<base>/state)."""
+    return cfg.get("global", {}).get("mqtt_mode", "legacy")
+
+
+def enabled(cfg: dict) -> bool:
+    g = cfg.get("global", {})
+    return bool(g.get("ha_discovery", mqtt_mode(cfg) == "json"))
+
+
+def sensor_configs(cfg: dict, s: dict):
+    """(téma, payload) discovery configov jedného senzora podľa mqtt_mode."""
+    g = cfg.get("global", {})
+    prefix = g.get("ha_discovery_prefix", "homeassistant")
+    json_mode = mqtt_mode(cfg) == "json"
+    sid, base = s["id"], s["mqtt_topic_base"]
+    device = {"identifiers": [f"vision_reader_{sid}"], "name": s.get("name", sid),
+              "manufacturer": "vision-reader", "model": "OCR + pulse meter reader"}
+    for field, (name, unit, dev_class, state_class, category) in FIELDS.items():
+        uid = f"vision_reader_{sid}_{field}"
+        c = {
+            "name": name,
+            "unique_id": uid,
+            "object_id": f"{sid}_{field}",
+            "state_topic": f"{base}/state" if json_mode else f"{base}/{field}",
+            "availability": [{"topic": f"{STATUS_TOPIC}/status",
+                              "value_template": "{{ 'offline' if value_json.state == 'offline' else 'online' }}"}],
+            "device": device,
+        }
+        if json_mode:
+            c["value_template"] = f"{{{{ value_json.{field} }}}}"
+        if unit:
+            c["unit_of_measurement"] = unit
+        if dev_class:
+            c["device_class"] = dev_class
+        if state_class:
+            c["state_class"] = state_class
+        if category:
+            c["entity_category"] = category
+        yield f"{prefix}/sensor/{uid}", json.dumps(c, sort_keys=True)
+
+
+def retained_topics(cfg: dict) -> set:
+    """Retained témy senzorov, ktoré reader pri tomto configu publikuje (clean_mqtt.py --sync)."""
+    from app.shard import SHARD_TOPIC
+    keys = ("state",) if mqtt_mode(cfg) == "json" else ("t1", "t2", "total")
+    out = set()
+    for s in cfg["sensors"]:
+        out.update(f"{s['mqtt_topic_base']}/{k}" for k in keys)
+        out.add(f"{SHARD_TOPIC}/state/{s['id']}")
+        if enabled(cfg):
+            out.update(f"{topic}/config" for topic, _ in sensor_configs(cfg, s))
+    return out
+
+
+class Discovery:
+    """
+    Retained Home Assistant discovery configy. Publikujú sa raz – znova len
+    po novom pripojení k brokeru alebo pri zmene senzorov/režimu; odobratým
+    senzorom sa config zmaže prázdnym retained payloadom.
+    """
+
+    def __init__(self):
+        self._sent = {}          # téma -> payload
+        self._connects = -1
+
+    def publish(self, mqtt, cfg: dict):
+        connects = getattr(mqtt, "connects", 0)
+        want = {}
+        if enabled(cfg):
+            for s in cfg["sensors"]:
+                want.update(sensor_configs(cfg, s))
+        if want == self._sent and connects == self._connects:
+            return
+        if not getattr(mqtt, "connected", True):
+            return               # po pripojení (connects++) sa pošle celé
+        fresh = connects != self._connects
+        n = 0
+        for topic, payload in want.items():
+            if fresh or self._sent.get(topic) != payload:
+                mqtt.pub(topic, "config", payload, retain=True)
+                n += 1
+        for topic in self._sent.keys() - want.keys():
+            mqtt.pub(topic, "config", "", retain=True)
+            n += 1
+        self._sent, self._connects = want, connects
+        if n:
+            LOG.info("HA discovery: %d config(s) published", n)
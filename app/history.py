@@ -0,0 +1,211 @@
+# app/history.py
+"""
+Lokálna história spotreby (SQLite, WAL).
+
+- samples: surové udalosti (prírastky pulzov, akceptované OCR kotvy),
+  držia sa len HISTORY_RAW_DAYS,
+- rollup:  súčty T1/T2 per hodina / deň / mesiac (lokálny čas CEZ),
+  aktualizované inkrementálne pri každom flush(); hodinové sa držia
+  HISTORY_HOURLY_DAYS, denné a mesačné navždy (pár KB ročne).
+
+Energia je v celých mWh (1 kWh = 1 000 000 mWh); zvyšok delenia
+pulzov/imp sa prenáša, takže súčty sú presné. Dotazy na rozsah idú
+len cez rollup (mesiace + dni + hodiny), nikdy cez surové vzorky.
+
+Reader zapisuje (jedna transakcia za cyklus), roi_web len číta.
+"""
+import os, sqlite3, threading, logging
+from datetime import datetime, timedelta
+from app import clock
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    from backports.zoneinfo import ZoneInfo
+
+LOG = logging.getLogger("reader")
+
+HISTORY_PATH = os.getenv("HISTORY_PATH", "/app/state/history.db")
+RAW_DAYS = float(os.getenv("HISTORY_RAW_DAYS", "35"))
+HOURLY_DAYS = float(os.getenv("HISTORY_HOURLY_DAYS", "800"))
+TZ = ZoneInfo(os.getenv("HISTORY_TZ", "Europe/Prague"))
+
+PERIODS = ("hour", "day", "month")
+MWH_PER_KWH = 1_000_000
+PRUNE_EVERY_S = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    t     REAL    NOT NULL,
+    sid   TEXT    NOT NULL,
+    kind  TEXT    NOT NULL,      -- 'pulse' (value = pulzy) | 'ocr' (value = kWh)
+    reg   TEXT    NOT NULL,
+    value INTEGER NOT NULL,
+    mwh   INTEGER NOT NULL       -- energia pripísaná touto udalosťou
+);
+CREATE INDEX IF NOT EXISTS samples_t ON samples (t);
+CREATE TABLE IF NOT EXISTS rollup (
+    sid    TEXT    NOT NULL,
+    period TEXT    NOT NULL,
+    start  INTEGER NOT NULL,     -- začiatok obdobia (unix, lokálny čas TZ)
+    t1_mwh INTEGER NOT NULL DEFAULT 0,
+    t2_mwh INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sid, period, start)
+) WITHOUT ROWID;
+"""
+
+
+# --- hranice období v lokálnom čase ---
+def period_start(t: float, period: str, tz=TZ) -> int:
+    d = datetime.fromtimestamp(t, tz)
+    if period == "hour":
+        d = d.replace(minute=0, second=0, microsecond=0)
+    elif period == "day":
+        d = d.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif period == "month":
+        d = d.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    else:
+        raise ValueError(f"unknown period '{period}' (use one of {', '.join(PERIODS)})")
+    return int(d.timestamp())
+
+
+def period_next(start: int, period: str, tz=TZ) -> int:
+    if period == "hour":
+        return start + 3600
+    d = datetime.fromtimestamp(start, tz)
+    if period == "day":
+        d = datetime(d.year, d.month, d.day, tzinfo=tz) + timedelta(days=1)
+    else:
+        d = datetime(d.year + d.month // 12, d.month % 12 + 1, 1, tzinfo=tz)
+    return int(d.timestamp())
+
+
+class History:
+    def __init__(self, path: str = HISTORY_PATH, tz=TZ):
+        self.path = path
+        self.tz = tz
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+        self._samples = []     # neuložené surové udalosti
+        self._roll = {}        # (sid, period, start) -> [t1_mwh, t2_mwh]
+        self._rem = {}         # (sid, reg) -> zvyšok pulzy*1e6 % imp
+        self._hour = (None, None, None)   # (hour_start, hour_end, {period: start}) cache
+        self._pruned_t = 0.0
+
+    # --- zápis (reader) ---
+    def _starts(self, t: float) -> dict:
+        h0, h1, starts = self._hour
+        if h0 is None or not (h0 <= t < h1):
+            starts = {p: period_start(t, p, self.tz) for p in PERIODS}
+            h0 = starts["hour"]
+            self._hour = (h0, h0 + 3600, starts)
+        return starts
+
+    def _credit(self, sid: str, reg: str, pulses: int, imp: int, t: float) -> int:
+        num = pulses * MWH_PER_KWH + self._rem.get((sid, reg), 0)
+        mwh, self._rem[(sid, reg)] = divmod(num, imp)
+        if mwh:
+            i = 0 if reg == "t1" else 1
+            for period, start in self._starts(t).items():
+                acc = self._roll.setdefault((sid, period, start), [0, 0])
+                acc[i] += mwh
+        return mwh
+
+    def add_pulses(self, sid: str, reg: str, pulses: int, imp: int, t: float = None):
+        """Prírastok registra z pulzov (v pulzoch)."""
+        if pulses <= 0:
+            return
+        t = clock.now() if t is None else t
+        mwh = self._credit(sid, reg, pulses, imp, t)
+        self._samples.append((t, sid, "pulse", reg, pulses, mwh))
+
+    def add_anchor(self, sid: str, reg: str, kwh: int, gained_pulses: int, imp: int, t: float = None):
+        """Akceptované OCR; gained_pulses = o koľko kotva posunula register (zmeškané pulzy)."""
+        t = clock.now() if t is None else t
+        mwh = self._credit(sid, reg, max(0, gained_pulses), imp, t)
+        self._samples.append((t, sid, "ocr", reg, int(kwh), mwh))
+
+    def flush(self) -> int:
+        """Jedna transakcia: surové udalosti + inkrementy rollupov. Vracia počet udalostí."""
+        if not self._samples and not self._roll:
+            return 0
+        samples, self._samples = self._samples, []
+        roll, self._roll = self._roll, {}
+        with self._lock, self._db:
+            self._db.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?)", samples)
+            self._db.executemany(
+                "INSERT INTO rollup (sid, period, start, t1_mwh, t2_mwh) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (sid, period, start) DO UPDATE SET "
+                "t1_mwh = t1_mwh + excluded.t1_mwh, t2_mwh = t2_mwh + excluded.t2_mwh",
+                [(sid, p, start, a, b) for (sid, p, start), (a, b) in roll.items()])
+        now = samples[-1][0] if samples else clock.now()
+        if now - self._pruned_t >= PRUNE_EVERY_S:
+            self._pruned_t = now
+            self.prune(now)
+        return len(samples)
+
+    def prune(self, now: float = None):
+        now = clock.now() if now is None else now
+        with self._lock, self._db:
+            raw = self._db.execute("DELETE FROM samples WHERE t < ?", (now - RAW_DAYS * 86400,)).rowcount
+            hourly = self._db.execute("DELETE FROM rollup WHERE period = 'hour' AND start < ?",
+                                      (now - HOURLY_DAYS * 86400,)).rowcount
+        if raw or hourly:
+            LOG.info("history: pruned %d raw samples, %d hourly rows", raw, hourly)
+
+    # --- dotazy (roi_web) ---
+    def series(self, sid: str, period: str, start: float, end: float) -> list:
+        """Riadky rollupu [start, end): [{start, t1, t2, total}] v kWh."""
+        if period not in PERIODS:
+            raise ValueError(f"unknown period '{period}' (use one of {', '.join(PERIODS)})")
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT start, t1_mwh, t2_mwh FROM rollup "
+                "WHERE sid = ? AND period = ? AND start >= ? AND start < ? ORDER BY start",
+                (sid, period, int(start), int(end))).fetchall()
+        return [{"start": s, "t1": a / MWH_PER_KWH, "t2": b / MWH_PER_KWH,
+                 "total": (a + b) / MWH_PER_KWH} for s, a, b in rows]
+
+    def cover(self, start: float, end: float) -> list:
+        """Rozklad [start, end) (zarovnané na celé hodiny) na čo najmenej období."""
+        cur = period_start(start, "hour", self.tz)
+        if cur < start:
+            cur += 3600
+        end = period_start(end, "hour", self.tz)
+        out = []
+        while cur < end:
+            for period in ("month", "day", "hour"):
+                nxt = period_next(cur, period, self.tz)
+                if period_start(cur, period, self.tz) == cur and nxt <= end:
+                    out.append((period, cur))
+                    cur = nxt
+                    break
+        return out
+
+    def total(self, sid: str, start: float, end: float) -> dict:
+        """Spotreba T1/T2 v kWh za [start, end) – len z rollupov."""
+        parts = self.cover(start, end)
+        a = b = 0
+        with self._lock:
+            for period in PERIODS:
+                starts = [s for p, s in parts if p == period]
+                if not starts:
+                    continue
+                marks = ",".join("?" * len(starts))
+                r = self._db.execute(
+                    f"SELECT COALESCE(SUM(t1_mwh), 0), COALESCE(SUM(t2_mwh), 0) FROM rollup "
+                    f"WHERE sid = ? AND period = ? AND start IN ({marks})",
+                    (sid, period, *starts)).fetchone()
+                a += r[0]
+                b += r[1]
+        return {"t1": a / MWH_PER_KWH, "t2": b / MWH_PER_KWH, "total": (a + b) / MWH_PER_KWH,
+                "periods": len(parts)}
+
+    def close(self):
+        self.flush()
+        self._db.close()
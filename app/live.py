@@ -0,0 +1,57 @@
+# app/live.py
+import os, json, socket, logging
+from app import clock
+
+LOG = logging.getLogger("reader")
+
+LIVE_SOCKET = os.getenv("LIVE_SOCKET", "/app/state/live.sock")
+
+
+class LivePublisher:
+    """
+    Posiela zmeny stavu (t1/t2/ocr_raw/ocr_conf/bucket/timings) cez Unix
+    datagram socket do roi_web. Zmeny sa počas cyklu zbierajú per senzor
+    a odošlú sa jedným datagramom na senzor vo flush().
+    Nikdy neblokuje – ak nikto nepočúva, správa sa zahodí.
+    """
+
+    def __init__(self, path: str = LIVE_SOCKET):
+        self.path = path
+        self._pending = {}   # sid -> {field: value}
+        self.sent = 0
+        self.dropped = 0
+        self._sock = None
+        try:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sock.setblocking(False)
+        except OSError as e:
+            LOG.warning("live: unix socket unavailable: %s", e)
+
+    def on_state(self, changes: dict):
+        # kľúče v state.json sú ploché "sid.pole"
+        for key, value in changes.items():
+            sid, _, field = key.rpartition(".")
+            if sid:
+                self._pending.setdefault(sid, {})[field] = value
+
+    def push(self, sid: str, **fields):
+        self._pending.setdefault(sid, {}).update(fields)
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        if self._sock is None:
+            return
+        now = clock.now()
+        for sid, fields in pending.items():
+            msg = json.dumps({"sid": sid, "t": now, "fields": fields}).encode("utf-8")
+            try:
+                self._sock.sendto(msg, self.path)
+                self.sent += 1
+            except (FileNotFoundError, ConnectionRefusedError, BlockingIOError, OSError):
+                # roi_web nebeží alebo má plný buffer – stav je aj tak na disku
+                self.dropped += 1
+
+
+LIVE = LivePublisher()
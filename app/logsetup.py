@@ -0,0 +1,168 @@
+# app/logsetup.py
+"""
+Neblokujúce logovanie pre hlavnú slučku readera.
+
+Záznamy idú cez ohraničenú frontu (QueueHandler) do vlákna, ktoré
+píše na stdout (a pri APP_DEBUG aj variantový log do /app/debug/log.txt).
+Plná fronta = záznam sa zahodí a zaráta, slučka nikdy nečaká na disk
+ani na stdout.
+
+Rate limit per kľúč správy (logger + šablóna + sid, alebo extra={"key": ...};
+extra={"ratelimit": False} ho vypne). Správy o konkrétnom senzore preto
+nesú extra={"sid": sid} – inak by jeden chybový senzor vyčerpal spoločný
+bucket a skryl rovnakú chybu ostatných:
+token bucket LOG_RATE_BURST správ na LOG_RATE_WINDOW_S. Prvá správa
+po potlačených nesie pole suppressed=N, súhrn ide do logu raz za
+LOG_STATS_EVERY_S.
+
+Štruktúrované polia cez extra={"sid": ..., "reg": ...} sa pripoja za
+správu ako key=value (LOG_FORMAT=json → jeden JSON objekt na riadok).
+"""
+import os, sys, json, time, queue, atexit, logging, threading
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_RATE_BURST = float(os.getenv("LOG_RATE_BURST", "5"))
+LOG_RATE_WINDOW_S = float(os.getenv("LOG_RATE_WINDOW_S", "60"))
+LOG_STATS_EVERY_S = float(os.getenv("LOG_STATS_EVERY_S", "600"))
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# atribúty LogRecord, ktoré nie sú štruktúrované polia
+_STD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "key", "ratelimit", "taskName"}
+
+STATS = {"suppressed": 0, "dropped": 0}
+LOG = logging.getLogger("reader")
+
+
+def fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _STD}
+
+
+class RateLimit(logging.Filter):
+    """Token bucket per kľúč správy; beží vo vlákne volajúceho (lacné)."""
+
+    def __init__(self, burst: float = LOG_RATE_BURST, window_s: float = LOG_RATE_WINDOW_S):
+        super().__init__()
+        self.burst = burst
+        self.rate = burst / window_s if window_s > 0 else float("inf")
+        self._buckets = {}             # kľúč -> [tokeny, posledný čas, potlačené]
+        self._lock = threading.Lock()
+        self._stats_t = time.monotonic()
+        self._stats_last = dict(STATS)
+
+    @staticmethod
+    def key(record: logging.LogRecord):
+        k = getattr(record, "key", None)
+        if k is not None:
+            return k
+        return record.name, record.msg, getattr(record, "sid", None)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or getattr(record, "ratelimit", True) is False:
+            return True
+        now = time.monotonic()
+        k = self.key(record)
+        with self._lock:
+            b = self._buckets.get(k)
+            if b is None:
+                b = self._buckets[k] = [self.burst, now, 0]
+            else:
+                b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate)
+                b[1] = now
+            if b[0] < 1.0:
+                b[2] += 1
+                STATS["suppressed"] += 1
+                ok = False
+            else:
+                b[0] -= 1.0
+                if b[2]:
+                    record.suppressed = b[2]
+                    b[2] = 0
+                ok = True
+            summary = now - self._stats_t >= LOG_STATS_EVERY_S
+            if summary:
+                self._stats_t = now
+                delta = {k2: STATS[k2] - self._stats_last[k2] for k2 in STATS}
+                self._stats_last = dict(STATS)
+        if summary and any(delta.values()):
+            LOG.info("log: %d suppressed, %d dropped in the last %.0fs",
+                     delta["suppressed"], delta["dropped"], LOG_STATS_EVERY_S, extra={"key": "log.stats"})
+        return ok
+
+
+class DropQueueHandler(QueueHandler):
+    """Nikdy neblokuje: pri plnej fronte záznam zahodí a zaráta."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            STATS["dropped"] += 1
+
+
+class KVFormatter(logging.Formatter):
+    def format(self, record):
+        s = super().format(record)
+        extra = fields(record)
+        if extra:
+            s += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        return s
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        d = {"t": round(record.created, 3), "level": record.levelname, "logger": record.name,
+             "msg": record.getMessage()}
+        d.update(fields(record))
+        return json.dumps(d, default=str)
+
+
+_listener = None
+
+
+def setup_logging(level=logging.INFO, debug_log: str = None):
+    """
+    Root logger → DropQueueHandler(+RateLimit) → vlákno → stdout.
+    debug_log: súbor pre logger "ocr.variants" (varianty OCR pri APP_DEBUG).
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    if LOG_FORMAT == "json":
+        fmt = JsonFormatter()
+    else:
+        fmt = KVFormatter("%(asctime)s %(levelname)s: %(message)s")
+    out = logging.StreamHandler(sys.stdout)
+    out.setFormatter(fmt)
+    out.addFilter(lambda r: r.name != "ocr.variants")
+    handlers = [out]
+    if debug_log:
+        try:
+            os.makedirs(os.path.dirname(debug_log), exist_ok=True)
+            fh = logging.FileHandler(debug_log)
+            fh.setFormatter(KVFormatter("%(asctime)s %(message)s"))
+            fh.addFilter(logging.Filter("ocr.variants"))
+            handlers.append(fh)
+        except OSError as e:
+            print(f"debug log {debug_log} unavailable: {e}", file=sys.stderr)
+
+    qh = DropQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    qh.addFilter(RateLimit())
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(qh)
+    root.setLevel(level)
+
+    _listener = QueueListener(qh.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Dopíše frontu (pri ukončení procesu)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,29 +1,61 @@
 # app/main.py
-import os, time, logging
-from app.utils import fetch_bgr, crop
-from app.ocr_paddle import ocr_digits
+import time
+_T0 = time.perf_counter()   # začiatok štartu (pred importmi)
+
+import os, sys, json, atexit, signal, logging, importlib
+from app.utils import crop
+from app.ocr_prior import ValuePrior
 from app.state import State
 from app.mqtt_pub import Mqtt
 # from app.mqtt_pub_dev import Mqtt
-from app.config import load_config
+from app.config import load_config, validate_config
+from app.config_watch import ConfigWatcher, register_hook, affected_sensors
 from app.pulse import Pulse
 from app.tariff import Tariff
 from app.ema_setup import EmaSetup
+from app.live import LIVE
+from app import clock
+from app.ocr_schedule import OcrScheduler
+from app.frames import FrameCache, source_for, prune_sources
+from app.fusion import DigitVoter
+from app.records import Records
+from app.history import History, HISTORY_PATH
+from app.startup import Deferred, Readiness
+from app.align import Aligner, shift_roi
+from app.rectify import rect_map, quad_bbox, order_quad
+from app.overload import Overload
+from app.profiling import PROFILER, stage
+from app.logsetup import setup_logging
+from app.ha_discovery import Discovery, mqtt_mode
+from app.shard import Shard, SHARD_ID
+
+IMPORT_S = time.perf_counter() - _T0
 
 DEBUG    = os.getenv("APP_DEBUG", "0") == "1"
-CFG_PATH = "/app/config/sensors.yaml"
+CFG_PATH = os.getenv("CONFIG_PATH") or "/app/config/sensors.yaml"
+STATE_PATH = os.getenv("STATE_PATH") or "/app/state/state.json"
 
-logging.basicConfig(
-    level=logging.DEBUG if DEBUG else logging.INFO,
-    format="%(asctime)s %(levelname)s: %(message)s",
-)
+# stdout cez frontu a vlákno (app.logsetup); pri APP_DEBUG aj varianty OCR do /app/debug/log.txt
+setup_logging(logging.DEBUG if DEBUG else logging.INFO,
+              debug_log="/app/debug/log.txt" if DEBUG else None)
 LOG = logging.getLogger("reader")
-MISSING = object()
-
 last_published = 0
 last_get_pulse = 0
 last_pulse_value = -1
-last_poll_time = 0
+pulse_rate_kwh_s = 0.0   # odhad spotreby z pulzov (pre plánovanie OCR)
+ocr_sched = OcrScheduler()
+aligner = Aligner()      # kompenzácia posunu kamery (global.roi_align)
+overload = Overload()    # rozpočet cyklu a odľahčenie OCR (global.cycle_budget_s)
+history = None           # app.history.History (HISTORY_PATH="" → vypnuté)
+ocr = None               # app.ocr_paddle po načítaní (load_ocr, v pozadí)
+
+def load_ocr():
+    """Import + načítanie OCR enginu (OCR_ENGINE; paddle trvá sekundy až desiatky sekúnd)."""
+    global ocr
+    mod = importlib.import_module("app.ocr_paddle")
+    mod.get_reader()
+    ocr = mod
+    return mod
 
 
 def digits_to_int(d: str) -> int:
@@ -33,6 +65,52 @@ def digits_to_int(d: str) -> int:
 def nearest_bucket(val: int, t1: int, t2: int) -> str:
     return "t1" if abs(val - t1) <= abs(val - t2) else "t2"
 
+# per-sensor cache odvodená z configu (ROI ako tuple); pri reloade sa
+# zahodia len záznamy senzorov, ktorých sa zmena týka
+_roi_cache = {}
+
+# časová fúzia čítaní (global.fusion_frames > 0); znovu vytvorená pri zmene parametrov
+_voter = None
+_voter_params = None
+
+@register_hook
+def _invalidate_roi(diff: dict):
+    for sid in affected_sensors(diff):
+        _roi_cache.pop(sid, None)
+        if _voter is not None:
+            _voter.reset(sid)
+
+def voter_of(cfg: dict):
+    global _voter, _voter_params
+    params = DigitVoter.params(cfg)
+    if params != _voter_params:
+        _voter_params = params
+        _voter = DigitVoter(*params) if params else None
+    return _voter
+
+def roi_of(s: dict):
+    """ROI ako (x, y, w, h); pri roi_quad jeho obalový obdĺžnik (pre zarovnanie)."""
+    sid = s["id"]
+    roi = _roi_cache.get(sid)
+    if roi is None:
+        if s.get("roi_quad"):
+            roi = quad_bbox(order_quad(s["roi_quad"]))
+        elif "roi_display" in s:
+            roi = tuple(map(int, s["roi_display"]))
+        else:
+            return None
+        _roi_cache[sid] = roi
+    return roi
+
+# typované per-sensor záznamy nad State (do state.json až pri flush)
+_records = None
+
+def records_of(st: "State") -> Records:
+    global _records
+    if _records is None or _records.st is not st:
+        _records = Records(st)
+    return _records
+
 def poll_from(cfg) -> float:
     """
     Env POLL_INTERVAL_S má prednosť. Ak nie je, berie sa z configu
@@ -42,10 +120,14 @@ def poll_from(cfg) -> float:
     cfg_poll = g.get("poll_interval_s", 5)
     return float(os.getenv("POLL_INTERVAL_S", str(cfg_poll)))
 
-def process_ocr(mqtt: "Mqtt", cfg: dict, st: "State"):
+def process_ocr(mqtt: "Mqtt", cfg: dict, st: "State", sensors=None, frames: FrameCache = None,
+                is_t2: bool = False):
     """
     OCR-only spracovanie. NEPOSIELA MQTT.
-    - ukladá celé kWh do st[*.t1], st[*.t2], st[*.total]
+    - sensors: podmnožina cfg["sensors"] na spracovanie (default všetky)
+    - frames: cache snímkov pre tento cyklus (jedna kamera = jeden fetch)
+    - is_t2: aktuálna tarifa (prior rozhoduje t1/t2 pri nejednoznačnosti)
+    - ukladá celé kWh do záznamu senzora (rec.t1_ocr/t2_ocr, rec.t1/t2)
     - aplikuje "brzdu" (max_step) a zabraňuje regresii
     - pripravuje metadáta pre budúce pulzy (bucket, posledné OCR)
     """
@@ -53,82 +135,155 @@ def process_ocr(mqtt: "Mqtt", cfg: dict, st: "State"):
     conf_min = float(g.get("conf_threshold", 0.60))
     upscale  = int(g.get("roi_upscale", 2))
     max_step = int(g.get("max_step_kwh", 50))  # limit skoku (kWh)
-
-    for s in cfg["sensors"]:
+    frames = frames or FrameCache()
+    voter = voter_of(cfg)
+    fusion_variant = g.get("fusion_variant", "gray")
+    use_prior = bool(g.get("ocr_prior", True))
+    prior_slack = int(g.get("ocr_prior_slack_kwh", 1))
+    align = bool(g.get("roi_align", True))
+    json_mode = mqtt_mode(cfg) == "json"
+    records = records_of(st)
+
+    for s in (cfg["sensors"] if sensors is None else sensors):
         sid  = s["id"]
         base = s["mqtt_topic_base"]   # zostáva kvôli logike inde; tu sa neposiela
-        url  = s["snapshot_url"]
 
         try:
-            LOG.debug("[%s] fetching %s", sid, url)
-            img = fetch_bgr(url)
-
-            if "roi_display" not in s:
-                LOG.warning("[%s] missing roi_display", sid)
+            src = source_for(s)
+            LOG.debug("[%s] fetching %s", sid, src.key, extra={"sid": sid})
+            t_fetch = time.perf_counter()
+            with stage("fetch"):
+                img = frames.get(src.key, src.read)
+            fetch_ms = (time.perf_counter() - t_fetch) * 1000.0
+
+            xywh = roi_of(s)
+            if xywh is None:
+                LOG.warning("[%s] missing roi_display", sid, extra={"sid": sid})
                 continue
 
-            x, y, w, h = map(int, s["roi_display"])
-            roi = crop(img, (x, y, w, h))
-
-            digits, conf = ocr_digits(roi, upscale=upscale)
-            LOG.info("[%s] OCR digits='%s' conf=%.2f", sid, digits, conf)
+            dx = dy = 0
+            if align and aligner.has_reference(sid):
+                # posun kamery voči referencii → posuň výrez; nahlás pre roi_web (uloženie do configu)
+                with stage("align"):
+                    dx, dy = aligner.offset(sid, img)
+                st[f"{sid}.roi_offset"] = [dx, dy]
+
+            with stage("crop"):
+                rmap = rect_map(s)
+                if rmap is not None:
+                    roi = rmap.apply(img, dx, dy)    # roi_quad → narovnaný výrez (jeden remap)
+                else:
+                    roi = crop(img, shift_roi(xywh, dx, dy, img.shape))
+
+            # očakávaný rozsah hodnôt z posledného OCR + pulzov
+            rec = records.of(s)
+            prior = ValuePrior.from_record(rec, is_t2, prior_slack) if use_prior else None
+            prior_bucket = None
+
+            t_ocr = time.perf_counter()
+            variant = None
+            if voter is not None:
+                # lacné jednovariantné čítanie; stabilitu dodá hlasovanie cez viac snímkov
+                r = ocr.ocr_variants(roi, upscale=upscale, names=[fusion_variant])[0]
+                digits, conf, chars = r["digits"], r["conf"], r["chars"]
+            else:
+                best = overload.variant(sid)
+                res = ocr.ocr_decode(roi, upscale=upscale, prior=prior, early_conf=conf_min,
+                                     names=[best] if best else None)
+                digits, conf, prior_bucket, variant = res["digits"], res["conf"], res["bucket"], res["variant"]
+                if res["early"]:
+                    LOG.debug("[%s] prior hit after %d variant(s) (%s)", sid, res["variants_run"], res["variant"],
+                              extra={"sid": sid})
+            ocr_ms = (time.perf_counter() - t_ocr) * 1000.0
+            LOG.info("[%s] OCR digits='%s' conf=%.2f", sid, digits, conf,
+                     extra={"sid": sid, "ocr_ms": round(ocr_ms, 1)})
+            LIVE.push(sid, timings={"fetch_ms": round(fetch_ms, 1), "ocr_ms": round(ocr_ms, 1)})
 
             # ulož surové OCR metadáta (užitočné na diagnostiku / UI)
-            st[f"{sid}.ocr_raw"]  = digits or ""
-            st[f"{sid}.ocr_conf"] = float(f"{conf:.2f}")
-            mqtt.pub(base, "ocr_raw", str(st.get(f"{sid}.ocr_raw")), retain=False)
-            mqtt.pub(base, "ocr_conf", str(st.get(f"{sid}.ocr_conf")), retain=False)
+            rec.ocr_raw  = digits or ""
+            rec.ocr_conf = float(f"{conf:.2f}")
+            if not json_mode:             # v json režime idú v <base>/state (flush_mqtt_json)
+                mqtt.pub(base, "ocr_raw", rec.ocr_raw, retain=False)
+                mqtt.pub(base, "ocr_conf", str(rec.ocr_conf), retain=False)
+
+            # stav so správnymi defaultmi (initial_* z configu)
+            last_t1 = rec.t1_ocr
+            last_t2 = rec.t2_ocr
+            LOG.debug("[%s] state before: t1=%s t2=%s", sid, last_t1, last_t2, extra={"sid": sid})
+
+            if voter is not None:
+                if not digits:
+                    continue
+                # aj neisté čítanie prispeje hlasom (s malou váhou) namiesto zahodenia
+                raw_v = digits_to_int(digits)
+                raw_bucket = nearest_bucket(raw_v, last_t1, last_t2)
+                if prior is not None:
+                    raw_bucket = prior.resolve(raw_v, raw_bucket)
+                voter.push(sid, raw_bucket, chars)
+                fused = voter.vote(sid, raw_bucket)
+                if fused is None:
+                    LOG.debug("[%s] fusion: %s not stable yet", sid, raw_bucket, extra={"sid": sid})
+                    continue
+                digits, conf = fused
+                LOG.debug("[%s] fusion: %s → '%s' conf=%.2f", sid, raw_bucket, digits, conf,
+                          extra={"sid": sid})
 
             if not digits or conf < conf_min:
-                LOG.info("[%s] conf %.2f < %.2f → skip update", sid, conf, conf_min)
+                LOG.info("[%s] conf %.2f < %.2f → skip update", sid, conf, conf_min, extra={"sid": sid})
                 # necháme predchádzajúce hodnoty bez zmeny
                 continue
 
             v = digits_to_int(digits)
-
-            # načítaj stav so správnymi defaultmi
-            last_t1 = int(st.get(f"{sid}.t1_ocr", int(s.get("initial_t1", 0))))
-            last_t2 = int(st.get(f"{sid}.t2_ocr", int(s.get("initial_t2", 0))))
-            LOG.debug("[%s] state before: t1=%s t2=%s", sid, last_t1, last_t2)
-
-            bucket = nearest_bucket(v, last_t1, last_t2)  # "t1" alebo "t2"
-            st[f"{sid}.last_bucket"] = bucket  # pomôcka do budúcna (pulzy)
+            overload.won(sid, variant)
+            if align:
+                aligner.confirm(sid, img, xywh)   # prvé isté čítanie = referencia pre zarovnanie
+
+            if voter is not None:
+                bucket = raw_bucket
+            elif prior_bucket is not None:
+                bucket = prior_bucket   # rozhodnuté priorom (rozsah + tarifa)
+            else:
+                bucket = nearest_bucket(v, last_t1, last_t2)  # "t1" alebo "t2"
+            rec.last_bucket = bucket  # pomôcka do budúcna (pulzy)
 
             def accept_update(last_val: int, new_val: int) -> bool:
                 # zakáž regresiu
                 if new_val < last_val:
-                    LOG.warning("[%s] %s regression %s→%s → ignore", sid, bucket, last_val, new_val)
+                    LOG.warning("[%s] %s regression %s→%s → ignore", sid, bucket, last_val, new_val,
+                                extra={"sid": sid})
                     return False
                 # anti-skok brzda
                 if (new_val - last_val) > max_step:
                     LOG.warning("[%s] %s jump %s→%s > %s kWh → ignore",
-                                sid, bucket, last_val, new_val, max_step)
+                                sid, bucket, last_val, new_val, max_step, extra={"sid": sid})
                     return False
                 return True
 
             updated = False
             if bucket == "t1":
                 if accept_update(last_t1, v):
-                    st[f"{sid}.t1_ocr"] = v
+                    carried = rec.pending("t1")
+                    p0 = rec.t1_p
+                    rec.anchor("t1", v)
+                    if history is not None:
+                        history.add_anchor(sid, "t1", v, rec.t1_p - p0, rec.imp)
+                    rec.ocr_t = clock.now()
                     last_t1 = v
                     updated = True
-                    LOG.info("[%s] -> t1_ocr := %s", sid, v)
-                    last_ocr_value = -1 # reset pulses
-
-                    if (v > float(st.get(f"{sid}.t1", float(s.get("initial_t1", 0))))):
-                        st[f"{sid}.t1"] = v
-                        LOG.info("[%s] -> t1 := %s", sid, v)
+                    LOG.info("[%s] -> t1_ocr := %s (%d pulses carried)", sid, v, carried,
+                             extra={"sid": sid, "reg": "t1"})
             else:
                 if accept_update(last_t2, v):
-                    st[f"{sid}.t2_ocr"] = v
+                    carried = rec.pending("t2")
+                    p0 = rec.t2_p
+                    rec.anchor("t2", v)
+                    if history is not None:
+                        history.add_anchor(sid, "t2", v, rec.t2_p - p0, rec.imp)
+                    rec.ocr_t = clock.now()
                     last_t2 = v
                     updated = True
-                    LOG.info("[%s] -> t2_ocr := %s", sid, v)
-                    last_ocr_value = -1 # reset pulses
-
-                    if (v > float(st.get(f"{sid}.t2", float(s.get("initial_t2", 0))))):
-                        st[f"{sid}.t2"] = v
-                        LOG.info("[%s] -> t2 := %s", sid, v)
+                    LOG.info("[%s] -> t2_ocr := %s (%d pulses carried)", sid, v, carried,
+                             extra={"sid": sid, "reg": "t2"})
 
             # # prepočítaj total vždy z internej pravdy (publish sa rieši vo flush-i)
             # total = last_t1 + last_t2
@@ -141,17 +296,19 @@ def process_ocr(mqtt: "Mqtt", cfg: dict, st: "State"):
             #     st[f"{sid}.last_ocr_bucket"] = bucket
 
         except Exception as e:
-            LOG.warning("[%s] iteration error: %s: %s", sid, e.__class__.__name__, e)
+            LOG.warning("[%s] iteration error: %s: %s", sid, e.__class__.__name__, e, extra={"sid": sid})
 
 
 def process_pulse(mqtt: "Mqtt", cfg: dict, st: "State", pulse: Pulse, tariff: Tariff):
     """
-    Zatiaľ no-op (žiadna nová funkcionalita). V ďalšom kroku sem doplníme čítanie /pulse
-    a interpoláciu t1_live/t2_live tak, aby to nezasahovalo do existujúcich tém.
+    Prečíta počítadlo /pulse a prírastok pripíše (celé pulzy) do registra
+    podľa aktuálnej tarify. Pulzy nad posledné OCR nezahadzuje – čakajú
+    na potvrdenie ďalšieho celého kWh (SensorRecord.anchor).
     """
 
     global last_get_pulse
     global last_pulse_value
+    global pulse_rate_kwh_s
 
     g = cfg.get("global", {})
     imp_per_kwh = int(g.get("imp_per_kwh", 1000))
@@ -159,51 +316,40 @@ def process_pulse(mqtt: "Mqtt", cfg: dict, st: "State", pulse: Pulse, tariff: Ta
     pulse_url = g.get("pulse_url", "")
 
     weight_of_pulse = 1.0 / imp_per_kwh
-    is_t1 = not tariff.is_t2()
+    reg = "t2" if tariff.is_t2() else "t1"
 
-    if(time.time() - last_get_pulse > pulse_poll_s):
+    if(clock.now() - last_get_pulse > pulse_poll_s):
         count = pulse.get_pulse_count(pulse_url)
         if(last_pulse_value == -1 or last_pulse_value > count):
             last_pulse_value = count
             return
         
         delta = count - last_pulse_value
+        now = clock.now()
+        if last_get_pulse > 0 and now > last_get_pulse:
+            pulse_rate_kwh_s = delta * weight_of_pulse / (now - last_get_pulse)
 
+        records = records_of(st)
         for s in cfg["sensors"]:
-            sid   = s["id"]
-
-            if(is_t1):
-                t1 = float(_st_get(st, f"{sid}.t1", 0))
-                t1_ocr = float(_st_get(st, f"{sid}.t1_ocr", 0))
-
-                if t1 - int(t1) >= 0.999:
-                    print(f"T1 freeze for ocr: {t1}")
-                else:
-                    t1 += delta * weight_of_pulse
-
-                    if int(t1) > int(t1_ocr):
-                        t1 = int(t1_ocr) + 0.999
-
-                    st[f"{sid}.t1"] = t1
-                    print(f"New t1: {t1}")
+            rec = records.of(s)
+            lost = rec.lost
+            p0 = getattr(rec, f"{reg}_p")
+            rec.add_pulses(reg, delta)
+            if history is not None:
+                history.add_pulses(rec.sid, reg, getattr(rec, f"{reg}_p") - p0, imp_per_kwh)
+            pending = rec.pending(reg)
+            if pending:
+                LOG.info("[%s] %s waiting for ocr: %s.999 (+%d pulses)", rec.sid, reg.upper(),
+                         getattr(rec, f"{reg}_ocr"), pending, extra={"sid": rec.sid, "reg": reg})
             else:
-                t2 = float(_st_get(st, f"{sid}.t2", 0))
-                t2_ocr = float(_st_get(st, f"{sid}.t2_ocr", 0))
-
-                if t2 - int(t2) >= 0.999:
-                    print(f"T2 freeze for ocr: {t2}")
-                else:
-                    t2 += delta * weight_of_pulse
-
-                    if int(t2) > int(t2_ocr):
-                        t2 = int(t2_ocr) + 0.999
-
-                    st[f"{sid}.t2"] = t2
-                    print(f"New t2: {t2}")
-
+                LOG.info("[%s] new %s: %s", rec.sid, reg, getattr(rec, f"{reg}_p") / imp_per_kwh,
+                         extra={"sid": rec.sid, "reg": reg, "delta": delta})
+            if rec.lost > lost:
+                LOG.warning("[%s] %s: %d pulses dropped (no OCR confirmation for > 1 kWh)",
+                            rec.sid, reg, rec.lost - lost, extra={"sid": rec.sid, "reg": reg})
 
         last_pulse_value = count
-        last_get_pulse = time.time()
+        last_get_pulse = clock.now()
     else:
         pass
 
@@ -213,76 +359,90 @@ def process_all(mqtt: Mqtt, cfg, st: State, pulse: Pulse, tariff: Tariff, poll_i
     Ponechávame názov, aby nič inde neprasklo.
     """
 
-    global last_poll_time
-
-    if(time.time() - last_poll_time > poll_interval):
-        process_ocr(mqtt, cfg, st)
-        last_poll_time = time.time()
-
-    process_pulse(mqtt, cfg, st, pulse, tariff)    
+    records_of(st).set_imp(int(cfg.get("global", {}).get("imp_per_kwh", 1000)))
+    overload.begin(cfg)
+
+    # pulzy a publish majú prednosť – pomalé OCR ich neposunie
+    with stage("pulse"):
+        process_pulse(mqtt, cfg, st, pulse, tariff)
+
+    # OCR len pre senzory, pri ktorých pulzy predpovedajú zmenu displeja
+    # (kým sa OCR engine načítava, bežia len pulzy a publish)
+    is_t2 = tariff.is_t2()
+    due = ocr_sched.due(cfg, records_of(st), poll_interval, is_t2, pulse_rate_kwh_s,
+                        stretch=overload.stretch())
+    if due and ocr is not None:
+        done = []
+        with FrameCache() as frames:
+            for s in overload.order(due, ocr_sched.hot):
+                if not overload.admit(s["id"]):
+                    continue              # nestihne sa → ostáva "due" pre ďalší cyklus
+                t = clock.monotonic()
+                with stage("ocr.sensor"):
+                    process_ocr(mqtt, cfg, st, [s], frames, is_t2)
+                overload.ran(s["id"], clock.monotonic() - t)
+                done.append(s["id"])
+                with stage("pulse"):
+                    process_pulse(mqtt, cfg, st, pulse, tariff)   # medzi senzormi obslúž pulzy
+        ocr_sched.mark(done, is_t2)
 
     process_data(cfg, st)
 
-    flush_mqtt(mqtt, cfg, st)
+    with stage("mqtt.publish"):
+        flush_mqtt(mqtt, cfg, st)
+    overload.end()
+
+    # záznamy senzorov → State, potom jeden merge-zápis state.json za cyklus
+    with stage("state.flush"):
+        records_of(st).sync()
+        st.flush()
+    if history is not None:
+        with stage("history.flush"):
+            history.flush()
 
+    # zmeny stavu z tohto cyklu → roi_web (SSE)
+    with stage("live.flush"):
+        LIVE.flush()
 
-# Helper: bezpečné načítanie s defaultom
-def _st_get(st, key, default):
-    return st.get(key, default)
 
 def process_data(cfg: dict, st: "State"):
+    # kWh z pulzov, zastropené posledným OCR (displej je pravda pre celé kWh)
+    records = records_of(st)
     for s in cfg["sensors"]:
-        sid   = s["id"]
-        t1_ocr = int(_st_get(st, f"{sid}.t1_ocr", 0))
-        t2_ocr = int(_st_get(st, f"{sid}.t2_ocr", 0))
-        t1 = float(_st_get(st, f"{sid}.t1", 0))
-        t2 = float(_st_get(st, f"{sid}.t2", 0))
-
-        def fix_with_ocr(ocr: int, t: float) -> float:
-            if(int(t) <= ocr):
-                return t
-            else:
-                print(f"Fixing with ocr: {ocr} => t: {t}")
-                return float(ocr)
-
-        t1 = fix_with_ocr(t1_ocr, t1)
-        t2 = fix_with_ocr(t2_ocr, t2)
-
-        st[f"{sid}.t1"] = t1
-        st[f"{sid}.t2"] = t2
+        records.of(s).settle()
 
 # Publikačný flush: posiela len ak T1/T2 narástli
 def flush_mqtt(mqtt: "Mqtt", cfg: dict, st: "State"):
     """
-    Číta vypočítané hodnoty (st[*.t1], st[*.t2]) a porovná ich s publikovanými
-    (st[*.t1_pub], st[*.t2_pub]). Pošle len nárasty. Total pošle iba ak sa
+    Číta vypočítané hodnoty (rec.t1, rec.t2) a porovná ich s publikovanými
+    (rec.t1_pub, rec.t2_pub). Pošle len nárasty. Total pošle iba ak sa
     publikovalo T1 alebo T2. Témy a retain ostávajú ako doteraz.
     """
 
     global last_published
     g = cfg["global"]
+    if mqtt_mode(cfg) == "json":
+        return flush_mqtt_json(mqtt, cfg, st)
     publish_interval = g.get("publish_interval")
+    records = records_of(st)
 
     for s in cfg["sensors"]:
-        sid   = s["id"]
         base  = s["mqtt_topic_base"]
+        rec   = records.of(s)
 
         # aktuálne vypočítané celé kWh (OCR drží pravdu / pulzy nič nemenia celé kWh)
-        t1_cur = float(_st_get(st, f"{sid}.t1", int(s.get("initial_t1", 0))))
-        t2_cur = float(_st_get(st, f"{sid}.t2", int(s.get("initial_t2", 0))))
-
+        t1_cur = rec.t1
+        t2_cur = rec.t2
 
-        # bezpečná init publikovaných hodnôt pri prvom behu (bez st._data)
-        k1 = f"{sid}.t1_pub"
-        k2 = f"{sid}.t2_pub"
-        if st.get(k1, MISSING) is MISSING:
-            st[k1] = t1_cur
-        if st.get(k2, MISSING) is MISSING:
-            st[k2] = t2_cur
+        # init publikovaných hodnôt pri prvom behu
+        if rec.t1_pub is None:
+            rec.t1_pub = t1_cur
+        if rec.t2_pub is None:
+            rec.t2_pub = t2_cur
 
         # už publikované hodnoty (monotónne)
-        t1_pub = float(_st_get(st, k1, 0))
-        t2_pub = float(_st_get(st, k2, 0))
+        t1_pub = rec.t1_pub
+        t2_pub = rec.t2_pub
 
         t1_cur = round(t1_cur, 4)
         t2_cur = round(t2_cur, 4)
@@ -292,12 +452,12 @@ def flush_mqtt(mqtt: "Mqtt", cfg: dict, st: "State"):
         # T1: publikuj len ak narástlo
         if t1_cur > t1_pub:
             mqtt.pub(base, "t1", str(t1_cur), retain=True)
-            st[k1] = t1_cur
+            rec.t1_pub = t1_cur
             published_any = True
         # T2: publikuj len ak narástlo
         if t2_cur > t2_pub:
             mqtt.pub(base, "t2", str(t2_cur), retain=True)
-            st[k2] = t2_cur
+            rec.t2_pub = t2_cur
             published_any = True
 
         # Total: pošli iba ak sa publikovalo T1 alebo T2 v tomto cykle
@@ -305,51 +465,128 @@ def flush_mqtt(mqtt: "Mqtt", cfg: dict, st: "State"):
             total_cur = t1_cur + t2_cur
             total_cur = int(total_cur)
             mqtt.pub(base, "total", str(total_cur), retain=True)
-            st[f"{sid}.total_pub"] = total_cur
+            rec.total_pub = total_cur
             # last_published = time.time()
         else:
-            if time.time() - last_published > publish_interval:
+            if clock.now() - last_published > publish_interval:
                 total_cur = t1_cur + t2_cur
                 mqtt.pub(base, "t1", str(t1_cur), retain=True)
                 mqtt.pub(base, "t2", str(t2_cur), retain=True)
                 mqtt.pub(base, "total", str(total_cur), retain=True)
-                last_published = time.time()
+                last_published = clock.now()
 
         # (Voliteľné) diagnostika: ak OCR „stiahlo“ hodnotu pod publikovanú,
         # nepublikujeme späť – energia sa nemá znižovať. Môžeš si len lognúť:
         # if t1_cur < t1_pub or t2_cur < t2_pub: log.warn("OCR correction below published; keeping published monotonic.")
 
+# sid -> (čas, dokument) posledného <base>/state
+_json_sent = {}
+
+def flush_mqtt_json(mqtt: "Mqtt", cfg: dict, st: "State"):
+    """
+    global.mqtt_mode: json – jeden retained JSON dokument <base>/state na
+    senzor (t1, t2, total, ocr_raw, ocr_conf, ts) namiesto tém per hodnota.
+    Posiela sa hneď pri náraste T1/T2, pri zmene OCR metadát najviac raz
+    za publish_interval a inak len obnova raz za mqtt_refresh_s.
+    """
+    g = cfg["global"]
+    publish_interval = float(g.get("publish_interval") or 0)
+    refresh_s = float(g.get("mqtt_refresh_s", 3600))
+    now = clock.now()
+    records = records_of(st)
+
+    for s in cfg["sensors"]:
+        rec = records.of(s)
+        t1_cur = round(rec.t1, 4)
+        t2_cur = round(rec.t2, 4)
+        if rec.t1_pub is None:
+            rec.t1_pub = t1_cur
+        if rec.t2_pub is None:
+            rec.t2_pub = t2_cur
+        # publikované hodnoty sú monotónne (ako v legacy režime)
+        t1 = max(t1_cur, rec.t1_pub)
+        t2 = max(t2_cur, rec.t2_pub)
+        doc = {"t1": t1, "t2": t2, "total": round(t1 + t2, 4),
+               "ocr_raw": rec.ocr_raw, "ocr_conf": rec.ocr_conf}
+
+        last_t, last_doc = _json_sent.get(s["id"], (None, None))
+        grew = t1 > rec.t1_pub or t2 > rec.t2_pub
+        if not (grew or last_doc is None
+                or (doc != last_doc and now - last_t >= publish_interval)
+                or now - last_t >= refresh_s):
+            continue
+        mqtt.pub(s["mqtt_topic_base"], "state", json.dumps(dict(doc, ts=int(now))), retain=True)
+        rec.t1_pub, rec.t2_pub = t1, t2
+        if grew:
+            rec.total_pub = doc["total"]
+        _json_sent[s["id"]] = (now, doc)
+
+@register_hook
+def _forget_json(diff: dict):
+    for sid in affected_sensors(diff):
+        _json_sent.pop(sid, None)
+
 def main():
-    cfg = load_config(CFG_PATH)
-    cfg_mtime = os.path.getmtime(CFG_PATH)
-    st   = State("/app/state/state.json")
-    mqtt = Mqtt()
+    global history
+    cfg = validate_config(load_config(CFG_PATH))
+    watcher = ConfigWatcher(CFG_PATH)
+    st   = State(STATE_PATH, autoflush=False)
+    st.subscribe(LIVE.on_state)
+    aligner.st = st
+    if HISTORY_PATH:
+        history = History(HISTORY_PATH)
+    boot = Readiness(_T0, IMPORT_S)
+    discovery = Discovery()            # HA discovery (global.ha_discovery)
+    PROFILER.install()                 # SIGUSR1/SIGUSR2 + python -m app.profiling
+    mqtt = Mqtt(will=boot.will())      # neblokuje, pripojí sa v pozadí
+    shard = None
+    if SHARD_ID:                       # senzory rozdelené medzi inštancie (app.shard)
+        shard = Shard(mqtt)
+        boot.watch(mqtt)
+        atexit.register(shard.leave)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))   # docker stop → leave()
     pulse = Pulse()
-    tariff = Tariff()
+    tariff = Tariff.from_cache()       # posledný kalendár hneď, čerstvý z CEZ v pozadí
+
+    # pomalé časti v pozadí; dovtedy bežia pulzy a publish posledných hodnôt
+    boot.track(Deferred("ocr", load_ocr))
+    boot.track(Deferred("tariff", tariff.refresh))
 
     ema_setup = EmaSetup()
     ema_setup.run()
 
     poll = poll_from(cfg)
-    LOG.info("vision-reader started; poll=%.2fs", poll)
-    LOG.info(f"IsHDO: {tariff.is_t2()}")
+    LOG.info("vision-reader core up in %.2fs (imports %.2fs); poll=%.2fs, OCR + tariff loading",
+             boot.mark("core"), IMPORT_S, poll)
+    LOG.info(f"IsHDO: {tariff.is_t2()} ({'cached' if tariff.responseData else 'no calendar yet'})")
 
     while True:
         t0 = time.time()
         try:
             # --- HOT RELOAD ---
-            try:
-                m = os.path.getmtime(CFG_PATH)
-                if m != cfg_mtime:
-                    cfg = load_config(CFG_PATH)
-                    cfg_mtime = m
-                    poll = poll_from(cfg)  # prepočítaj po reloade
-                    LOG.info("config reloaded; poll=%.2fs", poll)
-            except FileNotFoundError:
-                LOG.warning("config file missing: %s", CFG_PATH)
+            reloaded = watcher.poll(cfg)
+            if reloaded:
+                cfg, diff = reloaded
+                prune_sources(cfg)
+                if diff["global"]:
+                    poll = poll_from(cfg)  # prepočítaj len ak sa menil global
+                    LOG.info("poll=%.2fs", poll)
             # -------------------
 
-            process_all(mqtt, cfg, st, pulse, tariff, poll)
+            st.refresh()  # prevezmi prípadné ručné korekcie z roi_web
+            local = cfg
+            if shard is not None:
+                shard.tick(cfg)
+                local = shard.assign(cfg, records_of(st), last_pulse_value,
+                                     "t2" if tariff.is_t2() else "t1")
+            with stage("cycle"):
+                process_all(mqtt, local, st, pulse, tariff, poll)
+            if shard is not None:
+                shard.publish_state(records_of(st), last_pulse_value)
+            PROFILER.poll()
+            boot.publish(mqtt)
+            overload.publish(mqtt)
+            discovery.publish(mqtt, cfg)
             ema_setup.tick()
             mqtt.loop(0.1)
         except Exception as e:
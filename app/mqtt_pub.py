@@ -7,55 +7,85 @@ from paho.mqtt import client as mqtt
 LOG = logging.getLogger("mqtt")
 
 class Mqtt:
-    def __init__(self):
+    """
+    Neblokujúci MQTT klient: pripojenie a reconnect rieši sieťové vlákno
+    paho (loop_start), štart readera na broker nečaká. Správy (qos 0)
+    počas výpadku sa zahodia – retained hodnoty obnoví periodický publish.
+    """
+    def __init__(self, will=None):
         host = os.getenv("MQTT_HOST", "127.0.0.1")
         port = int(os.getenv("MQTT_PORT", "1883"))
         user = os.getenv("MQTT_USER", "")
         pwd  = os.getenv("MQTT_PASS", "")
         self._host, self._port = host, port
 
+        self.connected = False
+        self.connects = 0       # počet úspešných pripojení (status sa po ňom publikuje znova)
+        self.dropped = 0
+        self._subs = {}         # pattern -> callback(topic, payload: bytes, retained)
+
         self._cli = mqtt.Client()
         if user:
             self._cli.username_pw_set(user, pwd)
+        if will:
+            topic, payload = will
+            self._cli.will_set(topic, payload=payload, qos=0, retain=True)
 
-        # voliteľné callbacks pre debug
+        self._cli.on_connect = self._on_conn
         self._cli.on_disconnect = self._on_disc
+        self._cli.on_message = self._on_msg
+        self._cli.reconnect_delay_set(min_delay=1, max_delay=30)
 
         self._connect()
 
     def _connect(self):
-        while True:
-            try:
-                rc = self._cli.connect(self._host, self._port, 60)
-                if rc == 0:
-                    LOG.info("MQTT connected to %s:%s", self._host, self._port)
-                    break
-                else:
-                    LOG.warning("MQTT connect rc=%s; retrying...", rc)
-            except Exception as e:
-                LOG.warning("MQTT connect error: %s; retrying in 3s", e)
-            time.sleep(3)
+        self._cli.connect_async(self._host, self._port, 60)
+        self._cli.loop_start()
+        LOG.info("MQTT connecting to %s:%s (background)", self._host, self._port)
+
+    def _on_conn(self, client, userdata, flags, rc):
+        if rc == 0:
+            self.connected = True
+            self.connects += 1
+            LOG.info("MQTT connected to %s:%s", self._host, self._port)
+            for pattern in list(self._subs):
+                client.subscribe(pattern, qos=0)    # po reconnecte znova (clean session)
+        else:
+            LOG.warning("MQTT connect rc=%s; retrying...", rc)
 
     def _on_disc(self, client, userdata, rc):
+        self.connected = False
         if rc != 0:
             LOG.warning("MQTT unexpected disconnect rc=%s, reconnecting...", rc)
-            try:
-                self._connect()
-            except Exception as e:
-                LOG.error("MQTT reconnect failed: %s", e)
+
+    def subscribe(self, pattern: str, callback):
+        """callback(topic, payload, retained) beží vo vlákne paho – musí byť krátky."""
+        self._subs[pattern] = callback
+        if self.connected:
+            self._cli.subscribe(pattern, qos=0)
+
+    def _on_msg(self, client, userdata, msg):
+        for pattern, cb in list(self._subs.items()):
+            if mqtt.topic_matches_sub(pattern, msg.topic):
+                try:
+                    cb(msg.topic, msg.payload, bool(msg.retain))
+                except Exception as e:
+                    LOG.warning("MQTT handler error (%s): %s", msg.topic, e)
 
     def pub(self, base_topic: str, key: str, value: str, retain: bool=False):
         topic = f"{base_topic}/{key}"
         try:
-            self._cli.publish(topic, payload=str(value), qos=0, retain=retain)
+            info = self._cli.publish(topic, payload=str(value), qos=0, retain=retain)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                self.dropped += 1
         except Exception as e:
-            LOG.warning("MQTT publish error (%s): %s → reconnect & retry", topic, e)
-            self._connect()
-            self._cli.publish(topic, payload=str(value), qos=0, retain=retain)
+            self.dropped += 1
+            LOG.warning("MQTT publish error (%s): %s", topic, e)
 
     def loop(self, timeout: float = 0.1):
-        # volaj v hlavnej slučke, aby sa držalo spojenie
-        try:
-            self._cli.loop(timeout=timeout)
-        except Exception:
-            pass
+        # sieť obsluhuje vlákno paho; v hlavnej slučke už len krátka pauza
+        time.sleep(timeout)
+
+    def close(self):
+        self._cli.loop_stop()
+        self._cli.disconnect()
@@ -12,5 +12,8 @@ class Mqtt:
         # Použi f-string, nech sa bool správne prevedie na text
         print(f"TOPIC: {base_topic} KEY: {key} VALUE: {value} RETAIN: {retain}")
 
+    def subscribe(self, pattern: str, callback):
+        print(f"SUBSCRIBE: {pattern}")
+
     def loop(self, timeout: float = 0.1):
         return
@@ -0,0 +1,159 @@
+# app/ocr_engine.py
+"""
+OCR enginy za app.ocr_paddle.get_reader().
+
+Každý engine má read(bgr) -> [(x_stred, text, konf.), ...] v ľubovoľnom
+poradí; zoradenie, rozseknutie na znaky a výber číslic robí ocr_paddle.
+Volí sa per nasadenie cez OCR_ENGINE:
+
+  paddle  PaddleOCR detekcia + rekognícia (default)
+  onnx    exportovaný rekognizér cez ONNX Runtime (pip install onnxruntime)
+  cv2     ten istý .onnx cez OpenCV DNN (bez ďalšej závislosti)
+
+onnx/cv2 spúšťajú len rekognizér nad celým výrezom – ROI je jeden riadok
+číslic, detekcia textu je zbytočná. Model (aj int8 kvantizovaný) a slovník
+pripraví tools/ocr_export.py, zhodu s paddle overí tools/bench_ocr.py.
+"""
+import os, abc, logging, math
+import cv2
+import numpy as np
+
+LOG = logging.getLogger("ocr")
+
+ENGINE = os.getenv("OCR_ENGINE", "paddle").strip().lower()
+CPU_THREADS = int(os.getenv("OCR_CPU_THREADS", "0")) or None   # None = default knižnice (paddle 10)
+REC_MODEL = os.getenv("OCR_REC_MODEL", "/app/models/rec.onnx")
+REC_DICT = os.getenv("OCR_REC_DICT", "/app/models/rec_dict.txt")
+REC_HEIGHT = int(os.getenv("OCR_REC_HEIGHT", "48"))
+REC_WIDTH = int(os.getenv("OCR_REC_WIDTH", "320"))      # minimálna šírka vstupu (ako PP-OCR)
+
+
+class PaddleEngine:
+    name = "paddle"
+
+    def __init__(self, threads: int = CPU_THREADS):
+        from paddleocr import PaddleOCR
+        os.environ.setdefault("PPocr_DEBUG", "0")
+        logging.getLogger("ppocr").setLevel(logging.WARNING)
+        self.threads = threads
+        kw = {"cpu_threads": threads} if threads else {}
+        self._ocr = PaddleOCR(use_angle_cls=False, lang="en", show_log=False, **kw)  # CPU
+
+    def read(self, bgr: np.ndarray):
+        res = self._ocr.ocr(bgr, cls=False)
+        if not res or not res[0]:
+            return []
+        out = []
+        for box, (txt, conf) in res[0]:
+            xs = [p[0] for p in box]
+            out.append((float(sum(xs)) / len(xs), txt or "",
+                        float(conf) if isinstance(conf, (float, int)) else 0.0))
+        return out
+
+
+def load_dict(path: str):
+    """Znaky rekognizéra; index 0 = CTC blank, na konci medzera (use_space_char ako v PP-OCR)."""
+    with open(path, encoding="utf-8") as f:
+        chars = [line.rstrip("\r\n") for line in f if line.rstrip("\r\n")]
+    return ["<blank>"] + chars + [" "]
+
+
+class _RecEngine(abc.ABC):
+    """Spoločné pre onnx/cv2: predspracovanie ako PP-OCR rec a CTC dekódovanie."""
+    name = "rec"
+
+    def __init__(self, model: str = REC_MODEL, dict_path: str = REC_DICT, threads: int = CPU_THREADS):
+        self.model = model
+        self.threads = threads
+        self.chars = load_dict(dict_path)
+
+    def _input(self, bgr: np.ndarray):
+        h, w = bgr.shape[:2]
+        rw = max(1, min(int(math.ceil(REC_HEIGHT * w / float(h))), 4 * REC_WIDTH))
+        img = cv2.resize(bgr, (rw, REC_HEIGHT)).astype(np.float32)
+        img = (img / 255.0 - 0.5) / 0.5
+        x = np.zeros((1, 3, REC_HEIGHT, max(REC_WIDTH, rw)), dtype=np.float32)
+        x[0, :, :, :rw] = img.transpose(2, 0, 1)
+        return x, rw
+
+    @abc.abstractmethod
+    def _run(self, x: np.ndarray) -> np.ndarray:
+        """Inferencia rekognizéra: (1, 3, H, W) -> softmax (1, T, C)."""
+
+    def read(self, bgr: np.ndarray):
+        if bgr.ndim == 2:
+            bgr = cv2.cvtColor(bgr, cv2.COLOR_GRAY2BGR)
+        x, rw = self._input(bgr)
+        probs = self._run(x).reshape(-1, len(self.chars))        # (T, C) softmax
+        return ctc_decode(probs, self.chars, bgr.shape[1] * x.shape[3] / float(rw))
+
+
+def ctc_decode(probs: np.ndarray, chars, width: float):
+    """
+    Greedy CTC: zlúči opakovania, vynechá blank. Každý znak je samostatná
+    položka s x podľa časového kroku a konf. = priemer pravdepodobností
+    jeho krokov (paddle dáva jednu konf. na celý box).
+    """
+    idx = probs.argmax(axis=1)
+    best = probs.max(axis=1)
+    steps = len(idx)
+    out = []
+    t = 0
+    while t < steps:
+        k = idx[t]
+        e = t + 1
+        while e < steps and idx[e] == k:
+            e += 1
+        if k != 0:
+            x = (t + e) / 2.0 / steps * width
+            out.append((x, chars[k], float(best[t:e].mean())))
+        t = e
+    return out
+
+
+class OnnxEngine(_RecEngine):
+    name = "onnx"
+
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        import onnxruntime as ort
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = self.threads or 0                           # 0 = default ORT
+        so.inter_op_num_threads = 1
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        so.add_session_config_entry("session.intra_op.allow_spinning", "0")   # nepáliť CPU medzi snímkami
+        self._sess = ort.InferenceSession(self.model, so, providers=["CPUExecutionProvider"])
+        self._in = self._sess.get_inputs()[0].name
+
+    def _run(self, x):
+        return self._sess.run(None, {self._in: x})[0]
+
+
+class Cv2Engine(_RecEngine):
+    name = "cv2"
+
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        if self.threads:
+            cv2.setNumThreads(self.threads)
+        self._net = cv2.dnn.readNetFromONNX(self.model)
+        self._net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self._net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def _run(self, x):
+        self._net.setInput(x)
+        return self._net.forward()
+
+
+ENGINES = {"paddle": PaddleEngine, "onnx": OnnxEngine, "cv2": Cv2Engine}
+
+
+def create(name: str = None, threads: int = None):
+    name = (name or ENGINE).strip().lower()
+    if name not in ENGINES:
+        raise ValueError(f"OCR_ENGINE must be one of {sorted(ENGINES)}, got {name!r}")
+    eng = ENGINES[name](threads=CPU_THREADS if threads is None else threads)
+    LOG.info("OCR engine %s (%s thread(s)%s)", eng.name, eng.threads or "default",
+             f", model {eng.model}" if hasattr(eng, "model") else "")
+    return eng
@@ -1,23 +1,29 @@
 # app/ocr_paddle.py
-import os, logging, re, cv2, numpy as np
-from paddleocr import PaddleOCR
+import os, logging, re, time, threading, cv2, numpy as np
 from app.ocr_pre import preprocess_for_ocr  # V4
-
-# tichšie logy
-os.environ.setdefault("PPocr_DEBUG", "0")
-logging.getLogger("ppocr").setLevel(logging.WARNING)
+from app import ocr_prior, ocr_engine
+from app.profiling import stage
 
 DEBUG = os.getenv("APP_DEBUG", "0").strip() == "1"
 DBG_DIR = "/app/debug"
 TARGET_LEN = int(os.getenv("OCR_TARGET_LEN", "7"))
 
 LOG = logging.getLogger("ocr")
+VLOG = logging.getLogger("ocr.variants")   # pri APP_DEBUG do /app/debug/log.txt (app.logsetup)
 
 _reader = None
+_reader_lock = threading.Lock()
+# engine (PaddleOCR) nie je thread-safe; v readeri je zámok vždy voľný,
+# v roi_web serializuje náhľady nad jedným zdieľaným enginom
+_ocr_lock = threading.Lock()
+
 def get_reader():
+    """OCR engine podľa OCR_ENGINE (app.ocr_engine), vytvorený raz na proces."""
     global _reader
     if _reader is None:
-        _reader = PaddleOCR(use_angle_cls=False, lang="en")  # CPU
+        with _reader_lock:
+            if _reader is None:
+                _reader = ocr_engine.create()
     return _reader
 
 def _ensure_dir(p):
@@ -82,94 +88,163 @@ def _save(path: str, img) -> None:
     if not ok:
         LOG.warning("debug save failed: %s", path)
 
-def _ocr_sorted(bgr_img):
+def _ocr_chars(bgr_img):
     """
     OCR s pevnou čítacou stratégiou:
     - zoradí boxy zľava doprava podľa x-centra
     - rozseká viacznakové tokeny ('00') na jednotlivé znaky
-    - vráti text len z číslic + priemernú konf.
+    - vráti [(číslica, konf. boxu z rekognizéra), ...] v poradí zľava doprava
     """
-    res = get_reader().ocr(bgr_img, cls=False)
-    if not res or not res[0]:
-        return "", 0.0
+    reader = get_reader()
+    with _ocr_lock, stage("ocr.recognize"):
+        res = reader.read(bgr_img)
 
     items = []
-    confs = []
-    for box, (txt, conf) in res[0]:
-        # x-poradie podľa stredu bounding boxu
-        xs = [p[0] for p in box]
-        x_center = float(sum(xs)) / len(xs)
+    for x_center, txt, c in res:
         # len číslice; ak je token dlhší, rozsekáme ho, no zachováme poradie
         token = re.sub(r"\D", "", txt or "")
         if not token:
             continue
         # ulož po znakoch s jemným offsetom, aby sa zachovalo poradie v rámci tokenu
         for i, ch in enumerate(token):
-            items.append((x_center + i*0.001, ch))  # 0.001 stačí na stabilné sortovanie
-            confs.append(float(conf) if isinstance(conf, (float, int)) else 0.0)
-
-    if not items:
-        return "", 0.0
+            items.append((x_center + i*0.001, ch, c))  # 0.001 stačí na stabilné sortovanie
 
     items.sort(key=lambda t: t[0])
-    text = "".join(ch for _, ch in items)
-    conf = float(np.mean(confs)) if confs else 0.0
+    return [(ch, c) for _, ch, c in items]
+
+def _ocr_sorted(bgr_img):
+    """Text len z číslic + priemerná konf. (pozri _ocr_chars)."""
+    chars = _ocr_chars(bgr_img)
+    if not chars:
+        return "", 0.0
+    text = "".join(ch for ch, _ in chars)
+    conf = float(np.mean([c for _, c in chars]))
     return text, conf
 
+def _pick_chars(chars, target_len: int = TARGET_LEN):
+    """
+    To isté ako _pick_digits, ale zachová konfidenciu každej pozície.
+    Doplnené nuly zľava majú konf. 0 (nie sú prečítané, len domyslené).
+    """
+    if not chars:
+        return []
+    if len(chars) > target_len:
+        return list(chars[:target_len])
+    return [("0", 0.0)] * (target_len - len(chars)) + list(chars)
+
 def _score(digits: str, conf: float) -> float:
     if not digits:
         return 0.0
     bonus = 0.05 if len(digits) == TARGET_LEN else -0.05
     return max(0.0, conf + bonus)
 
-def ocr_digits(bgr: np.ndarray, upscale: int = 2):
-    """
-    V1 farba, V2 šedá, V3 binár, V4 LCD-preprocess; všetko cez _ocr_sorted.
-    Vyberie kandidáta s najvyšším skóre.
-    """
-    if DEBUG: _ensure_dir(DBG_DIR)
-    candidates = []
+# --- varianty predspracovania ---
+# každá dostane (bgr, upscale, ctx); ctx zdieľa medzivýsledky (šedý obraz pre V3)
 
-    # V1: farba
+def _v_color(bgr, upscale, ctx):
     col = _enhance_color(bgr.copy())
     if upscale and upscale > 1:
         col = cv2.resize(col, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
-    _save(f"{DBG_DIR}/v1_color.jpg", col)
-    txt, c = _ocr_sorted(col)
-    d = _pick_digits(txt)
-    candidates.append((d, _score(d, c), "color", c, txt))
-
-    # V2: šedá
-    g = _prep_gray(bgr, upscale=upscale)
-    _save(f"{DBG_DIR}/v2_gray.png", g)
-    g_bgr = cv2.cvtColor(g, cv2.COLOR_GRAY2BGR)
-    txt, c = _ocr_sorted(g_bgr)
-    d = _pick_digits(txt)
-    candidates.append((d, _score(d, c), "gray", c, txt))
-
-    # V3: binár
-    th = _binarize(g)
-    _save(f"{DBG_DIR}/v3_bin.png", th)
-    th_bgr = cv2.cvtColor(th, cv2.COLOR_GRAY2BGR)
-    txt, c = _ocr_sorted(th_bgr)
-    d = _pick_digits(txt)
-    candidates.append((d, _score(d, c), "bin", c, txt))
-
-    # V4: špeciálna predpríprava (ocr_pre.py)
-    prep = preprocess_for_ocr(bgr)
-    _save(f"{DBG_DIR}/v4_pre.png", prep)
-    prep_bgr = cv2.cvtColor(prep, cv2.COLOR_GRAY2BGR)
-    txt, c = _ocr_sorted(prep_bgr)
-    d = _pick_digits(txt)
-    candidates.append((d, _score(d, c), "pre", c, txt))
-
-    if DEBUG:
-        with open(f"{DBG_DIR}/log.txt", "a") as f:
-            for d, s, name, c_raw, txt in candidates:
-                f.write(f"{name}: txt='{txt}' → digits='{d}', conf={c_raw:.2f}, score={s:.3f}\n")
+    return col
+
+def _v_gray(bgr, upscale, ctx):
+    if "gray" not in ctx:
+        ctx["gray"] = _prep_gray(bgr, upscale=upscale)
+    return ctx["gray"]
 
+def _v_bin(bgr, upscale, ctx):
+    return _binarize(_v_gray(bgr, upscale, ctx))
+
+def _v_pre(bgr, upscale, ctx):
+    return preprocess_for_ocr(bgr)
+
+# (názov, funkcia, debug súbor) – poradie = poradie skúšania
+VARIANTS = [
+    ("color", _v_color, "v1_color.jpg"),
+    ("gray",  _v_gray,  "v2_gray.png"),
+    ("bin",   _v_bin,   "v3_bin.png"),
+    ("pre",   _v_pre,   "v4_pre.png"),
+]
+VARIANT_NAMES = [v[0] for v in VARIANTS]
+
+def _iter_variants(bgr: np.ndarray, upscale: int = 2, names=None, keep_images: bool = False):
+    if DEBUG: _ensure_dir(DBG_DIR)
+    ctx = {}
+    for name, fn, dbg_name in VARIANTS:
+        if names is not None and name not in names:
+            continue
+        t0 = time.perf_counter()
+        with stage(f"prep.{name}"):
+            img = fn(bgr, upscale, ctx)
+        t1 = time.perf_counter()
+        _save(f"{DBG_DIR}/{dbg_name}", img)
+        img_bgr = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img
+        chars = _ocr_chars(img_bgr)
+        t2 = time.perf_counter()
+        txt = "".join(ch for ch, _ in chars)
+        c = float(np.mean([cc for _, cc in chars])) if chars else 0.0
+        d = _pick_digits(txt)
+        r = {
+            "name": name, "txt": txt, "digits": d, "conf": c, "score": _score(d, c),
+            "chars": _pick_chars(chars), "raw_chars": chars,
+            "prep_ms": (t1 - t0) * 1000.0, "ocr_ms": (t2 - t1) * 1000.0,
+        }
+        if DEBUG:
+            VLOG.debug("%s: txt='%s' → digits='%s', conf=%.2f, score=%.3f",
+                       name, txt, d, c, r["score"], extra={"ratelimit": False})
+        if keep_images:
+            r["image"] = img
+        yield r
+
+def ocr_variants(bgr: np.ndarray, upscale: int = 2, names=None, keep_images: bool = False):
+    """
+    Spustí zvolené varianty (default všetky) a vráti zoznam dictov:
+        name, txt, digits, conf, score, chars, raw_chars, prep_ms, ocr_ms [, image]
+    chars = [(číslica, konf.), ...] zarovnané s digits, raw_chars = ako prečítané
+    """
+    return list(_iter_variants(bgr, upscale, names, keep_images))
+
+def ocr_decode(bgr: np.ndarray, upscale: int = 2, prior: "ocr_prior.ValuePrior" = None,
+               early_conf: float = 0.6, names=None):
+    """
+    Ako ocr_digits, ale s priorom z pulzov: kandidátov vyhodnotí voči
+    očakávanému rozsahu a prvý vierohodný kandidát s konf. >= early_conf
+    ukončí hľadanie (ďalšie varianty sa nespúšťajú).
+    names obmedzí varianty (pri preťažení len najlepší známy).
+    Vracia dict: digits, conf, bucket (alebo None), variant, variants_run, early.
+    """
+    total = len(names) if names else len(VARIANTS)
+    candidates = []
+    for r in _iter_variants(bgr, upscale, names):
+        candidates.append(r)
+        if prior is None:
+            continue
+        dec = prior.decode(r["raw_chars"], TARGET_LEN)
+        if dec and dec[1] >= early_conf:
+            digits, conf, bucket = dec
+            ocr_prior.record(len(candidates), total, early=True)
+            return {"digits": digits, "conf": conf, "bucket": bucket, "variant": r["name"],
+                    "variants_run": len(candidates), "early": True}
+
+    # žiadny vierohodný kandidát → pôvodné správanie (najvyššie skóre)
+    if prior is not None:
+        ocr_prior.record(len(candidates), total, early=False)
+    if not candidates:
+        return {"digits": "", "conf": 0.0, "bucket": None, "variant": None,
+                "variants_run": 0, "early": False}
+    best = max(candidates, key=lambda r: r["score"])
+    bucket = prior.bucket_of(int(best["digits"])) if (prior and best["digits"]) else None
+    return {"digits": best["digits"], "conf": float(best["conf"]), "bucket": bucket,
+            "variant": best["name"], "variants_run": len(candidates), "early": False}
+
+def ocr_digits(bgr: np.ndarray, upscale: int = 2):
+    """
+    V1 farba, V2 šedá, V3 binár, V4 LCD-preprocess; všetko cez _ocr_chars.
+    Vyberie kandidáta s najvyšším skóre.
+    """
+    candidates = ocr_variants(bgr, upscale=upscale)
     if not candidates:
         return "", 0.0
 
-    best_digits, best_score, best_name, best_conf, _ = max(candidates, key=lambda x: x[1])
-    return best_digits, float(best_conf)
+    best = max(candidates, key=lambda r: r["score"])
+    return best["digits"], float(best["conf"])
@@ -0,0 +1,96 @@
+# app/ocr_prior.py
+import logging
+from app import clock
+
+LOG = logging.getLogger("reader")
+
+# koľkokrát prior ukončil hľadanie variantov skôr (a koľko OCR behov ušetril)
+STATS = {"reads": 0, "early": 0, "variants_skipped": 0, "resolved_by_tariff": 0}
+_stats_t = [clock.now()]
+STATS_EVERY_S = 600
+
+
+class ValuePrior:
+    """
+    Čo by mal displej ukazovať podľa posledného OCR a pulzov od neho.
+
+    Pre každý register je rozsah celých kWh [lo, hi]:
+      - lo = posledné akceptované OCR (displej neklesá),
+      - hi = celé kWh z pulzov + `slack` (pulzy môžu mierne zaostávať,
+        napr. zmrazenie na .999); neaktívny register sa nemení.
+    Kandidát z OCR, ktorý padne do rozsahu, je "vierohodný".
+    """
+
+    def __init__(self, ranges: dict, active: str):
+        self.ranges = ranges          # {"t1": (lo, hi), "t2": (lo, hi)}
+        self.active = active          # register podľa aktuálnej tarify
+
+    @classmethod
+    def from_record(cls, rec, is_t2: bool, slack: int = 1):
+        active = "t2" if is_t2 else "t1"
+        ranges = {}
+        for reg in ("t1", "t2"):
+            lo = getattr(rec, f"{reg}_ocr")
+            cur = getattr(rec, f"{reg}_p") // rec.imp
+            hi = max(lo, cur) + slack if reg == active else lo
+            ranges[reg] = (lo, hi)
+        return cls(ranges, active)
+
+    def bucket_of(self, v: int):
+        hits = [r for r, (lo, hi) in self.ranges.items() if lo <= v <= hi]
+        if not hits:
+            return None
+        if len(hits) > 1:
+            # oba registre sedia → rozhodne aktuálna tarifa
+            STATS["resolved_by_tariff"] += 1
+            return self.active
+        return hits[0]
+
+    def resolve(self, v: int, fallback: str) -> str:
+        return self.bucket_of(v) or fallback
+
+    @staticmethod
+    def candidates(chars, target_len: int):
+        """
+        Kandidáti z prečítaných znakov namiesto slepého orezania/doplnenia:
+        všetky súvislé okná dĺžky target_len (extra znak môže byť na
+        ktoromkoľvek konci), pri kratšom čítaní doplnenie nulami zľava.
+        Vracia [(digits, [konf. reálnych znakov]), ...].
+        """
+        n = len(chars)
+        if n == 0:
+            return []
+        if n <= target_len:
+            return [("0" * (target_len - n) + "".join(ch for ch, _ in chars),
+                     [c for _, c in chars])]
+        out = []
+        for i in range(n - target_len + 1):
+            w = chars[i:i + target_len]
+            out.append(("".join(ch for ch, _ in w), [c for _, c in w]))
+        return out
+
+    def decode(self, chars, target_len: int):
+        """Najlepší vierohodný kandidát: (digits, conf, bucket) alebo None."""
+        best = None
+        for digits, confs in self.candidates(chars, target_len):
+            v = int(digits)
+            bucket = self.bucket_of(v)
+            if bucket is None:
+                continue
+            conf = sum(confs) / len(confs)
+            key = (bucket == self.active, conf)
+            if best is None or key > best[0]:
+                best = (key, digits, conf, bucket)
+        return best and best[1:]
+
+
+def record(variants_run: int, variants_total: int, early: bool):
+    STATS["reads"] += 1
+    if early:
+        STATS["early"] += 1
+        STATS["variants_skipped"] += variants_total - variants_run
+    now = clock.now()
+    if now - _stats_t[0] >= STATS_EVERY_S:
+        _stats_t[0] = now
+        LOG.info("OCR prior: %d/%d reads ended early, %d variant runs skipped, %d t1/t2 by tariff",
+                 STATS["early"], STATS["reads"], STATS["variants_skipped"], STATS["resolved_by_tariff"])
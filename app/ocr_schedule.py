@@ -0,0 +1,126 @@
+# app/ocr_schedule.py
+import logging
+from app import clock
+from app.config_watch import register_hook, affected_sensors
+
+LOG = logging.getLogger("reader")
+
+
+class OcrScheduler:
+    """
+    Adaptívne plánovanie OCR podľa pulzového modelu.
+
+    Celé kWh na displeji sa menia len pri prechode cez celé číslo. Pulzy
+    (rec.t1/rec.t2, app/records.py) vedia, kedy to nastane, takže OCR stačí:
+      - pomaly (ocr_idle_interval_s) keď je do prechodu ďaleko,
+      - rýchlo (ocr_fast_interval_s) keď je prechod blízko / hodnota čaká
+        zmrazená na .999 / práve sa prepla tarifa / po reloade senzora.
+
+    Bez ocr_idle_interval_s v configu sa správa ako doteraz (pevný poll).
+    """
+
+    STATS_EVERY_S = 600
+
+    def __init__(self):
+        self._last_run = {}       # sid -> čas posledného OCR
+        self._last_t2 = {}        # sid -> tarifa pri poslednom OCR
+        self._hot = {}            # sid -> posledný dôvod rýchleho režimu
+        self.runs = 0
+        self.legacy_runs = 0.0    # koľko OCR by spravil pevný poll
+        self._stats_t = clock.now()
+        self._stats_last = None
+        register_hook(self._on_config)
+
+    def _on_config(self, diff: dict):
+        # zmenený senzor (napr. ROI) → OCR hneď v ďalšom cykle
+        for sid in affected_sensors(diff) | diff["added"]:
+            self._last_run.pop(sid, None)
+
+    @staticmethod
+    def intervals(cfg: dict, poll: float):
+        g = cfg.get("global", {})
+        fast = float(g.get("ocr_fast_interval_s", poll))
+        idle = float(g.get("ocr_idle_interval_s", fast))
+        lead = float(g.get("ocr_boundary_lead_s", 2 * fast))
+        return fast, max(idle, fast), lead
+
+    def _reason(self, rec, is_t2: bool, rate_kwh_s: float, lead_s: float, idle_s: float):
+        if self._last_t2.get(rec.sid, is_t2) != is_t2:
+            return "tariff"
+        reg = "t2" if is_t2 else "t1"
+        if rec.pending(reg):
+            return "freeze"              # pulzy už čakajú na OCR
+        # kWh do ďalšieho celého čísla na displeji
+        remaining = (rec.cap(reg) + 1 - getattr(rec, f"{reg}_p")) / rec.imp
+        # prechod nastane skôr než ďalšie pomalé OCR (+ rezerva)
+        if rate_kwh_s > 0 and remaining / rate_kwh_s <= idle_s + lead_s:
+            return "boundary"
+        return None
+
+    @property
+    def hot(self) -> dict:
+        """sid -> dôvod rýchleho režimu (freeze, boundary, tariff)."""
+        return self._hot
+
+    def due(self, cfg: dict, records, poll: float, is_t2: bool, rate_kwh_s: float, now: float = None,
+            stretch: float = 1.0):
+        """
+        Vráti zoznam senzorov, ktoré majú ísť teraz na OCR (records: app.records.Records).
+        stretch > 1 predĺži intervaly (app.overload pri trvalom preťažení).
+        """
+        now = now or clock.now()
+        fast, idle, lead = self.intervals(cfg, poll)
+        fast, idle = fast * stretch, idle * stretch
+
+        # kvôli štatistike: koľko by toho spravil pevný poll
+        prev = self._stats_last or now
+        self.legacy_runs += len(cfg["sensors"]) * (now - prev) / max(poll, 1e-3)
+        self._stats_last = now
+
+        out = []
+        for s in cfg["sensors"]:
+            sid = s["id"]
+            last = self._last_run.get(sid)
+            if last is None:
+                out.append(s)
+                continue
+            elapsed = now - last
+            if elapsed >= idle:
+                out.append(s)
+                continue
+            if elapsed < fast:
+                continue
+            reason = self._reason(records.of(s), is_t2, rate_kwh_s, lead, idle)
+            if reason:
+                if self._hot.get(sid) != reason:
+                    LOG.debug("[%s] OCR fast mode: %s", sid, reason, extra={"sid": sid})
+                self._hot[sid] = reason
+                out.append(s)
+            else:
+                self._hot.pop(sid, None)
+        return out
+
+    def mark(self, sids, is_t2: bool, now: float = None):
+        now = now or clock.now()
+        for sid in sids:
+            self._last_run[sid] = now
+            self._last_t2[sid] = is_t2
+            self.runs += 1
+        self._maybe_log(now)
+
+    def stats(self) -> dict:
+        legacy = max(self.legacy_runs, 1.0)
+        return {
+            "ocr_runs": self.runs,
+            "legacy_runs": int(self.legacy_runs),
+            "saved_pct": round(100.0 * (1.0 - self.runs / legacy), 1),
+            "hot": dict(self._hot),
+        }
+
+    def _maybe_log(self, now: float):
+        if now - self._stats_t < self.STATS_EVERY_S:
+            return
+        self._stats_t = now
+        s = self.stats()
+        LOG.info("OCR schedule: %d runs vs %d fixed-poll (%.1f%% saved)",
+                 s["ocr_runs"], s["legacy_runs"], s["saved_pct"])
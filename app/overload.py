@@ -0,0 +1,170 @@
+# app/overload.py
+import json, logging
+from collections import Counter
+from app.config_watch import register_hook, affected_sensors
+from app import clock
+from app.startup import STATUS_TOPIC
+
+LOG = logging.getLogger("reader")
+
+
+class Overload:
+    """
+    Rozpočet času na cyklus process_all a odľahčenie OCR pri preťažení.
+
+    Pulzy a publish majú prednosť vždy (bežia pred OCR aj medzi senzormi),
+    obmedzuje sa len OCR. Úroveň stúpa po up_after cykloch nad rozpočtom
+    (global.cycle_budget_s, default pulse_poll_s) a klesá po down_after
+    cykloch pod relax * rozpočet (cykly bez OCR sa nerátajú):
+
+      0 normal        bez obmedzení
+      1 best_variant  len variant, ktorý senzoru najčastejšie vyšiel
+      2 defer         + OCR len kým zostáva rozpočet, zvyšok senzorov
+                        (nižšia ocr_priority) v ďalšom cykle
+      3 stretch       + intervaly OCR x global.overload_stretch (default 2)
+
+    Čas cyklu ide cez app.clock.monotonic() – pri replayi na VirtualClock
+    nezávisí od rýchlosti CPU hostiteľa (cenu OCR účtuje sim.replay).
+
+    Úroveň ide retained na <STATUS_TOPIC>/overload (JSON) a ako číslo
+    na <STATUS_TOPIC>/overload_level.
+    """
+
+    LEVELS = ("normal", "best_variant", "defer", "stretch")
+
+    def __init__(self, up_after: int = 3, down_after: int = 10, relax: float = 0.6):
+        self.up_after = up_after
+        self.down_after = down_after
+        self.relax = relax
+        self.level = 0
+        self.budget_s = 0.0
+        self._stretch = 1.0
+        self.cycle_s = 0.0
+        self.cycle_s_max = 0.0
+        self.stats = {"cycles": 0, "over_budget": 0, "variants_shed": 0, "deferred": 0}
+        self._over = 0
+        self._under = 0
+        self._t0 = None
+        self._ran = 0
+        self._deferred_now = 0
+        self._cost = {}              # sid -> EMA trvania OCR (s)
+        self._wins = {}              # sid -> Counter(variant)
+        self._waited = Counter()     # sid -> počet odložení za sebou (aby nevyhladovel)
+        self._sent = None
+        self._connects = -1
+        register_hook(self._on_config)
+
+    def _on_config(self, diff: dict):
+        for sid in affected_sensors(diff):
+            self._wins.pop(sid, None)
+            self._cost.pop(sid, None)
+
+    @staticmethod
+    def params(cfg: dict):
+        g = cfg.get("global", {})
+        budget = float(g.get("cycle_budget_s", g.get("pulse_poll_s", 5)))
+        return budget, max(1.0, float(g.get("overload_stretch", 2.0)))
+
+    @property
+    def name(self) -> str:
+        return self.LEVELS[self.level]
+
+    # --- cyklus ---
+
+    def begin(self, cfg: dict):
+        self.budget_s, self._stretch = self.params(cfg)
+        self._t0 = clock.monotonic()
+        self._ran = 0
+        self._deferred_now = 0
+
+    def elapsed(self) -> float:
+        return clock.monotonic() - self._t0 if self._t0 is not None else 0.0
+
+    def end(self):
+        dt = self.elapsed()
+        self.cycle_s = dt
+        self.cycle_s_max = max(self.cycle_s_max, dt)
+        self.stats["cycles"] += 1
+        if not self._ran and not self._deferred_now:
+            return        # cyklus bez OCR (len pulzy/publish) o záťaži nič nehovorí
+        prev = self.level
+        # odložené senzory = preťaženie, aj keď sa cyklus vďaka tomu zmestil do rozpočtu
+        if dt > self.budget_s or self._deferred_now:
+            self.stats["over_budget"] += 1
+            self._over += 1
+            self._under = 0
+            if self._over >= self.up_after and self.level < len(self.LEVELS) - 1:
+                self.level += 1
+                self._over = 0
+        elif dt < self.relax * self.budget_s:
+            self._under += 1
+            self._over = 0
+            if self._under >= self.down_after and self.level > 0:
+                self.level -= 1
+                self._under = 0
+        else:
+            self._over = self._under = 0
+        if self.level > prev:
+            LOG.warning("overload: cycle %.2fs / budget %.2fs, %d OCR deferred → level %d (%s)",
+                        dt, self.budget_s, self._deferred_now, self.level, self.name)
+        elif self.level < prev:
+            LOG.info("overload: load back under budget → level %d (%s)", self.level, self.name)
+
+    # --- politika pre OCR ---
+
+    def stretch(self) -> float:
+        return self._stretch if self.level >= 3 else 1.0
+
+    def order(self, due: list, hot: dict) -> list:
+        """Poradie OCR: ocr_priority (+ čakanie), potom senzory v rýchlom režime."""
+        def key(s):
+            sid = s["id"]
+            return (-(int(s.get("ocr_priority", 0)) + self._waited[sid]), 0 if sid in hot else 1)
+        return sorted(due, key=key)
+
+    def admit(self, sid: str) -> bool:
+        """Stihne sa OCR senzora v zostávajúcom rozpočte? Aspoň jeden senzor za cyklus vždy."""
+        if self.level < 2 or self._ran == 0:
+            return True
+        if self.elapsed() + self._cost.get(sid, 0.0) <= self.budget_s:
+            return True
+        self._waited[sid] += 1
+        self._deferred_now += 1
+        self.stats["deferred"] += 1
+        return False
+
+    def ran(self, sid: str, seconds: float):
+        self._ran += 1
+        self._waited.pop(sid, None)
+        c = self._cost.get(sid)
+        self._cost[sid] = seconds if c is None else 0.7 * c + 0.3 * seconds
+
+    def variant(self, sid: str):
+        """Pri úrovni >= 1 najlepší známy variant senzora, inak None (všetky)."""
+        if self.level < 1:
+            return None
+        wins = self._wins.get(sid)
+        if not wins:
+            return None
+        self.stats["variants_shed"] += 1
+        return wins.most_common(1)[0][0]
+
+    def won(self, sid: str, variant: str):
+        if variant:
+            self._wins.setdefault(sid, Counter())[variant] += 1
+
+    # --- diagnostika ---
+
+    def payload(self) -> dict:
+        return {"level": self.level, "name": self.name, "budget_s": round(self.budget_s, 2)}
+
+    def publish(self, mqtt):
+        p = self.payload()
+        connects = getattr(mqtt, "connects", 0)
+        if p == self._sent and connects == self._connects:
+            return
+        self._sent, self._connects = p, connects
+        out = dict(p, cycle_s=round(self.cycle_s, 3), cycle_s_max=round(self.cycle_s_max, 3),
+                   waiting=sorted(self._waited), **self.stats)
+        mqtt.pub(STATUS_TOPIC, "overload", json.dumps(out), retain=True)
+        mqtt.pub(STATUS_TOPIC, "overload_level", str(self.level), retain=True)
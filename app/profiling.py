@@ -0,0 +1,308 @@
+# app/profiling.py
+"""
+Profilovanie bežiaceho readera na požiadanie (bez rebuildu a extra logov).
+
+Ovládanie:
+  kill -USR1 <pid>                    zapne / vypne profiler (pri vypnutí dump)
+  kill -USR2 <pid>                    zapne / vypne tracemalloc (pri vypnutí dump)
+  python -m app.profiling start [--mem] [--interval-ms 10]
+  python -m app.profiling dump | stop | status
+    (lokálny Unix socket PROFILE_SOCKET, obslúži ho hlavná slučka readera)
+
+Profiler = vzorkovanie zásobníkov všetkých vlákien (sys._current_frames)
+každých PROFILE_INTERVAL_MS + časovače stage (wall aj CPU čas vlákna)
+okolo fetch, decode, variantov predspracovania, rekognície, state flush
+a MQTT publish. Vypnutý profiler stojí jedno porovnanie na stage.
+
+Výstup do PROFILE_DIR (default /app/debug):
+  profile-<ts>.collapsed   "vlákno;funkcia (súbor:riadok);... počet" pre flamegraph.pl / speedscope
+  stages-<ts>.txt          stage: počet, wall/CPU spolu, priemer, max (vnorené stage sa rátajú aj do nadradenej)
+  tracemalloc-<ts>.txt     najväčší rast alokácií od zapnutia + top tracebacky
+"""
+import os, sys, json, time, socket, signal, logging, threading, tracemalloc
+from collections import Counter
+from contextlib import nullcontext
+
+LOG = logging.getLogger("reader")
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/app/debug")
+PROFILE_SOCKET = os.getenv("PROFILE_SOCKET", "/app/state/profile.sock")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+TRACE_FRAMES = int(os.getenv("PROFILE_TRACE_FRAMES", "10"))
+
+_NULL = nullcontext()
+
+
+class _Stage:
+    __slots__ = ("prof", "name", "w", "c")
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.w = time.perf_counter()
+        self.c = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof.add(self.name, time.perf_counter() - self.w, time.thread_time() - self.c)
+        return False
+
+
+class Profiler:
+    def __init__(self, out_dir: str = PROFILE_DIR, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.out_dir = out_dir
+        self.interval_s = interval_ms / 1000.0
+        self.active = False
+        self.samples = Counter()
+        self.stages = {}               # name -> [počet, wall, cpu, max wall]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._t0 = None
+        self._mem_base = None
+        self._requests = []            # z handlerov signálov, vybaví poll()
+        self._sock = None
+
+    # --- časovače ---
+
+    def stage(self, name: str):
+        return _Stage(self, name) if self.active else _NULL
+
+    def add(self, name: str, wall: float, cpu: float):
+        with self._lock:
+            st = self.stages.get(name)
+            if st is None:
+                self.stages[name] = [1, wall, cpu, wall]
+            else:
+                st[0] += 1
+                st[1] += wall
+                st[2] += cpu
+                if wall > st[3]:
+                    st[3] = wall
+
+    # --- sampling ---
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        names, names_t = {}, 0.0
+        while not self._stop.wait(self.interval_s):
+            now = time.monotonic()
+            if now - names_t > 1.0:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                names_t = now
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    co = frame.f_code
+                    stack.append(f"{co.co_name} ({os.path.basename(co.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(tid, f"thread-{tid}"))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self, interval_ms: float = None, mem: bool = False) -> dict:
+        if interval_ms:
+            self.interval_s = float(interval_ms) / 1000.0
+        if mem:
+            self.start_mem()
+        if self.active:
+            return self.status()
+        self.samples.clear()
+        with self._lock:
+            self.stages.clear()
+        self._t0 = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+        self.active = True
+        LOG.info("profiler on (sampling every %.0f ms)", self.interval_s * 1000.0)
+        return self.status()
+
+    def stop(self) -> dict:
+        files = self.dump()
+        if self.active:
+            self.active = False
+            self._stop.set()
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            self._mem_base = None
+        LOG.info("profiler off")
+        return {"files": files}
+
+    def start_mem(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            self._mem_base = tracemalloc.take_snapshot()
+            LOG.info("tracemalloc on (%d frames)", TRACE_FRAMES)
+
+    def stop_mem(self) -> dict:
+        files = [self._dump_mem(time.strftime("%Y%m%d-%H%M%S"))] if tracemalloc.is_tracing() else []
+        tracemalloc.stop()
+        self._mem_base = None
+        LOG.info("tracemalloc off")
+        return {"files": files}
+
+    def status(self) -> dict:
+        return {"active": self.active, "tracemalloc": tracemalloc.is_tracing(),
+                "since": self._t0, "samples": sum(self.samples.values()),
+                "interval_ms": round(self.interval_s * 1000.0, 1), "dir": self.out_dir}
+
+    # --- dump ---
+
+    def dump(self) -> list:
+        os.makedirs(self.out_dir, exist_ok=True)
+        ts = time.strftime("%Y%m%d-%H%M%S")
+        files = []
+        if self.active:
+            files.append(self._write(f"profile-{ts}.collapsed",
+                                     "".join(f"{k} {n}\n" for k, n in self.samples.most_common())))
+            files.append(self._write(f"stages-{ts}.txt", self._stages_text()))
+        if tracemalloc.is_tracing():
+            files.append(self._dump_mem(ts))
+        if files:
+            LOG.info("profile dumped: %s", ", ".join(files))
+        return files
+
+    def _write(self, name: str, text: str) -> str:
+        path = os.path.join(self.out_dir, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def _stages_text(self) -> str:
+        with self._lock:
+            rows = sorted(self.stages.items(), key=lambda kv: -kv[1][1])
+        span = time.time() - (self._t0 or time.time())
+        out = [f"# {span:.1f}s profiled, {sum(self.samples.values())} samples\n",
+               f"{'stage':<24}{'count':>8}{'wall_s':>10}{'cpu_s':>10}{'avg_ms':>10}{'max_ms':>10}\n"]
+        for name, (n, wall, cpu, mx) in rows:
+            out.append(f"{name:<24}{n:>8}{wall:>10.3f}{cpu:>10.3f}{wall / n * 1000:>10.2f}{mx * 1000:>10.2f}\n")
+        return "".join(out)
+
+    def _dump_mem(self, ts: str) -> str:
+        skip = (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),            # vzorky profilera
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )
+        snap = tracemalloc.take_snapshot().filter_traces(skip)
+        cur, peak = tracemalloc.get_traced_memory()
+        out = [f"# traced {cur / 1e6:.1f} MB (peak {peak / 1e6:.1f} MB)\n\n## growth since start (lineno)\n"]
+        if self._mem_base is not None:
+            out += [f"{s}\n" for s in snap.compare_to(self._mem_base.filter_traces(skip), "lineno")[:30]]
+        out.append("\n## top tracebacks\n")
+        for s in snap.statistics("traceback")[:10]:
+            out.append(f"{s.count} blocks, {s.size / 1024:.1f} KiB\n")
+            out += [f"    {line}\n" for line in s.traceback.format()]
+        return self._write(f"tracemalloc-{ts}.txt", "".join(out))
+
+    # --- ovládanie ---
+
+    def install(self, path: str = PROFILE_SOCKET):
+        """Signály + control socket; volať z hlavného vlákna."""
+        try:
+            signal.signal(signal.SIGUSR1, lambda *_: self._requests.append("toggle"))
+            signal.signal(signal.SIGUSR2, lambda *_: self._requests.append("mem"))
+        except (ValueError, AttributeError) as e:
+            LOG.debug("profiler signals unavailable: %s", e)
+        if not path:
+            return
+        try:
+            if os.path.exists(path):
+                os.unlink(path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(path)
+            sock.setblocking(False)
+            self._sock = sock
+        except OSError as e:
+            LOG.warning("profiler: control socket %s unavailable: %s", path, e)
+
+    def handle(self, cmd: dict) -> dict:
+        op = cmd.get("cmd")
+        if op == "toggle":
+            return self.stop() if self.active else self.start()
+        if op == "mem":
+            if tracemalloc.is_tracing():
+                return self.stop_mem()
+            self.start_mem()
+            return self.status()
+        if op == "start":
+            return self.start(cmd.get("interval_ms"), bool(cmd.get("mem")))
+        if op == "stop":
+            return self.stop()
+        if op == "dump":
+            return {"files": self.dump()}
+        if op == "status":
+            return self.status()
+        return {"error": f"unknown command {op!r}"}
+
+    def poll(self):
+        """Vybaví požiadavky zo signálov a socketu (hlavná slučka, neblokuje)."""
+        while self._requests:
+            self._safe(lambda: self.handle({"cmd": self._requests.pop(0)}))
+        if self._sock is None:
+            return
+        while True:
+            try:
+                data, addr = self._sock.recvfrom(4096)
+            except (BlockingIOError, OSError):
+                return
+            try:
+                cmd = json.loads(data.decode("utf-8"))
+            except ValueError:
+                cmd = {"cmd": data.decode("utf-8", "replace").strip()}
+            res = self._safe(lambda: self.handle(cmd))
+            if addr:
+                try:
+                    self._sock.sendto(json.dumps(res).encode("utf-8"), addr)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _safe(fn):
+        try:
+            return fn()
+        except Exception as e:
+            LOG.warning("profiler: %s: %s", e.__class__.__name__, e)
+            return {"error": f"{e.__class__.__name__}: {e}"}
+
+
+PROFILER = Profiler()
+stage = PROFILER.stage
+
+
+def main():
+    import argparse, tempfile
+    ap = argparse.ArgumentParser(description="Control the reader profiler")
+    ap.add_argument("cmd", choices=["start", "stop", "dump", "status"])
+    ap.add_argument("--mem", action="store_true", help="aj tracemalloc (pri start)")
+    ap.add_argument("--interval-ms", type=float)
+    ap.add_argument("--socket", default=PROFILE_SOCKET)
+    ap.add_argument("--timeout", type=float, default=10.0)
+    args = ap.parse_args()
+
+    me = os.path.join(tempfile.mkdtemp(prefix="profctl."), "s")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(me)
+    sock.settimeout(args.timeout)
+    try:
+        sock.sendto(json.dumps({"cmd": args.cmd, "mem": args.mem,
+                                "interval_ms": args.interval_ms}).encode("utf-8"), args.socket)
+        print(json.dumps(json.loads(sock.recv(65536).decode("utf-8")), indent=2))
+    except socket.timeout:
+        raise SystemExit("no reply (reader busy or not running?)")
+    except OSError as e:
+        raise SystemExit(f"{args.socket}: {e}")
+    finally:
+        sock.close()
+        os.unlink(me)
+        os.rmdir(os.path.dirname(me))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 # app/pulse.py
 
+import logging
 import requests
 
+LOG = logging.getLogger("reader")
+
 class Pulse:
     def __init__(self):
         pass
@@ -17,6 +20,6 @@ class Pulse:
                 return data["counter"]
 
         else:
-            print(f"Error: {response.status_code}")
+            LOG.warning("pulse counter: HTTP %s", response.status_code)
 
         return 0
\ No newline at end of file
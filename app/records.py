@@ -0,0 +1,212 @@
+# app/records.py
+from app.config_watch import register_hook, affected_sensors
+
+# polia, ktoré sa ukladajú do state.json ako "<sid>.<pole>" (schéma ostáva plochá)
+FIELDS = ("t1", "t2", "t1_ocr", "t2_ocr", "t1_p", "t2_p", "t1_pub", "t2_pub", "total_pub",
+          "last_bucket", "ocr_raw", "ocr_conf", "imp")
+
+# polia, ktoré len rastú – pri prevzatí senzora z inej inštancie (app.shard) platí max
+MONOTONIC = ("t1_ocr", "t2_ocr", "t1_p", "t2_p", "t1_pub", "t2_pub", "total_pub")
+
+
+def _as_int(v):
+    return int(float(v))
+
+# typ poľa pri načítaní zo state (roi_web môže zapísať aj string)
+_TYPES = {
+    "t1": float, "t2": float,
+    "t1_ocr": _as_int, "t2_ocr": _as_int,
+    "t1_p": int, "t2_p": int,
+    "t1_pub": float, "t2_pub": float, "total_pub": _as_int,
+    "last_bucket": str, "ocr_raw": str, "ocr_conf": float,
+    "imp": int,
+}
+
+
+class SensorRecord:
+    """
+    Runtime stav jedného senzora. Hlavná slučka pracuje priamo s atribútmi
+    (bez skladania kľúčov a float()/int() pri každom prístupe); do State
+    sa zapíšu len zmenené polia v Records.sync().
+    None = kľúč v state.json zatiaľ nie je (napr. ešte nepublikované).
+
+    Energia registra je celé číslo pulzov t1_p/t2_p (presné aj pri
+    miliardách pulzov); kotva z OCR je t1_ocr * imp pulzov. t1/t2 (kWh)
+    sa z nich len odvodzujú v settle(): kým OCR nepotvrdí ďalšie celé kWh,
+    zobrazí sa nanajvýš <ocr>.999, ale pulzy nad tým sa nezahadzujú –
+    čakajú (najviac 1 kWh) a po potvrdení sa započítajú.
+
+    imp (impulzov na kWh) sa ukladá spolu s t1_p/t2_p – pulzy v state.json
+    sú v jednotkách uloženého imp a load() ich prepočíta na aktuálny.
+    """
+    __slots__ = FIELDS + ("sid", "ocr_t", "lost", "_saved")
+
+    def __init__(self, sid: str, imp: int = 1000):
+        self.sid = sid
+        self.ocr_t = 0.0          # čas posledného akceptovaného OCR (len v pamäti)
+        self.lost = 0             # pulzy nad limit čakania (OCR dlho nepotvrdilo)
+        for f in FIELDS:
+            setattr(self, f, None)
+        self.imp = imp            # impulzov na kWh (z configu)
+        self._saved = [None] * len(FIELDS)
+
+    def load(self, st, s: dict):
+        """Načítaj zo state; chýbajúce t1/t2 (+ _ocr) doplní initial_* z configu."""
+        sid, imp = self.sid, self.imp
+        for i, f in enumerate(FIELDS):
+            v = st.get(f"{sid}.{f}")
+            v = None if v is None else _TYPES[f](v)
+            setattr(self, f, v)
+            self._saved[i] = v
+        stored, self.imp = self.imp, imp
+        if stored and stored != imp:
+            # imp_per_kwh sa zmenil medzi behmi → pulzy v nových jednotkách
+            for reg in ("t1", "t2"):
+                p = getattr(self, f"{reg}_p")
+                if p is not None:
+                    setattr(self, f"{reg}_p", p * imp // stored)
+        for reg in ("t1", "t2"):
+            init = int(s.get(f"initial_{reg}", 0))
+            if getattr(self, f"{reg}_ocr") is None:
+                setattr(self, f"{reg}_ocr", init)
+            if getattr(self, reg) is None:
+                setattr(self, reg, float(init))
+            if getattr(self, f"{reg}_p") is None:
+                # migrácia zo staršieho state (len float kWh)
+                setattr(self, f"{reg}_p", round(getattr(self, reg) * self.imp))
+        return self
+
+    def set_external(self, field: str, value):
+        """Zmena zo state (ručná korekcia) – prevezme sa a nepovažuje sa za neuloženú."""
+        v = None if value is None else _TYPES[field](value)
+        self._saved[FIELDS.index(field)] = v
+        if field == "imp":
+            return    # jednotky určuje config; changes() zapíše vlastné imp späť
+        setattr(self, field, v)
+        if field in ("t1", "t2") and v is not None:
+            # ručne zadané kWh platí presne → prepočítaj počítadlo pulzov
+            setattr(self, f"{field}_p", round(v * self.imp))
+
+    # --- pulzy (celé čísla) ---
+    def cap(self, reg: str) -> int:
+        """Najvyšší stav pulzov, ktorý displej (posledné OCR) pripúšťa: <ocr>.999…"""
+        return (getattr(self, f"{reg}_ocr") + 1) * self.imp - 1
+
+    def pending(self, reg: str) -> int:
+        """Pulzy nad cap – čakajú na OCR potvrdenie ďalšieho celého kWh."""
+        return max(0, getattr(self, f"{reg}_p") - self.cap(reg))
+
+    def add_pulses(self, reg: str, n: int):
+        p = getattr(self, f"{reg}_p") + n
+        limit = self.cap(reg) + self.imp     # čakať môže najviac 1 kWh
+        if p > limit:
+            self.lost += p - limit
+            p = limit
+        setattr(self, f"{reg}_p", p)
+
+    def anchor(self, reg: str, kwh: int):
+        """OCR prečítalo celé kWh: pulzy sa zarovnajú do [kwh, kwh + 2) (prenos čakajúcich)."""
+        setattr(self, f"{reg}_ocr", kwh)
+        p = getattr(self, f"{reg}_p")
+        p = min(max(p, kwh * self.imp), self.cap(reg) + self.imp)
+        setattr(self, f"{reg}_p", p)
+
+    def settle(self):
+        """Odvodí t1/t2 (kWh) z pulzov, zastropené posledným OCR."""
+        imp = self.imp
+        self.t1 = min(self.t1_p, self.cap("t1")) / imp
+        self.t2 = min(self.t2_p, self.cap("t2")) / imp
+
+    def rescale(self, imp: int):
+        """Zmena imp_per_kwh v configu – zachovaj energiu v kWh."""
+        if imp != self.imp:
+            for reg in ("t1", "t2"):
+                setattr(self, f"{reg}_p", getattr(self, f"{reg}_p") * imp // self.imp)
+            self.imp = imp
+
+    def snapshot(self) -> dict:
+        return {f: getattr(self, f) for f in FIELDS if getattr(self, f) is not None}
+
+    def merge(self, snap: dict):
+        """Stav od predchádzajúceho vlastníka: rastúce polia max, ostatné prevezme."""
+        imp = int(snap.get("imp") or self.imp)
+        for f in FIELDS:
+            v = snap.get(f)
+            if v is None or f == "imp":
+                continue
+            v = _TYPES[f](v)
+            if f in ("t1_p", "t2_p") and imp != self.imp:
+                v = v * self.imp // imp
+            cur = getattr(self, f)
+            if f in MONOTONIC and cur is not None:
+                v = max(cur, v)
+            setattr(self, f, v)
+        self.settle()
+
+    def changes(self) -> dict:
+        out = {}
+        for i, f in enumerate(FIELDS):
+            v = getattr(self, f)
+            if v is not None and v != self._saved[i]:
+                out[f"{self.sid}.{f}"] = v
+                self._saved[i] = v
+        return out
+
+
+class Records:
+    """SensorRecord pre každý senzor, naviazané na jeden State."""
+
+    def __init__(self, st, imp_per_kwh: int = 1000):
+        self.st = st
+        self.imp = imp_per_kwh
+        self._recs = {}
+        self._syncing = False
+        st.subscribe(self._on_state)
+        register_hook(self._on_config)
+
+    def of(self, s: dict) -> SensorRecord:
+        rec = self._recs.get(s["id"])
+        if rec is None:
+            rec = SensorRecord(s["id"], self.imp).load(self.st, s)
+            self._recs[s["id"]] = rec
+        return rec
+
+    def drop(self, sid: str):
+        """Zabudni záznam (senzor prevzala iná inštancia, app.shard)."""
+        self._recs.pop(sid, None)
+
+    def set_imp(self, imp_per_kwh: int):
+        if imp_per_kwh != self.imp:
+            self.imp = imp_per_kwh
+            for rec in self._recs.values():
+                rec.rescale(imp_per_kwh)
+
+    def _on_state(self, changes: dict):
+        if self._syncing:
+            return   # vlastný zápis zo sync()
+        for key, v in changes.items():
+            sid, _, f = key.rpartition(".")
+            rec = self._recs.get(sid)
+            if rec is not None and f in _TYPES:
+                try:
+                    rec.set_external(f, v)
+                except (TypeError, ValueError):
+                    pass
+
+    def _on_config(self, diff: dict):
+        # zmenené initial_* / odstránené senzory → znovu načítať zo state
+        for sid in affected_sensors(diff):
+            self._recs.pop(sid, None)
+
+    def sync(self) -> int:
+        """Prepíše zmenené polia do State (jeden update). Vracia počet kľúčov."""
+        changes = {}
+        for rec in self._recs.values():
+            changes.update(rec.changes())
+        if changes:
+            self._syncing = True
+            try:
+                self.st.update(**changes)
+            finally:
+                self._syncing = False
+        return len(changes)
@@ -0,0 +1,78 @@
+# app/rectify.py
+import cv2
+import numpy as np
+from app.config_watch import register_hook, affected_sensors
+
+
+def order_quad(pts) -> np.ndarray:
+    """4 body v poradí ľavý-horný, pravý-horný, pravý-dolný, ľavý-dolný."""
+    p = np.asarray(pts, dtype=np.float32).reshape(4, 2)
+    s, d = p.sum(axis=1), np.diff(p, axis=1).ravel()
+    return np.float32([p[np.argmin(s)], p[np.argmin(d)], p[np.argmax(s)], p[np.argmax(d)]])
+
+
+def quad_size(quad: np.ndarray):
+    """Výstupná veľkosť (w, h) podľa dlhších z protiľahlých hrán."""
+    tl, tr, br, bl = quad
+    w = max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))
+    h = max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))
+    return max(1, int(round(w))), max(1, int(round(h)))
+
+
+def quad_bbox(quad: np.ndarray):
+    """Obalový obdĺžnik (x, y, w, h) – pre zarovnanie a staršie nástroje."""
+    return tuple(int(v) for v in cv2.boundingRect(np.round(quad).astype(np.int32)))
+
+
+class RectMap:
+    """
+    Predpočítaná mapa cv2.remap pre roi_quad: pre každý pixel
+    narovnaného výrezu súradnica v snímku. Rektifikácia snímku je
+    potom jediný remap (mapy vo fixed-point tvare CV_16SC2).
+    """
+    __slots__ = ("quad", "size", "map_x", "map_y", "_fixed", "_off")
+
+    def __init__(self, quad, size=None):
+        self.quad = order_quad(quad)
+        self.size = tuple(int(v) for v in size) if size else quad_size(self.quad)
+        w, h = self.size
+        dst = np.float32([[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]])
+        m = cv2.getPerspectiveTransform(dst, self.quad)          # výrez → snímok
+        u, v = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+        src = cv2.perspectiveTransform(np.dstack([u, v]).reshape(-1, 1, 2), m).reshape(h, w, 2)
+        self.map_x = np.ascontiguousarray(src[..., 0])
+        self.map_y = np.ascontiguousarray(src[..., 1])
+        self._fixed = None
+        self._off = None
+
+    def maps(self, dx: int = 0, dy: int = 0):
+        # posun kamery (app.align) sa pripočíta k mape; prepočet len pri zmene posunu
+        if self._off != (dx, dy):
+            self._fixed = cv2.convertMaps(self.map_x + dx, self.map_y + dy, cv2.CV_16SC2)
+            self._off = (dx, dy)
+        return self._fixed
+
+    def apply(self, img: np.ndarray, dx: int = 0, dy: int = 0) -> np.ndarray:
+        m1, m2 = self.maps(dx, dy)
+        return cv2.remap(img, m1, m2, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+# sid -> RectMap; zahodí sa pri reloade senzora (nový quad / veľkosť)
+_maps = {}
+
+
+@register_hook
+def _invalidate(diff: dict):
+    for sid in affected_sensors(diff):
+        _maps.pop(sid, None)
+
+
+def rect_map(s: dict):
+    """RectMap pre senzor s roi_quad, inak None."""
+    if not s.get("roi_quad"):
+        return None
+    m = _maps.get(s["id"])
+    if m is None:
+        m = RectMap(s["roi_quad"], s.get("roi_quad_size"))
+        _maps[s["id"]] = m
+    return m
@@ -0,0 +1,245 @@
+# app/shard.py
+"""
+Rozdelenie senzorov medzi viac inštancií readera (SHARD_ID=<meno>).
+
+Členstvo cez MQTT broker: každá inštancia publikuje retained heartbeat
+<SHARD_TOPIC>/members/<id> každých global.shard_heartbeat_s (default 5 s).
+Člen, od ktorého heartbeat nepríde global.shard_lease_s (default 3x
+heartbeat), vypadne. Senzor patrí prvému členovi v smere hodinových
+ručičiek na konzistentnom hash kruhu (SHARD_VNODES virtuálnych uzlov na
+člena) – pri páde/pridaní inštancie sa presunú len jej senzory.
+
+Odovzdanie stavu: vlastník po každom cykle publikuje retained
+<SHARD_TOPIC>/state/<sid> (polia SensorRecord + stav počítadla pulzov).
+Nový vlastník z neho prevezme register: rastúce polia ako max s lokálnym
+stavom, publikované t1/t2 navyše aspoň retained hodnoty z <base>/t1,
+<base>/t2 a <base>/state – flush_mqtt preto po prevzatí nikdy nepošle
+nižšiu hodnotu. Pulzy od posledného snapshotu (rozdiel počítadla) sa
+pripíšu do aktuálneho registra.
+
+Každá inštancia má vlastný state.json (STATE_PATH); <sid>.owner v ňom je
+SHARD_ID pri vlastnení a null po odovzdaní – roi_web podľa toho odmietne
+ručnú korekciu senzora, ktorý tejto inštancii už nepatrí.
+
+Bez SHARD_ID sa nič nemení (jedna inštancia vlastní všetko).
+"""
+import os, json, time, bisect, hashlib, logging, threading
+from app.startup import STATUS_TOPIC
+
+LOG = logging.getLogger("reader")
+
+SHARD_ID = os.getenv("SHARD_ID", "")
+SHARD_TOPIC = os.getenv("SHARD_TOPIC") or f"{STATUS_TOPIC}/shard"
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+
+class Ring:
+    """Konzistentný hash kruh s virtuálnymi uzlami."""
+
+    def __init__(self, members, vnodes: int = SHARD_VNODES):
+        points = sorted((_hash(f"{m}#{i}"), m) for m in members for i in range(vnodes))
+        self._keys = [k for k, _ in points]
+        self._owners = [m for _, m in points]
+
+    def owner(self, key: str):
+        if not self._keys:
+            return None
+        return self._owners[bisect.bisect(self._keys, _hash(key)) % len(self._keys)]
+
+
+class Shard:
+    def __init__(self, mqtt, member_id: str = SHARD_ID, topic: str = SHARD_TOPIC):
+        self.mqtt = mqtt
+        self.id = member_id
+        self.topic = topic
+        self.heartbeat_s = 5.0
+        self.lease_s = 15.0
+        self.owned = set()
+        self.stats = {"acquired": 0, "released": 0, "expired": 0}
+        self._lock = threading.Lock()  # dáta nižšie plní vlákno paho
+        self._seen = {}                # člen -> monotonic čas posledného heartbeatu
+        self._snaps = {}               # sid -> handoff snapshot
+        self._floor = {}               # sid -> {"t1": ..., "t2": ...} retained publikované
+        self._bases = {}               # mqtt_topic_base -> sid (odoberané)
+        self._ring = (None, None)      # (členovia, Ring)
+        self._sensors = {}             # sid -> s (vlastnené)
+        self._sent = {}                # sid -> posledný publikovaný snapshot
+        self._up_t = None
+        self._hb_t = 0.0
+        self._connects = -1
+        mqtt.subscribe(f"{topic}/members/+", self._on_member)
+        mqtt.subscribe(f"{topic}/state/+", self._on_snap)
+
+    @staticmethod
+    def params(cfg: dict):
+        g = cfg.get("global", {})
+        hb = float(g.get("shard_heartbeat_s", 5))
+        return hb, float(g.get("shard_lease_s", 3 * hb))
+
+    # --- správy z brokera (vlákno paho) ---
+
+    def _on_member(self, topic: str, payload: bytes, retained: bool):
+        mid = topic.rsplit("/", 1)[1]
+        if mid == self.id:
+            return
+        with self._lock:
+            if not payload:
+                self._seen.pop(mid, None)      # korektný odchod
+                return
+            try:
+                t = float(json.loads(payload).get("t", 0))
+            except (ValueError, AttributeError):
+                return
+            if retained and time.time() - t > self.lease_s:
+                return                         # retained heartbeat mŕtvej inštancie
+            self._seen[mid] = time.monotonic()
+
+    def _on_snap(self, topic: str, payload: bytes, retained: bool):
+        sid = topic.rsplit("/", 1)[1]
+        with self._lock:
+            if not payload:
+                self._snaps.pop(sid, None)
+                return
+            try:
+                self._snaps[sid] = json.loads(payload)
+            except ValueError:
+                pass
+
+    def _on_value(self, topic: str, payload: bytes, retained: bool):
+        base, _, key = topic.rpartition("/")
+        sid = self._bases.get(base)
+        if sid is None or not payload:
+            return
+        try:
+            if key == "state":
+                d = json.loads(payload)
+                vals = {"t1": float(d["t1"]), "t2": float(d["t2"])}
+            else:
+                vals = {key: float(payload)}
+        except (ValueError, KeyError, TypeError):
+            return
+        with self._lock:
+            fl = self._floor.setdefault(sid, {})
+            for k, v in vals.items():
+                fl[k] = max(fl.get(k, v), v)
+
+    def _watch(self, cfg: dict):
+        """Odoberaj publikované hodnoty všetkých senzorov (spodná hranica pre t?_pub)."""
+        for s in cfg["sensors"]:
+            base = s["mqtt_topic_base"]
+            if self._bases.get(base) != s["id"]:
+                self._bases[base] = s["id"]
+                for key in ("t1", "t2", "state"):
+                    self.mqtt.subscribe(f"{base}/{key}", self._on_value)
+
+    # --- členstvo ---
+
+    @property
+    def ready(self) -> bool:
+        """Po pripojení počkaj jeden heartbeat, kým prídu retained správy ostatných."""
+        return self._up_t is not None and time.monotonic() - self._up_t >= self.heartbeat_s
+
+    def members(self) -> list:
+        with self._lock:
+            return sorted({self.id} | set(self._seen))
+
+    def tick(self, cfg: dict):
+        """Heartbeat a expirácia leasov; volať raz za cyklus hlavnej slučky."""
+        self.heartbeat_s, self.lease_s = self.params(cfg)
+        if not getattr(self.mqtt, "connected", True):
+            return                             # bez brokera nevidno ani ostatných – nič neexpiruj
+        now = time.monotonic()
+        if self._up_t is None:
+            self._up_t = now
+        connects = getattr(self.mqtt, "connects", 0)
+        if now - self._hb_t >= self.heartbeat_s or connects != self._connects:
+            self._hb_t, self._connects = now, connects
+            hb = {"id": self.id, "t": round(time.time(), 1), "lease_s": self.lease_s,
+                  "sensors": sorted(self.owned)}
+            self.mqtt.pub(f"{self.topic}/members", self.id, json.dumps(hb), retain=True)
+        with self._lock:
+            dead = [m for m, t in self._seen.items() if now - t > self.lease_s]
+            for m in dead:
+                del self._seen[m]
+        for m in dead:
+            self.stats["expired"] += 1
+            LOG.warning("shard: member %s lease expired (%.0fs without heartbeat)", m, self.lease_s,
+                        extra={"member": m})
+
+    def leave(self):
+        """Korektný odchod: ostatní prevezmú senzory hneď, nie až po leasi."""
+        self.mqtt.pub(f"{self.topic}/members", self.id, "", retain=True)
+        time.sleep(0.2)                        # odošle vlákno paho, proces potom končí
+
+    # --- priradenie senzorov ---
+
+    def assign(self, cfg: dict, records, pulse_count: int = -1, reg: str = "t1") -> dict:
+        """
+        Kópia cfg len s vlastnenými senzormi. Novo pridelené senzory prevezmú
+        stav z handoff snapshotu, odobraté sa zabudnú (Records.drop).
+        """
+        self._watch(cfg)
+        if not self.ready:
+            return dict(cfg, sensors=[])
+        members = tuple(self.members())
+        if self._ring[0] != members:
+            self._ring = (members, Ring(members))
+        ring = self._ring[1]
+        sensors = [s for s in cfg["sensors"] if ring.owner(s["id"]) == self.id]
+        mine = {s["id"] for s in sensors}
+        for s in sensors:
+            if s["id"] not in self.owned:
+                self._acquire(s, records, pulse_count, reg)
+        for sid in self.owned - mine:
+            records.drop(sid)
+            records.st[f"{sid}.owner"] = None
+            self._sent.pop(sid, None)
+            self.stats["released"] += 1
+            LOG.info("[%s] shard: released", sid, extra={"sid": sid})
+        if mine != self.owned:
+            LOG.info("shard %s: %d/%d sensors, members %s", self.id, len(mine), len(cfg["sensors"]),
+                     ",".join(members))
+            self._hb_t = 0.0                   # nové priradenie hneď do heartbeatu
+        self.owned = mine
+        self._sensors = {s["id"]: s for s in sensors}
+        return dict(cfg, sensors=sensors)
+
+    def _acquire(self, s: dict, records, pulse_count: int, reg: str):
+        sid = s["id"]
+        rec = records.of(s)
+        with self._lock:
+            snap = self._snaps.get(sid)
+            floor = dict(self._floor.get(sid, {}))
+        added = 0
+        if snap:
+            rec.merge(snap)
+            counter = snap.get("pulses")
+            if counter is not None and pulse_count >= 0 and pulse_count > int(counter):
+                added = pulse_count - int(counter)
+                rec.add_pulses(reg, added)     # pulzy medzi snapshotom a prevzatím
+                rec.settle()
+        for r, v in floor.items():
+            pub = getattr(rec, f"{r}_pub")
+            setattr(rec, f"{r}_pub", v if pub is None else max(pub, v))
+        records.st[f"{sid}.owner"] = self.id
+        self.stats["acquired"] += 1
+        LOG.info("[%s] shard: acquired (from %s, +%d pulses, t1_pub=%s t2_pub=%s)", sid,
+                 (snap or {}).get("owner", "-"), added, rec.t1_pub, rec.t2_pub, extra={"sid": sid})
+
+    def publish_state(self, records, pulse_count: int):
+        """Handoff snapshot vlastnených senzorov (len zmenené, retained)."""
+        if not getattr(self.mqtt, "connected", True):
+            return
+        for sid, s in self._sensors.items():
+            if sid not in self.owned:
+                continue
+            doc = dict(records.of(s).snapshot(), owner=self.id, pulses=pulse_count)
+            if doc == self._sent.get(sid):
+                continue
+            self._sent[sid] = doc
+            self.mqtt.pub(f"{self.topic}/state", sid, json.dumps(dict(doc, t=round(time.time(), 1))),
+                          retain=True)
@@ -0,0 +1,128 @@
+# app/startup.py
+"""
+Postupný štart readera.
+
+Lacné časti (state, pulzy, MQTT, publish posledných hodnôt) bežia hneď;
+pomalé (import paddle + načítanie modelov, HDO kalendár z CEZ) sa
+načítajú v pozadí cez Deferred. Stav pripravenosti a časy štartu sa
+publikujú retained na <STATUS_TOPIC>/status (JSON), pri výpadku
+readera tam broker pošle {"state": "offline"} (LWT).
+"""
+import os, json, time, threading, logging
+
+LOG = logging.getLogger("reader")
+
+STATUS_TOPIC = os.getenv("STATUS_TOPIC", "vision-reader")
+OFFLINE = json.dumps({"state": "offline"})
+
+
+class Deferred:
+    """Spustí load() vo vlastnom vlákne; výsledok v .value, stav v .status."""
+
+    def __init__(self, name: str, load):
+        self.name = name
+        self.value = None
+        self.error = None
+        self.elapsed_s = None
+        self._load = load
+        self._done = threading.Event()
+        threading.Thread(target=self._run, name=f"load-{name}", daemon=True).start()
+
+    def _run(self):
+        t0 = time.perf_counter()
+        try:
+            self.value = self._load()
+        except Exception as e:
+            self.error = f"{e.__class__.__name__}: {e}"
+            LOG.error("%s failed to load: %s", self.name, self.error)
+        finally:
+            self.elapsed_s = time.perf_counter() - t0
+            self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() and self.error is None
+
+    @property
+    def status(self) -> str:
+        if not self._done.is_set():
+            return "loading"
+        return "error" if self.error else "ready"
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+
+class Readiness:
+    """
+    Časy štartu a stav podsystémov; publish() pošle status len pri zmene
+    (alebo po novom pripojení k brokeru, keď LWT prepísal retained stav).
+    """
+
+    def __init__(self, t0: float, import_s: float):
+        self.t0 = t0                    # time.perf_counter() pred prvým importom
+        self.timings = {"import_s": round(import_s, 3)}
+        self.loaders = []
+        self._sent = None
+        self._connects = -1
+        self._ready_logged = False
+
+    def mark(self, stage: str) -> float:
+        """Zaznamená čas od štartu procesu, napr. mark("core") → timings["core_s"]."""
+        dt = time.perf_counter() - self.t0
+        self.timings[f"{stage}_s"] = round(dt, 3)
+        return dt
+
+    def track(self, loader: Deferred) -> Deferred:
+        self.loaders.append(loader)
+        return loader
+
+    @staticmethod
+    def will():
+        return f"{STATUS_TOPIC}/status", OFFLINE
+
+    def payload(self) -> dict:
+        parts = {d.name: d.status for d in self.loaders}
+        if all(p == "ready" for p in parts.values()):
+            state = "ready"
+        elif any(p == "loading" for p in parts.values()):
+            state = "starting"
+        else:
+            state = "degraded"
+        timings = dict(self.timings)
+        for d in self.loaders:
+            if d.elapsed_s is not None:
+                timings[f"{d.name}_load_s"] = round(d.elapsed_s, 3)
+        out = {"state": state, "parts": parts, "timings": timings}
+        errors = {d.name: d.error for d in self.loaders if d.error}
+        if errors:
+            out["errors"] = errors
+        return out
+
+    def watch(self, mqtt):
+        """
+        Viac inštancií na jednom STATUS_TOPIC (app.shard): LWT padnutej
+        inštancie prepíše status na offline – živá ho pri ďalšom publish obnoví.
+        """
+        def on_status(topic, payload, retained):
+            if payload.decode("utf-8", "replace") == OFFLINE:
+                self._sent = None
+        mqtt.subscribe(f"{STATUS_TOPIC}/status", on_status)
+
+    def publish(self, mqtt):
+        p = self.payload()
+        if p["state"] != "starting" and not self._ready_logged:
+            self._ready_logged = True
+            self.timings["ready_s"] = round(time.perf_counter() - self.t0, 3)
+            p["timings"]["ready_s"] = self.timings["ready_s"]
+            LOG.info("reader %s in %.2fs (%s)", p["state"], self.timings["ready_s"],
+                     ", ".join(f"{k}={v}" for k, v in p["timings"].items()))
+        connects = getattr(mqtt, "connects", 0)
+        if p == self._sent and connects == self._connects:
+            return
+        self._sent, self._connects = p, connects
+        mqtt.pub(STATUS_TOPIC, "status", json.dumps(p), retain=True)
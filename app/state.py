@@ -1,4 +1,9 @@
-import json, os, threading, tempfile, shutil
+import json, os, threading, tempfile, shutil, fcntl
+from contextlib import contextmanager
+
+_MISSING = object()
+
+VERSION_KEY = "_version"
 
 class State:
     """
@@ -7,14 +12,50 @@ class State:
         st = State("/app/state/state.json")
         x  = st.get("electricity_main.t1", 0)
         st["electricity_main.t1"] = 12345
+
+    Súbor zdieľa reader aj roi_web (iné kontajnery), preto:
+    - každý zápis ide pod medziprocesovým zámkom (flock na <path>.lock),
+    - zapisujú sa len zmenené kľúče (merge do aktuálneho obsahu súboru),
+    - súbor nesie "_version", ktorá sa pri každom zápise zvýši
+      (compare_and_update pre CAS).
+    S autoflush=False sa zmeny držia v pamäti a zapíšu až vo flush();
+    kľúče, ktoré medzitým zmenil niekto iný, majú prednosť pred našimi.
     """
-    def __init__(self, path: str):
+    def __init__(self, path: str, autoflush: bool = True):
         self.path = path
+        self.lock_path = path + ".lock"
+        self.autoflush = autoflush
         self._lock = threading.Lock()
+        self._listeners = []
+
+        self._data = {}      # aktuálny pohľad (súbor + naše neuložené zmeny)
+        self._base = {}      # obsah súboru pri poslednom načítaní/zápise
+        self._dirty = {}     # naše neuložené zmeny
+        self._sig = None
+
         os.makedirs(os.path.dirname(self.path), exist_ok=True)
         # inicializácia prázdneho JSON, ak neexistuje
-        if not os.path.exists(self.path):
-            self._atomic_write({})
+        with self._file_lock():
+            if not os.path.exists(self.path):
+                self._atomic_write({VERSION_KEY: 0})
+        self.refresh()
+
+    @contextmanager
+    def _file_lock(self):
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o664)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _stat(self):
+        try:
+            s = os.stat(self.path)
+            return (s.st_mtime_ns, s.st_size, s.st_ino)
+        except FileNotFoundError:
+            return None
 
     def _atomic_write(self, obj: dict):
         d = os.path.dirname(self.path)
@@ -31,34 +72,133 @@ class State:
                 pass
 
     def _read(self) -> dict:
-        with open(self.path, "r") as f:
-            try:
+        try:
+            with open(self.path, "r") as f:
                 return json.load(f)
-            except json.JSONDecodeError:
-                return {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _merge_write(self, changes: dict, expected_version=None):
+        """
+        Pod zámkom: načítaj súbor, aplikuj len `changes`, zvýš verziu a zapíš.
+        Vracia (ok, data). Ak expected_version nesedí, nič nezapíše.
+        """
+        with self._file_lock():
+            data = self._read()
+            if expected_version is not None and data.get(VERSION_KEY, 0) != expected_version:
+                return False, data
+            data.update(changes)
+            data[VERSION_KEY] = int(data.get(VERSION_KEY, 0)) + 1
+            self._atomic_write(data)
+            self._sig = self._stat()
+            return True, data
 
-    def _write(self, data: dict):
-        self._atomic_write(data)
+    def _notify(self, changes: dict):
+        for fn in self._listeners:
+            try:
+                fn(changes)
+            except Exception:
+                pass
 
     # --- verejné API ---
-    def get(self, key: str, default=None):
+    def subscribe(self, fn):
+        """fn(changes: dict) sa zavolá po každom zápise so skutočne zmenenými kľúčmi."""
+        self._listeners.append(fn)
+
+    @property
+    def version(self) -> int:
+        return int(self._base.get(VERSION_KEY, 0))
+
+    def refresh(self) -> bool:
+        """Načíta súbor znova, ak ho medzitým zmenil iný proces. Neuložené zmeny ostávajú."""
+        sig = self._stat()
+        if sig == self._sig:
+            return False
         with self._lock:
             data = self._read()
-            return data.get(key, default)
+            self._sig = sig
+            external = {k: v for k, v in data.items()
+                        if self._base.get(k, _MISSING) != v and k != VERSION_KEY}
+            for k in external:
+                self._dirty.pop(k, None)   # externá zmena má prednosť
+            self._base = data
+            self._data = dict(data)
+            self._data.update(self._dirty)
+        if external:
+            self._notify(external)
+        return True
+
+    def flush(self) -> int:
+        """Zapíše neuložené zmeny (merge). Vracia počet zapísaných kľúčov."""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            dirty, self._dirty = self._dirty, {}
+            base = self._base
+        with self._file_lock():
+            cur = self._read()
+            # kľúč zmenený iným procesom od nášho načítania → jeho hodnota vyhráva
+            changes = {k: v for k, v in dirty.items()
+                       if cur.get(k, _MISSING) == base.get(k, _MISSING)}
+            # cudzie zmeny od posledného načítania – refresh() ich už neuvidí
+            external = {k: v for k, v in cur.items()
+                        if base.get(k, _MISSING) != v and k != VERSION_KEY and k not in changes}
+            cur.update(changes)
+            cur[VERSION_KEY] = int(cur.get(VERSION_KEY, 0)) + 1
+            self._atomic_write(cur)
+            self._sig = self._stat()
+        with self._lock:
+            for k in external:
+                self._dirty.pop(k, None)   # externá zmena má prednosť
+            self._base = cur
+            self._data = dict(cur)
+            self._data.update(self._dirty)
+        if external:
+            self._notify(external)
+        return len(changes)
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            return self._data.get(key, default)
 
     def __getitem__(self, key: str):
         with self._lock:
-            data = self._read()
-            return data[key]
+            return self._data[key]
 
     def __setitem__(self, key: str, value):
-        with self._lock:
-            data = self._read()
-            data[key] = value
-            self._write(data)
+        self.update(**{key: value})
 
     def update(self, **kwargs):
         with self._lock:
-            data = self._read()
-            data.update(kwargs)
-            self._write(data)
+            changes = {k: v for k, v in kwargs.items() if self._data.get(k, _MISSING) != v}
+            self._data.update(changes)
+            if not self.autoflush:
+                self._dirty.update(changes)
+        if not changes:
+            return
+        if self.autoflush:
+            # priamy zápis (napr. ručná korekcia) – zlúči sa bez ohľadu na cudzie zmeny
+            _, data = self._merge_write(changes)
+            with self._lock:
+                self._base = data
+                self._data = dict(data)
+                self._data.update(self._dirty)
+        self._notify(changes)
+
+    def compare_and_update(self, changes: dict, expected_version: int):
+        """
+        CAS: zapíše `changes` len ak verzia súboru == expected_version.
+        Vracia (ok, aktuálne dáta zo súboru).
+        """
+        ok, data = self._merge_write(changes, expected_version)
+        with self._lock:
+            self._base = data
+            self._data = dict(data)
+            self._data.update(self._dirty)
+        if ok:
+            self._notify(changes)
+        return ok, data
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._data)
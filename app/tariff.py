@@ -1,7 +1,10 @@
 # app/tariff.py
+import os
+import json
 import datetime
 import requests
 import logging
+from app import clock
 
 try:
     # python 3.9+
@@ -14,7 +17,8 @@ _LOGGER = logging.getLogger("reader")
 
 class Tariff:
 
-    BASE_URL = "https://www.cezdistribuce.cz/webpublic/distHdo/adam/containers/"
+    BASE_URL = os.getenv("CEZ_URL", "https://www.cezdistribuce.cz/webpublic/distHdo/adam/containers/")
+    CACHE_PATH = os.getenv("HDO_CACHE", "/app/state/hdo.json")
     CEZ_TIMEZONE = ZoneInfo("Europe/Prague")
 
     region = "morava"
@@ -22,9 +26,35 @@ class Tariff:
 
     responseData = {}
 
-    def __init__(self):
-        self.responseData = self.get_from_web()
-
+    def __init__(self, data=None):
+        # data: HDO kalendár v tvare CEZ "data" (replay/testy); inak z webu
+        self.responseData = data if data is not None else self.get_from_web()
+
+    @classmethod
+    def from_cache(cls, path: str = None):
+        """Okamžitý štart z posledného uloženého kalendára (bez webu); prázdny ak nie je."""
+        path = path or cls.CACHE_PATH
+        try:
+            with open(path) as f:
+                return cls(data=json.load(f))
+        except (OSError, ValueError):
+            return cls(data=[])
+
+    def refresh(self, path: str = None):
+        """Načíta kalendár z CEZ (pomalé, volá sa v pozadí) a uloží ho do cache."""
+        data = self.get_from_web()
+        if not data:
+            raise RuntimeError("no HDO calendar from CEZ (keeping cached)")
+        self.responseData = data
+        path = path or self.CACHE_PATH
+        try:
+            tmp = path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            _LOGGER.warning("HDO cache not saved (%s): %s", path, e)
+        return data
 
     def getCorrectRegionName(self, region):
         "validate region"
@@ -64,7 +94,7 @@ class Tariff:
         :param daytime: relevant time in "Europe/Prague" timezone to check if HDO is on or not
         :return: bool
         """
-        daytime = datetime.datetime.now(tz=self.CEZ_TIMEZONE)
+        daytime = clock.datetime_now(tz=self.CEZ_TIMEZONE)
         # select Mon-Fri schedule or Sat-Sun schedule according to current date
         if daytime.weekday() < 5:
             dayCalendar = next(
@@ -98,5 +128,7 @@ class Tariff:
                             self.code, response.status_code)
 
     def is_t2(self):
+        if not self.responseData:
+            return False   # kalendár ešte nie je (štart bez cache) → T1
         return self.isHdo(self.responseData)
        
\ No newline at end of file
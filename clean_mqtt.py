@@ -1,11 +1,26 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+Vymazanie RETAINED správ pod topic prefixom (publish retain=True, prázdny payload).
+
+Discovery končí, keď broker prestane posielať retained správy (--quiet-seconds
+ticha po SUBACK), najneskôr po --discover-seconds. Mazanie je pipelinované:
+naraz najviac --window nepotvrdených publishov (pri QoS 0 neodoslaných).
+
+    python clean_mqtt.py --host 10.0.0.5 --prefix 'ha/electricity/#' --dry-run
+    python clean_mqtt.py --host 10.0.0.5 --prefix 'ha/#' --exclude 'ha/+/status'
+    python clean_mqtt.py --host 10.0.0.5 --prefix 'ha/#' --prefix 'homeassistant/#' \\
+        --sync config/sensors.yaml          # len témy, ktoré aktuálny config už nepublikuje
+"""
 
 import argparse
+import os
 import ssl
+import statistics
 import sys
+import threading
 import time
-from typing import Set
+from typing import Dict, Set
 
 import paho.mqtt.client as mqtt
 from paho.mqtt.client import MQTTMessage
@@ -30,21 +45,73 @@ def parse_args():
     p.add_argument("--cafile", help="Cesta k CA certifikátu (ak treba)")
     p.add_argument("--certfile", help="Client cert (ak treba mTLS)")
     p.add_argument("--keyfile", help="Client key (ak treba mTLS)")
-    p.add_argument("--prefix", default=DEFAULT_PREFIX, help="Topic prefix (napr. ha/electricity/#)")
+    p.add_argument("--prefix", action="append",
+                   help=f"Topic prefix, dá sa opakovať (default {DEFAULT_PREFIX})")
+    p.add_argument("--include", action="append", default=[],
+                   help="Mazať len témy zodpovedajúce MQTT vzoru (+/#), dá sa opakovať")
+    p.add_argument("--exclude", action="append", default=[],
+                   help="Nemazať témy zodpovedajúce MQTT vzoru (+/#), dá sa opakovať")
+    p.add_argument("--sync", metavar="SENSORS_YAML",
+                   help="Mazať len témy, ktoré reader pri tomto configu nepublikuje "
+                        "(STATUS_TOPIC/SHARD_TOPIC z prostredia ako pri readeri)")
     p.add_argument("--qos", type=int, default=1, choices=[0, 1, 2], help="QoS pre sub/pub")
-    p.add_argument("--discover-seconds", type=float, default=2.0,
-                   help="Ako dlho čakať na retained správy pri discovery (s)")
+    p.add_argument("--window", type=int, default=200,
+                   help="Max. počet rozpracovaných (nepotvrdených) mazaní naraz")
+    p.add_argument("--discover-seconds", type=float, default=30.0,
+                   help="Najdlhšie čakanie na retained správy pri discovery (s)")
+    p.add_argument("--quiet-seconds", type=float, default=0.5,
+                   help="Discovery končí po takomto tichu (žiadna retained správa) po SUBACK (s)")
+    p.add_argument("--timeout", type=float, default=60.0,
+                   help="Najdlhšie čakanie na potvrdenie zvyšných mazaní (s)")
     p.add_argument("--dry-run", action="store_true", help="Nemaž – iba vypíš, čo by sa mazalo")
     p.add_argument("--verbose", "-v", action="store_true", help="Viac logov")
-    return p.parse_args()
+    args = p.parse_args()
+    args.prefix = args.prefix or [DEFAULT_PREFIX]
+    if args.window < 1:
+        p.error("--window must be >= 1")
+    return args
+
+
+def matches_any(patterns, topic: str) -> bool:
+    return any(mqtt.topic_matches_sub(p, topic) for p in patterns)
+
+
+def sync_filter(path: str):
+    """Predikát "reader túto tému pri configu publikuje" (takú --sync nemaže)."""
+    from app.config import load_config, validate_config
+    from app.ha_discovery import retained_topics
+    from app.startup import STATUS_TOPIC
+    from app.shard import SHARD_TOPIC
+
+    cfg = validate_config(load_config(path))
+    produced = retained_topics(cfg)
+
+    def keep(topic: str) -> bool:
+        if topic in produced:
+            return True
+        if mqtt.topic_matches_sub(f"{SHARD_TOPIC}/state/+", topic):
+            return False               # handoff stav odobratého senzora
+        # status, overload, heartbeaty inštancií – nezávisia od senzorov
+        return mqtt.topic_matches_sub(f"{STATUS_TOPIC}/#", topic)
+
+    return keep, len(produced)
+
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
 
 
 class RetainedCleaner:
     def __init__(self, args: argparse.Namespace):
         self.args = args
 
-        # Paho 2.x – používame novú Callback API verziu, aby zmizlo varovanie
-        self.client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+        # Paho 2.x – nová Callback API verzia (bez varovania); paho 1.x (requirements.txt) bez nej
+        api = getattr(mqtt, "CallbackAPIVersion", None)
+        if api is not None:
+            self.client = mqtt.Client(callback_api_version=api.VERSION2)
+        else:
+            self.client = mqtt.Client()
 
         if args.username:
             self.client.username_pw_set(args.username, args.password or "")
@@ -58,15 +125,32 @@ class RetainedCleaner:
                 ctx.verify_mode = ssl.CERT_NONE
             self.client.tls_set_context(ctx)
 
-        # Callbacky pre 2.x (MQTT v3.1.1/v5 kompatibilné signatúry)
+        # okno riadime sami; paho nech nič nedrží vo vlastnej fronte navyše
+        self.client.max_inflight_messages_set(args.window)
+
+        # Callbacky (signatúry kompatibilné s paho 1.x aj 2.x)
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         self.client.on_disconnect = self.on_disconnect
+        self.client.on_subscribe = self.on_subscribe
+        self.client.on_publish = self.on_publish
 
         self.retained_topics: Set[str] = set()
         self.connected = False
         self.connect_rc = None
 
+        self._lock = threading.Lock()
+        self._last_retained = 0.0        # čas poslednej retained správy (discovery)
+        self._sub_sent: Set[int] = set()
+        self._sub_acked: Set[int] = set()    # SUBACK môže prísť skôr, než subscribe() vráti mid
+        self._suback_t = 0.0
+        self._slots = threading.Semaphore(args.window)
+        self._inflight: Dict[int, tuple] = {}   # mid -> (téma, čas odoslania)
+        self._early: Dict[int, float] = {}      # potvrdenie prišlo skôr, než publish() vrátil mid
+        self.acked = 0
+        self.failed = []
+        self.latency = []
+
     # -------- MQTT callbacks --------
     def on_connect(self, client, userdata, flags, reason_code, properties=None, *args, **kwargs):
         # reason_code môže byť int alebo objekt – skúsime int
@@ -91,12 +175,118 @@ class RetainedCleaner:
     def on_message(self, client, userdata, msg: MQTTMessage):
         # Pri subscribe na prefix broker pošle RETAINED správy (msg.retain == True)
         if msg.retain:
-            self.retained_topics.add(msg.topic)
+            with self._lock:
+                self.retained_topics.add(msg.topic)
+                self._last_retained = time.monotonic()
             if self.args.verbose:
                 print(f"[retained] {msg.topic} (payload {len(msg.payload)} B)")
 
+    def on_subscribe(self, client, userdata, mid, *args, **kwargs):
+        with self._lock:
+            self._sub_acked.add(mid)
+            self._suback_t = time.monotonic()
+
+    def on_publish(self, client, userdata, mid, *args, **kwargs):
+        now = time.monotonic()
+        with self._lock:
+            item = self._inflight.pop(mid, None)
+            if item is None:
+                self._early[mid] = now
+                return
+            self.acked += 1
+            self.latency.append(now - item[1])
+        self._slots.release()
+
+    # -------- Discovery --------
+    def discover(self) -> Set[str]:
+        """Subscribe na prefixy a zbieraj retained, kým broker neutíchne."""
+        with self._lock:
+            self.retained_topics = set()
+            self._last_retained = 0.0
+            self._suback_t = 0.0
+            self._sub_sent = set()
+            self._sub_acked = set()
+        for prefix in self.args.prefix:
+            if self.args.verbose:
+                print(f"[subscribe] {prefix} (QoS {self.args.qos})")
+            rc, mid = self.client.subscribe(prefix, qos=self.args.qos)
+            if rc == mqtt.MQTT_ERR_SUCCESS:
+                with self._lock:
+                    self._sub_sent.add(mid)
+
+        t0 = time.monotonic()
+        while True:
+            time.sleep(0.02)
+            now = time.monotonic()
+            with self._lock:
+                subscribed = self._sub_sent <= self._sub_acked
+                last = max(self._suback_t, self._last_retained)
+            if subscribed and now - last >= self.args.quiet_seconds:
+                break
+            if now - t0 >= self.args.discover_seconds:
+                print(f"⚠️ Discovery prerušené po {self.args.discover_seconds:.0f}s "
+                      f"(broker stále posiela retained správy).", file=sys.stderr)
+                break
+        for prefix in self.args.prefix:
+            self.client.unsubscribe(prefix)
+        with self._lock:
+            return set(self.retained_topics)
+
+    # -------- Mazanie --------
+    def delete(self, topics) -> float:
+        """Pipelinované mazanie s oknom --window; vracia trvanie (s)."""
+        t0 = time.monotonic()
+        topics = list(topics)
+        for i, t in enumerate(topics):
+            if not self._slots.acquire(timeout=self.args.timeout):
+                print(f"⚠️ Žiadne potvrdenie {self.args.timeout:.0f}s, okno plné – končím.", file=sys.stderr)
+                # neodoslané aj nepotvrdené sú zlyhania – inak by run() vrátil 0
+                with self._lock:
+                    self.failed += [(u, "timeout") for u, _ in self._inflight.values()]
+                    self.failed += [(u, "timeout") for u in topics[i:]]
+                return time.monotonic() - t0
+            sent = time.monotonic()
+            # publish() mimo zámku – paho volá on_publish pod vlastným mutexom
+            info = self.client.publish(t, payload=b"", qos=self.args.qos, retain=True)
+            with self._lock:
+                if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                    self.failed.append((t, info.rc))
+                    release = True
+                else:
+                    early = self._early.pop(info.mid, None)
+                    if early is None:
+                        self._inflight[info.mid] = (t, sent)
+                        release = False
+                    else:
+                        self.acked += 1
+                        self.latency.append(early - sent)
+                        release = True
+            if release:
+                self._slots.release()
+            if self.args.verbose:
+                print(f"[deleted] {t} (rc={info.rc})")
+
+        # dobeh okna
+        deadline = time.monotonic() + self.args.timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._inflight:
+                    break
+            time.sleep(0.01)
+        with self._lock:
+            self.failed += [(t, "timeout") for t, _ in self._inflight.values()]
+        return time.monotonic() - t0
+
     # -------- High-level flow --------
     def run(self):
+        keep, n_produced = None, 0
+        if self.args.sync:
+            try:
+                keep, n_produced = sync_filter(self.args.sync)
+            except (OSError, ValueError) as e:
+                print(f"Chyba v {self.args.sync}: {e}", file=sys.stderr)
+                sys.exit(2)
+
         try:
             self.client.connect(self.args.host, self.args.port, keepalive=30)
         except Exception as e:
@@ -116,60 +306,68 @@ class RetainedCleaner:
             self.client.loop_stop()
             sys.exit(2)
 
-        # 1) Discovery (subscribe na prefix, čakáme na retained)
-        if self.args.verbose:
-            print(f"[subscribe] {self.args.prefix} (QoS {self.args.qos})")
-
-        res = self.client.subscribe(self.args.prefix, qos=self.args.qos)
-        if isinstance(res, tuple):
-            rc, mid = res
-            if self.args.verbose:
-                print(f"[subscribe] rc={rc}, mid={mid}")
-
-        time.sleep(self.args.discover_seconds)
-
-        self.client.unsubscribe(self.args.prefix)
-
-        if self.retained_topics:
-            print("Nájdené RETAINED topicy:")
-            for t in sorted(self.retained_topics):
-                print(f"  - {t}")
+        # 1) Discovery (subscribe na prefixy, čakáme, kým retained správy neutíchnu)
+        t = time.monotonic()
+        found = self.discover()
+        discover_s = time.monotonic() - t
+
+        targets = sorted(x for x in found
+                         if (not self.args.include or matches_any(self.args.include, x))
+                         and not matches_any(self.args.exclude, x)
+                         and (keep is None or not keep(x)))
+
+        print(f"Nájdených RETAINED tém: {len(found)} za {discover_s:.2f}s"
+              f" ({', '.join(self.args.prefix)})")
+        if keep is not None:
+            print(f"--sync {self.args.sync}: config publikuje {n_produced} tém")
+        if not targets:
+            print("Nič na mazanie (žiadne retained správy po filtroch).")
         else:
-            print("Nenašli sa žiadne retained správy pod zadaným prefixom.")
+            print(f"Na mazanie: {len(targets)}")
+            shown = targets if self.args.verbose or self.args.dry_run else targets[:50]
+            for x in shown:
+                print(f"  - {x}")
+            if len(shown) < len(targets):
+                print(f"  … a {len(targets) - len(shown)} ďalších (-v vypíše všetky)")
 
         # 2) Mazanie
-        if self.retained_topics and not self.args.dry_run:
-            print("\nMazanie… (retain + prázdny payload)")
-            for t in sorted(self.retained_topics):
-                info = self.client.publish(t, payload=b"", qos=self.args.qos, retain=True)
-                info.wait_for_publish()
-                if self.args.verbose:
-                    print(f"[deleted] {t} (rc={info.rc})")
-
-            # Overenie – krátke opätovné discovery
-            self.retained_topics.clear()
-            self.client.subscribe(self.args.prefix, qos=self.args.qos)
-            time.sleep(1.0)
-            self.client.unsubscribe(self.args.prefix)
-
-            if not self.retained_topics:
-                print("\n✅ Hotovo: pod prefixom už nezostali žiadne retained správy.")
+        if targets and not self.args.dry_run:
+            print(f"\nMazanie… (retain + prázdny payload, okno {self.args.window}, QoS {self.args.qos})")
+            delete_s = self.delete(targets)
+            rate = len(targets) / delete_s if delete_s > 0 else float("inf")
+            line = f"Zmazaných {self.acked}/{len(targets)} za {delete_s:.2f}s ({rate:.0f} tém/s)"
+            if self.latency:
+                line += (f", potvrdenie p50={pct(self.latency, .5) * 1000:.1f}ms"
+                         f" p95={pct(self.latency, .95) * 1000:.1f}ms"
+                         f" max={max(self.latency) * 1000:.1f}ms"
+                         f" avg={statistics.mean(self.latency) * 1000:.1f}ms")
+            print(line)
+            for x, rc in self.failed[:20]:
+                print(f"  ✗ {x} (rc={rc})")
+
+            # Overenie – opätovné discovery, stačí pozrieť zmazané témy
+            remaining = sorted(self.discover() & set(targets))
+            if not remaining:
+                print("\n✅ Hotovo: zmazané témy už nie sú retained.")
             else:
-                print("\n⚠️ Niektoré retained správy sa stále objavujú (možno ich znovu publikuje nejaký zdroj):")
-                for t in sorted(self.retained_topics):
-                    print(f"  - {t}")
-        elif self.args.dry_run and self.retained_topics:
+                print(f"\n⚠️ {len(remaining)} tém je stále retained (možno ich znovu publikuje nejaký zdroj):")
+                for x in remaining:
+                    print(f"  - {x}")
+        elif self.args.dry_run and targets:
             print("\n(dry-run) Nič som nezmazal. Spusti bez --dry-run, ak chceš zmazať.")
 
         # Upratanie (odpoj najprv, potom zastav loop)
         self.client.disconnect()
         self.client.loop_stop()
+        return 1 if self.failed else 0
 
 
 def main():
+    # --sync importuje app.* (config, témy readera)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
     args = parse_args()
     cleaner = RetainedCleaner(args)
-    cleaner.run()
+    sys.exit(cleaner.run())
 
 
 if __name__ == "__main__":
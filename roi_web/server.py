@@ -1,29 +1,140 @@
-import json, os, io
+import json, os, copy, hashlib, threading, base64, logging, socket, queue
 from datetime import datetime, timezone
 from pathlib import Path
-from flask import Flask, request, jsonify, send_file, render_template
+from flask import Flask, request, jsonify, render_template, Response
 import yaml, time
 import cv2, numpy as np, requests
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 CFG_PATH = os.getenv("CONFIG_PATH", "/app/config/sensors.yaml")
+SHOT_TTL_S = float(os.getenv("SHOT_TTL_S", "1.5"))      # ako dlho držať snapshot kamery
+STREAM_WAIT_S = float(os.getenv("STREAM_WAIT_S", "5"))   # čakanie na prvý snímok streamu
+PREVIEW_W = int(os.getenv("PREVIEW_WIDTH", "960"))       # default šírka náhľadu
+JPEG_QUALITY = int(os.getenv("PREVIEW_JPEG_QUALITY", "80"))
+OCR_PREVIEW_CONCURRENCY = int(os.getenv("OCR_PREVIEW_CONCURRENCY", "1"))
+OCR_PREVIEW_WAIT_S = float(os.getenv("OCR_PREVIEW_WAIT_S", "2"))
+OCR_PREVIEW_WARM = os.getenv("OCR_PREVIEW_WARM", "1") == "1"
+LIVE_SOCKET = os.getenv("LIVE_SOCKET", "/app/state/live.sock")
+SSE_KEEPALIVE_S = float(os.getenv("SSE_KEEPALIVE_S", "15"))
+
+LOG = logging.getLogger("roi_web")
 
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]   # /app
-STATE_PATH = ROOT / "state" / "state.json"   # /app/state/state.json
+# pri shardingu (app/shard.py) má každý reader vlastný STATE_PATH – roi_web musí
+# ukazovať na state inštancie, ktorá senzor vlastní, inak sa korekcia neprejaví
+STATE_PATH = Path(os.getenv("STATE_PATH") or ROOT / "state" / "state.json")
+HISTORY_PATH = os.getenv("HISTORY_PATH") or str(ROOT / "state" / "history.db")
+
+# --- config cache (podľa mtime) ---
+_cfg_lock = threading.Lock()
+_cfg_cache = {"sig": None, "cfg": None}
+
+def _cfg_sig():
+    st = os.stat(CFG_PATH)
+    return (st.st_mtime_ns, st.st_size)
 
 def load_cfg():
-    with open(CFG_PATH, "r") as f: return yaml.safe_load(f)
+    """Vráti config z cache; YAML sa parsuje len ak sa súbor zmenil. Nemodifikovať!"""
+    sig = _cfg_sig()
+    with _cfg_lock:
+        if _cfg_cache["sig"] != sig:
+            with open(CFG_PATH, "r") as f:
+                _cfg_cache["cfg"] = yaml.safe_load(f)
+            _cfg_cache["sig"] = sig
+        return _cfg_cache["cfg"]
 
 def save_cfg(cfg):
-    with open(CFG_PATH, "w") as f: yaml.safe_dump(cfg, f, sort_keys=False)
+    # atomicky (tmp + replace), aby reader nikdy nevidel polovičný súbor
+    d = os.path.dirname(CFG_PATH) or "."
+    tmp = os.path.join(d, ".sensors.yaml.tmp")
+    with open(tmp, "w") as f:
+        yaml.safe_dump(cfg, f, sort_keys=False)
+    os.replace(tmp, CFG_PATH)
+    with _cfg_lock:
+        _cfg_cache["cfg"] = cfg
+        _cfg_cache["sig"] = _cfg_sig()
 
 def fetch_img(url):
     r = requests.get(url, timeout=5)
     arr = np.frombuffer(r.content, np.uint8)
     return cv2.imdecode(arr, cv2.IMREAD_COLOR)
 
+# --- snapshot cache (krátke TTL per senzor) ---
+class _Snap:
+    __slots__ = ("url", "t", "body", "ctype", "etag", "_img", "derived")
+
+    def __init__(self, url, body, ctype):
+        self.url, self.body, self.ctype = url, body, ctype
+        self.t = time.time()
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self._img = None
+        self.derived = {}    # (druh, parametre) -> (bytes, mimetype)
+
+    def img(self):
+        # dekóduj až keď treba (pre /shot nie je potrebné vôbec)
+        if self._img is None:
+            self._img = cv2.imdecode(np.frombuffer(self.body, np.uint8), cv2.IMREAD_COLOR)
+        return self._img
+
+_snap_lock = threading.Lock()
+_snaps = {}
+
+def get_snap(sid: int, fresh: bool = False) -> _Snap:
+    s = load_cfg()["sensors"][sid]
+    url = s.get("snapshot_url")
+    if not url:
+        from app.frames import grab_once, source_spec
+        url = "%s:%s" % source_spec(s)      # len stream (mjpeg/rtsp/capture)
+    with _snap_lock:
+        snap = _snaps.get(sid)
+    if snap and not fresh and snap.url == url and time.time() - snap.t < SHOT_TTL_S:
+        return snap
+    if s.get("snapshot_url"):
+        r = requests.get(url, timeout=5)
+        r.raise_for_status()
+        snap = _Snap(url, r.content, r.headers.get("Content-Type", ""))
+    else:
+        # jednorazové pripojenie k streamu (trvalý grabber má len reader) → JPEG pre editor
+        snap = _Snap(url, _encode(grab_once(s, STREAM_WAIT_S), ".jpg"), "image/jpeg")
+    with _snap_lock:
+        _snaps[sid] = snap
+    return snap
+
+@app.errorhandler(TimeoutError)
+def _no_frame(e):
+    return jsonify({"ok": False, "error": str(e)}), 503
+
+def _is_jpeg(body: bytes) -> bool:
+    return body[:2] == b"\xff\xd8"
+
+def _encode(img, ext: str):
+    params = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY] if ext == ".jpg" else []
+    ok, buf = cv2.imencode(ext, img, params)
+    if not ok:
+        raise ValueError("image encode failed")
+    return buf.tobytes()
+
+def _derived(snap: _Snap, key: tuple, build):
+    hit = snap.derived.get(key)
+    if hit is None:
+        hit = build()
+        snap.derived[key] = hit
+    return hit
+
+def _image_response(body: bytes, mimetype: str, etag: str):
+    resp = Response(body, mimetype=mimetype)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"   # vždy revalidovať cez If-None-Match
+    return resp.make_conditional(request)
+
+def _req_sid() -> int:
+    return int(request.args.get("sid", "0"))
+
+def _req_fresh() -> bool:
+    return request.args.get("fresh") == "1" or "_" in request.args
+
 @app.get("/")
 def index():
     return render_template("index.html")
@@ -31,50 +142,324 @@ def index():
 @app.get("/sensors")
 def sensors():
     cfg = load_cfg()
-    return jsonify([{"id":s["id"],"snapshot_url":s["snapshot_url"],"roi_display":s.get("roi_display",[0,0,0,0])} for s in cfg["sensors"]])
+    st = _load_state()
+    return jsonify([{"id":s["id"],"snapshot_url":s.get("snapshot_url"),"roi_display":s.get("roi_display",[0,0,0,0]),
+                     "roi_quad":s.get("roi_quad"),
+                     "roi_offset":st.get(f"{s['id']}.roi_offset",[0,0])} for s in cfg["sensors"]])
 
 @app.get("/shot")
 def shot():
-    cfg = load_cfg(); sid = int(request.args.get("sid","0"))
-    s = cfg["sensors"][sid]; img = fetch_img(s["snapshot_url"])
-    _, buf = cv2.imencode(".jpg", img)
-    return send_file(io.BytesIO(buf.tobytes()), mimetype="image/jpeg")
+    snap = get_snap(_req_sid(), fresh=_req_fresh())
+    if _is_jpeg(snap.body):
+        # kamera už posiela JPEG → bez dekódovania a re-enkódovania
+        return _image_response(snap.body, "image/jpeg", snap.etag)
+    body, mt = _derived(snap, ("jpg",), lambda: (_encode(snap.img(), ".jpg"), "image/jpeg"))
+    return _image_response(body, mt, snap.etag + "-jpg")
+
+@app.get("/preview")
+def preview():
+    """Zmenšený náhľad celého snímku: /preview?sid=0&w=640"""
+    snap = get_snap(_req_sid(), fresh=_req_fresh())
+    w = max(16, int(request.args.get("w", PREVIEW_W)))
+
+    def build():
+        img = snap.img()
+        h0, w0 = img.shape[:2]
+        if w < w0:
+            img = cv2.resize(img, (w, max(1, round(h0 * w / w0))), interpolation=cv2.INTER_AREA)
+        return _encode(img, ".jpg"), "image/jpeg"
+
+    body, mt = _derived(snap, ("preview", w), build)
+    return _image_response(body, mt, f"{snap.etag}-p{w}")
+
+@app.get("/roi_crop")
+def roi_crop():
+    """Výrez ROI v plnom rozlíšení (PNG): /roi_crop?sid=0[&roi=x,y,w,h]"""
+    sid = _req_sid()
+    snap = get_snap(sid, fresh=_req_fresh())
+    if "roi" in request.args:
+        roi = tuple(int(v) for v in request.args["roi"].split(","))
+    else:
+        roi = tuple(int(v) for v in load_cfg()["sensors"][sid].get("roi_display", [0, 0, 0, 0]))
+    if len(roi) != 4 or roi[2] <= 0 or roi[3] <= 0:
+        return jsonify({"ok": False, "error": "invalid roi"}), 400
+
+    x, y, w, h = roi
+    crop = snap.img()[max(0, y):y+h, max(0, x):x+w]
+    if crop.size == 0:
+        return jsonify({"ok": False, "error": "roi outside image"}), 400
+    body, mt = _derived(snap, ("roi",) + roi, lambda: (_encode(crop, ".png"), "image/png"))
+    return _image_response(body, mt, f"{snap.etag}-r{'-'.join(map(str, roi))}")
+
+# --- live OCR náhľad (rovnaké varianty ako reader) ---
+# engine je zdieľaný v procese a nahrá sa na pozadí pri štarte;
+# semafor obmedzuje počet súbežných náhľadov, aby nezobrali CPU readeru
+_ocr_sem = threading.BoundedSemaphore(max(1, OCR_PREVIEW_CONCURRENCY))
+_ocr_state = {"ready": False, "error": None, "load_s": None}
+
+def _ocr_module():
+    from app import ocr_paddle   # ťažký import (paddle) až keď treba
+    return ocr_paddle
+
+def _warm_ocr():
+    t0 = time.time()
+    try:
+        _ocr_module().get_reader()
+        _ocr_state["ready"] = True
+        _ocr_state["load_s"] = time.time() - t0
+        LOG.info("OCR engine warm in %.1fs", _ocr_state["load_s"])
+    except Exception as e:
+        _ocr_state["error"] = f"{e.__class__.__name__}: {e}"
+        LOG.warning("OCR engine warm-up failed: %s", _ocr_state["error"])
+
+def _png_data_url(img) -> str:
+    return "data:image/png;base64," + base64.b64encode(_encode(img, ".png")).decode("ascii")
+
+@app.get("/ocr_preview/status")
+def ocr_preview_status():
+    return jsonify(_ocr_state)
+
+@app.post("/ocr_preview")
+def ocr_preview():
+    """
+    Body JSON: { "sid": 0, "roi": [x, y, w, h]? | "quad": [[x, y] x4]?, "variants": ["gray", ...]?, "images": true? }
+    Bez roi/quad sa použije roi_quad, inak roi_display z configu (ako v readeri).
+    """
+    from app.rectify import RectMap, order_quad, quad_bbox
+    data = request.get_json(force=True) or {}
+    sid = int(data.get("sid", 0))
+    s = load_cfg()["sensors"][sid]
+    quad = data.get("quad") or (None if data.get("roi") else s.get("roi_quad"))
+    rmap = None
+    if quad:
+        try:
+            rmap = RectMap(quad, None if data.get("quad") else s.get("roi_quad_size"))
+        except Exception:
+            return jsonify({"ok": False, "error": "invalid quad"}), 400
+        roi = list(quad_bbox(order_quad(quad)))
+    else:
+        roi = [int(v) for v in (data.get("roi") or s.get("roi_display") or [])]
+    if len(roi) != 4 or roi[2] <= 0 or roi[3] <= 0:
+        return jsonify({"ok": False, "error": "invalid roi"}), 400
+
+    if not _ocr_sem.acquire(timeout=OCR_PREVIEW_WAIT_S):
+        return jsonify({"ok": False, "error": "ocr busy, try again"}), 429
+    try:
+        ocr = _ocr_module()
+        t0 = time.perf_counter()
+        snap = get_snap(sid, fresh=bool(data.get("fresh")))
+        x, y, w, h = roi
+        crop = rmap.apply(snap.img()) if rmap else snap.img()[y:y+h, x:x+w]
+        if crop.size == 0:
+            return jsonify({"ok": False, "error": "roi outside image"}), 400
+        upscale = int(load_cfg().get("global", {}).get("roi_upscale", 2))
+        with_images = bool(data.get("images", True))
+        results = ocr.ocr_variants(crop, upscale=upscale, names=data.get("variants"),
+                                   keep_images=with_images)
+        total_ms = (time.perf_counter() - t0) * 1000.0
+    finally:
+        _ocr_sem.release()
+
+    variants = []
+    for r in results:
+        v = {k: r[k] for k in ("name", "txt", "digits", "conf", "score", "chars", "prep_ms", "ocr_ms")}
+        if with_images:
+            v["image"] = _png_data_url(r["image"])
+        variants.append(v)
+    best = max(variants, key=lambda v: v["score"]) if variants else None
+    return jsonify({
+        "ok": True, "sid": sid, "roi": roi, "quad": rmap and rmap.quad.tolist(), "total_ms": total_ms,
+        "best": best and {"name": best["name"], "digits": best["digits"], "conf": best["conf"]},
+        "variants": variants,
+    })
 
 @app.post("/save_roi")
 def save_roi():
     data = request.get_json()
-    cfg = load_cfg()
+    cfg = copy.deepcopy(load_cfg())
     sid = int(data["sid"]); roi = [int(x) for x in data["roi"]]
     cfg["sensors"][sid]["roi_display"] = roi
+    cfg["sensors"][sid].pop("roi_quad", None)        # obdĺžnik nahrádza quad
+    cfg["sensors"][sid].pop("roi_quad_size", None)
     save_cfg(cfg)
     return jsonify({"ok":True, "roi":roi})
 
+@app.post("/save_quad")
+def save_quad():
+    """Body JSON: { "sid": 0, "quad": [[x, y] x4], "size": [w, h]? } – perspektívny výrez."""
+    from app.rectify import order_quad, quad_bbox
+    data = request.get_json(force=True) or {}
+    sid = int(data["sid"])
+    try:
+        quad = order_quad(data["quad"])
+    except Exception:
+        return jsonify({"ok": False, "error": "quad must be four [x, y] points"}), 400
+    cfg = copy.deepcopy(load_cfg())
+    s = cfg["sensors"][sid]
+    s["roi_quad"] = [[int(round(x)), int(round(y))] for x, y in quad.tolist()]
+    s["roi_display"] = list(quad_bbox(quad))     # obalový obdĺžnik pre staršie nástroje
+    if data.get("size"):
+        s["roi_quad_size"] = [int(v) for v in data["size"]]
+    else:
+        s.pop("roi_quad_size", None)
+    save_cfg(cfg)
+    return jsonify({"ok": True, "quad": s["roi_quad"], "roi": s["roi_display"]})
+
+@app.post("/apply_roi_offset")
+def apply_roi_offset():
+    """Zapíše posun kamery nameraný readerom (<id>.roi_offset) natrvalo do roi_display / roi_quad."""
+    data = request.get_json(force=True) or {}
+    cfg = copy.deepcopy(load_cfg())
+    sid = int(data["sid"])
+    s = cfg["sensors"][sid]
+    dx, dy = (int(v) for v in _load_state().get(f"{s['id']}.roi_offset", [0, 0]))
+    if (dx, dy) == (0, 0):
+        return jsonify({"ok": True, "roi": s.get("roi_display"), "offset": [0, 0]})
+    if not s.get("roi_display") and not s.get("roi_quad"):
+        return jsonify({"ok": False, "error": "sensor has no roi"}), 400
+    if s.get("roi_display"):      # senzor môže mať len roi_quad
+        x, y, w, h = (int(v) for v in s["roi_display"])
+        s["roi_display"] = [max(0, x + dx), max(0, y + dy), w, h]
+    if s.get("roi_quad"):
+        s["roi_quad"] = [[int(px) + dx, int(py) + dy] for px, py in s["roi_quad"]]
+    save_cfg(cfg)   # reader po reloade zahodí referenciu a posun začne od nuly
+    # posun je už v configu – hneď vynulovať, aby ho ďalšie "apply" nepripočítalo znova
+    _state_store().update(**{f"{s['id']}.roi_offset": [0, 0]})
+    return jsonify({"ok": True, "roi": s.get("roi_display"), "quad": s.get("roi_quad"), "offset": [dx, dy]})
+
+_state = None
+
+def _state_store():
+    """Zdieľaný State (merge zápisy pod flock, rovnaký ako v readeri)."""
+    global _state
+    if _state is None:
+        from app.state import State
+        _state = State(str(STATE_PATH))
+    _state.refresh()
+    return _state
+
 def _load_state():
     if not STATE_PATH.exists():
-        print("STATE NOT FOUND AT PATH: " + STATE_PATH)
+        LOG.warning("state not found at %s", STATE_PATH)
         return {}
-    with STATE_PATH.open("r", encoding="utf-8") as f:
+    return _state_store().snapshot()
+
+# --- live stav z readera (Unix datagram socket) → SSE ---
+class LiveHub:
+    """
+    Prijíma datagramy z app.live.LivePublisher, drží posledné hodnoty
+    per senzor a rozposiela ich všetkým pripojeným SSE klientom.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.latest = {}          # sid -> {field: value}
+        self.updated = {}         # sid -> čas poslednej zmeny
+        self._subs = set()
+        self._lock = threading.Lock()
+        self.running = False
+
+    def start(self):
         try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return {}
+            if os.path.exists(self.path):
+                os.unlink(self.path)   # starý socket po reštarte
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(self.path)
+        except OSError as e:
+            LOG.warning("live socket %s unavailable: %s", self.path, e)
+            return
+        self.running = True
+        threading.Thread(target=self._run, args=(sock,), name="live-hub", daemon=True).start()
+        LOG.info("live hub listening on %s", self.path)
+
+    def _run(self, sock):
+        while True:
+            try:
+                msg = json.loads(sock.recv(65536))
+                sid, fields = msg["sid"], msg["fields"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            except OSError as e:
+                LOG.warning("live socket error: %s", e)
+                time.sleep(1.0)
+                continue
+            self.publish(sid, fields, msg.get("t"))
+
+    def publish(self, sid: str, fields: dict, t: float = None):
+        msg = {"sid": sid, "t": t or time.time(), "fields": fields}
+        with self._lock:
+            self.latest.setdefault(sid, {}).update(fields)
+            self.updated[sid] = msg["t"]
+            subs = list(self._subs)
+        for q in subs:
+                try:
+                    q.put_nowait(msg)
+                except queue.Full:
+                    pass   # pomalý klient – radšej zahodíme, než blokovať
+
+    def subscribe(self) -> "queue.Queue":
+        q = queue.Queue(maxsize=256)
+        with self._lock:
+            self._subs.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subs.discard(q)
+
+    def snapshot(self, sid=None) -> dict:
+        with self._lock:
+            if sid is not None:
+                return dict(self.latest.get(sid, {}))
+            return {k: dict(v) for k, v in self.latest.items()}
 
-def _save_state_atomic(data: dict):
-    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    tmp = STATE_PATH.with_suffix(".json.tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, STATE_PATH)
+live_hub = LiveHub(LIVE_SOCKET)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/api/state/stream")
+def api_state_stream():
+    """SSE stream zmien stavu; ?sensor_id=... filtruje jeden senzor."""
+    only = request.args.get("sensor_id")
+    q = live_hub.subscribe()
+
+    def gen():
+        try:
+            snap = live_hub.snapshot()
+            if only is not None:
+                snap = {only: snap.get(only, {})}
+            yield _sse("snapshot", snap)
+            while True:
+                try:
+                    msg = q.get(timeout=SSE_KEEPALIVE_S)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if only is None or msg["sid"] == only:
+                    yield _sse("state", msg)
+        finally:
+            live_hub.unsubscribe(q)
+
+    return Response(gen(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # --- GET: return flat values for one sensor
 @app.get("/api/state/<sensor_id>")
 def api_state_get_sensor(sensor_id):
-    st = _load_state()
-    t1 = st.get(f"{sensor_id}.t1")
-    t2 = st.get(f"{sensor_id}.t2")
-    total = st.get(f"{sensor_id}.total")
+    live = live_hub.snapshot(sensor_id)
+    if live.get("t1") is not None and live.get("t2") is not None:
+        # živé hodnoty z readera – bez čítania state.json
+        t1, t2 = live["t1"], live["t2"]
+        total = live.get("total", live.get("total_pub"))
+    else:
+        st = _load_state()
+        t1 = st.get(f"{sensor_id}.t1")
+        t2 = st.get(f"{sensor_id}.t2")
+        total = st.get(f"{sensor_id}.total")
     return jsonify({
         "sensor_id": sensor_id,
+        "version": _state_store().version,
         "last": {
             f"{sensor_id}.t1": t1,
             f"{sensor_id}.t2": t2,
@@ -87,15 +472,23 @@ def api_state_get_sensor(sensor_id):
 def api_state_set_tariffs():
     """
     Body JSON:
-      { "sensor_id": "electricity_main", "t1": 13485, "t2": 999 }
+      { "sensor_id": "electricity_main", "t1": 13485, "t2": 999, "version": 42 }
     You may send only t1, only t2, or both. total is always recomputed (t1+t2).
+    Optional "version" (from GET /api/state/<id>) makes the write a
+    compare-and-swap: if state.json changed since, nothing is written (409).
+    Only the keys below are merged; the rest of state.json is untouched.
     """
     data = request.get_json(force=True) or {}
     sid = data.get("sensor_id")
     if not sid:
         return jsonify({"ok": False, "error": "sensor_id missing"}), 400
 
-    st = _load_state()
+    store = _state_store()
+    st = store.snapshot()
+    if f"{sid}.owner" in st and not st[f"{sid}.owner"]:
+        # sharding: senzor prevzal iný reader – korekcia by v tomto state nič nezmenila
+        return jsonify({"ok": False, "error": f"{sid} is owned by another reader instance "
+                                              f"(STATE_PATH {STATE_PATH})"}), 409
 
     def _num(x):
         if x is None: return None
@@ -117,22 +510,107 @@ def api_state_set_tariffs():
     # recompute total
     total = float(t1) + float(t2)
 
-    # write back (flat schema only)
-    st[f"{sid}.t1"] = float(t1)
-    st[f"{sid}.t2"] = float(t2)
-    st[f"{sid}.t1_ocr"] = float(t1)
-    st[f"{sid}.t2_ocr"] = float(t2)
-    st[f"{sid}.total"] = float(total)
+    # write back (flat schema only) – merge len týchto kľúčov
+    changes = {
+        f"{sid}.t1": float(t1),
+        f"{sid}.t2": float(t2),
+        f"{sid}.t1_ocr": float(t1),
+        f"{sid}.t2_ocr": float(t2),
+        f"{sid}.total": float(total),
+    }
 
-    _save_state_atomic(st)
+    if data.get("version") is not None:
+        ok, cur = store.compare_and_update(changes, int(data["version"]))
+        if not ok:
+            return jsonify({
+                "ok": False, "error": "state changed, reload and retry",
+                "version": cur.get("_version", 0),
+                "current": {k: cur.get(k) for k in changes},
+            }), 409
+    else:
+        store.update(**changes)
+
+    live_hub.publish(sid, {k.rpartition(".")[2]: v for k, v in changes.items()})
     return jsonify({
         "ok": True,
+        "version": store.version,
         "saved": {
-            f"{sid}.t1": st[f"{sid}.t1"],
-            f"{sid}.t2": st[f"{sid}.t2"],
-            f"{sid}.total": st[f"{sid}.total"],
+            f"{sid}.t1": changes[f"{sid}.t1"],
+            f"{sid}.t2": changes[f"{sid}.t2"],
+            f"{sid}.total": changes[f"{sid}.total"],
         }
     })
 
+# --- história spotreby (app/history.py, SQLite zapisuje reader) ---
+_history = None
+
+def _history_store():
+    global _history
+    if _history is None:
+        from app.history import History
+        _history = History(HISTORY_PATH)
+    return _history
+
+def _req_time(name: str, default: float) -> float:
+    """?from= / ?to=: unix čas, ISO dátum/čas (lokálny čas histórie), today, yesterday."""
+    from app.history import TZ, period_start
+    v = request.args.get(name)
+    if not v:
+        return default
+    if v in ("today", "yesterday"):
+        day = period_start(time.time(), "day")
+        return day if v == "today" else period_start(day - 1, "day")
+    try:
+        return float(v)
+    except ValueError:
+        d = datetime.fromisoformat(v)
+        return (d if d.tzinfo else d.replace(tzinfo=TZ)).timestamp()
+
+# --- GET: rollup rady (hour/day/month) pre senzor
+@app.get("/api/history/<sensor_id>")
+def api_history_series(sensor_id):
+    """
+    ?period=hour|day|month (default day), ?from=, ?to= (default posledných 30 období)
+    Odpoveď: kWh T1/T2/total per obdobie; len predpočítané súčty (rollup).
+    """
+    from app.history import period_start
+    period = request.args.get("period", "day")
+    spans = {"hour": 3600, "day": 86400, "month": 31 * 86400}
+    if period not in spans:
+        return jsonify({"ok": False, "error": "period must be hour, day or month"}), 400
+    try:
+        end = _req_time("to", time.time())
+        start = _req_time("from", period_start(end - 30 * spans[period], period))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": f"bad time: {e}"}), 400
+    rows = _history_store().series(sensor_id, period, start, end)
+    for r in rows:
+        r["start"] = datetime.fromtimestamp(r["start"], timezone.utc).isoformat()
+    return jsonify({"ok": True, "sensor_id": sensor_id, "period": period, "rows": rows})
+
+# --- GET: súčet spotreby za rozsah (napr. ?from=yesterday&to=today)
+@app.get("/api/history/<sensor_id>/sum")
+def api_history_sum(sensor_id):
+    """
+    Spotreba T1/T2 za [from, to) v kWh, zarovnané na celé hodiny.
+    Rozsah sa rozloží na mesiace/dni/hodiny, surové vzorky sa nečítajú.
+    Default: dnešok.
+    """
+    from app.history import period_start
+    try:
+        start = _req_time("from", period_start(time.time(), "day"))
+        end = _req_time("to", time.time())
+    except ValueError as e:
+        return jsonify({"ok": False, "error": f"bad time: {e}"}), 400
+    out = _history_store().total(sensor_id, start, end)
+    return jsonify({"ok": True, "sensor_id": sensor_id,
+                    "from": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+                    "to": datetime.fromtimestamp(end, timezone.utc).isoformat(), **out})
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8088)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s: %(message)s")
+    live_hub.start()
+    if OCR_PREVIEW_WARM:
+        threading.Thread(target=_warm_ocr, name="ocr-warm", daemon=True).start()
+    app.run(host="0.0.0.0", port=8088, threaded=True)
@@ -0,0 +1,8 @@
+"""
+Lokálny simulátor zariadení pre vision-gateway.
+
+  sim.meter    – syntetický elektromer (7-segmentový displej, pulzy, HDO)
+  sim.devices  – HTTP zariadenia: snímky/MJPEG, /pulse, EMA /config, CEZ HDO
+  sim.broker   – minimálny MQTT 3.1.1 broker (náhrada Mosquitto)
+  sim.run      – driver: N senzorov proti app.main, meria latenciu, CPU a RAM
+"""
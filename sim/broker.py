@@ -0,0 +1,216 @@
+# sim/broker.py
+"""
+Minimálny MQTT 3.1.1 broker pre lokálne testy (náhrada Mosquitto).
+
+Podporuje CONNECT (aj will správu), PUBLISH (QoS 0/1/2 na vstupe,
+doručenie QoS 0), retained správy, SUBSCRIBE/UNSUBSCRIBE s wildcardami
++ a #, PINGREQ a DISCONNECT. Bez autentifikácie, bez perzistencie.
+
+    python -m sim.broker --port 1883
+"""
+import argparse, asyncio, logging, struct, threading
+
+LOG = logging.getLogger("sim.broker")
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    p, t = pattern.split("/"), topic.split("/")
+    for i, part in enumerate(p):
+        if part == "#":
+            return True
+        if i >= len(t):
+            return False
+        if part != "+" and part != t[i]:
+            return False
+    return len(p) == len(t)
+
+
+def _encode_len(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n % 128
+        n //= 128
+        out.append(b | 0x80 if n else b)
+        if not n:
+            return bytes(out)
+
+
+def _str(b: bytes, i: int):
+    n = struct.unpack_from("!H", b, i)[0]
+    return b[i + 2:i + 2 + n], i + 2 + n
+
+
+def packet(ptype: int, flags: int, body: bytes) -> bytes:
+    return bytes([(ptype << 4) | flags]) + _encode_len(len(body)) + body
+
+
+def publish_packet(topic: str, payload: bytes, retain: bool) -> bytes:
+    t = topic.encode("utf-8")
+    return packet(PUBLISH, 1 if retain else 0, struct.pack("!H", len(t)) + t + payload)
+
+
+class _Client:
+    def __init__(self, writer):
+        self.writer = writer
+        self.client_id = "?"
+        self.subs = {}   # pattern -> qos
+        self.will = None  # (topic, payload, retain) – pošle sa pri páde spojenia
+
+    def send(self, data: bytes):
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+
+class Broker:
+    def __init__(self, host: str = "127.0.0.1", port: int = 1883):
+        self.host, self.port = host, port
+        self.retained = {}          # topic -> payload
+        self.clients = set()
+        self.msgs_in = 0
+        self.msgs_out = 0
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+
+    # --- štart/stop (vlastné vlákno s asyncio slučkou) ---
+    def start(self):
+        threading.Thread(target=self._thread, name="sim-broker", daemon=True).start()
+        self._ready.wait(5)
+        return self
+
+    def _thread(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        LOG.info("broker listening on %s:%s", self.host, self.port)
+        self._loop.run_forever()
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # --- protokol ---
+    async def _read_packet(self, reader):
+        h = await reader.readexactly(1)
+        mult, n = 1, 0
+        while True:
+            b = (await reader.readexactly(1))[0]
+            n += (b & 0x7F) * mult
+            if not b & 0x80:
+                break
+            mult *= 128
+        body = await reader.readexactly(n) if n else b""
+        return h[0] >> 4, h[0] & 0x0F, body
+
+    async def _handle(self, reader, writer):
+        c = _Client(writer)
+        self.clients.add(c)
+        clean = False
+        try:
+            while True:
+                ptype, flags, body = await self._read_packet(reader)
+                if ptype == CONNECT:
+                    _, i = _str(body, 0)          # "MQTT"
+                    cflags = body[i + 1]
+                    i += 4                        # level, flags, keepalive
+                    cid, i = _str(body, i)
+                    c.client_id = cid.decode("utf-8", "replace") or "anon"
+                    if cflags & 0x04:
+                        wt, i = _str(body, i)
+                        wp, i = _str(body, i)
+                        c.will = (wt.decode("utf-8"), wp, bool(cflags & 0x20))
+                    c.send(packet(CONNACK, 0, b"\x00\x00"))
+                elif ptype == PUBLISH:
+                    self._on_publish(c, flags, body)
+                elif ptype == PUBREL:
+                    c.send(packet(PUBCOMP, 0, body[:2]))
+                elif ptype == SUBSCRIBE:
+                    pid = body[:2]
+                    i, granted = 2, bytearray()
+                    new = []
+                    while i < len(body):
+                        t, i = _str(body, i)
+                        qos = body[i]
+                        i += 1
+                        pattern = t.decode("utf-8")
+                        c.subs[pattern] = qos
+                        new.append(pattern)
+                        granted.append(0)
+                    c.send(packet(SUBACK, 0, pid + bytes(granted)))
+                    for topic, payload in list(self.retained.items()):
+                        if any(topic_matches(p, topic) for p in new):
+                            c.send(publish_packet(topic, payload, retain=True))
+                            self.msgs_out += 1
+                elif ptype == UNSUBSCRIBE:
+                    i = 2
+                    while i < len(body):
+                        t, i = _str(body, i)
+                        c.subs.pop(t.decode("utf-8"), None)
+                    c.send(packet(UNSUBACK, 0, body[:2]))
+                elif ptype == PINGREQ:
+                    c.send(packet(PINGRESP, 0, b""))
+                elif ptype == DISCONNECT:
+                    clean = True
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(c)
+            writer.close()
+            if c.will and not clean:
+                self._deliver(*c.will)
+
+    def kick(self, client_id: str) -> bool:
+        """Zavri spojenie klienta bez DISCONNECT (test pádu – pošle sa will)."""
+        for c in list(self.clients):
+            if c.client_id == client_id:
+                self._loop.call_soon_threadsafe(c.writer.transport.abort)
+                return True
+        return False
+
+    def _on_publish(self, c: _Client, flags: int, body: bytes):
+        qos, retain = (flags >> 1) & 0x03, bool(flags & 0x01)
+        t, i = _str(body, 0)
+        topic = t.decode("utf-8")
+        if qos:
+            pid = body[i:i + 2]
+            i += 2
+            c.send(packet(PUBACK if qos == 1 else PUBREC, 0, pid))
+        self._deliver(topic, body[i:], retain)
+
+    def _deliver(self, topic: str, payload: bytes, retain: bool):
+        self.msgs_in += 1
+        if retain:
+            if payload:
+                self.retained[topic] = payload
+            else:
+                self.retained.pop(topic, None)
+        data = publish_packet(topic, payload, retain=False)
+        for other in list(self.clients):
+            if any(topic_matches(p, topic) for p in other.subs):
+                other.send(data)
+                self.msgs_out += 1
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Minimal MQTT 3.1.1 broker for local tests")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=1883)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+    b = Broker(args.host, args.port).start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        b.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# sim/devices.py
+"""
+HTTP zariadenia simulátora (jeden server, viac elektromerov):
+
+  /m/<i>/shot.jpg      snímok displeja elektromera i   (snapshot_url)
+  /m/<i>/stream.mjpg   MJPEG stream elektromera i      (stream_url)
+  /pulse               {"counter": n}                  (global.pulse_url)
+  /config              GET {"ema_R": x}, POST prahy    (EmaSetup.URL)
+  /hdo/<region>        CEZ distHdo fixture             (Tariff.BASE_URL)
+"""
+import json, random, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+from sim.meter import hdo_fixture
+
+BOUNDARY = "frame"
+
+
+class Devices:
+    def __init__(self, meters, hdo_windows, host="127.0.0.1", port=0, tick_s=0.1, fps=5.0):
+        self.meters = meters
+        self.hdo = hdo_fixture(hdo_windows)
+        self.tick_s = tick_s
+        self.fps = fps
+        self.ema_posts = []
+        self.requests = 0
+        self._stop = threading.Event()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _tick(self):
+        while not self._stop.wait(self.tick_s):
+            now = time.time()
+            for m in self.meters:
+                m.advance(now)
+
+    def start(self):
+        threading.Thread(target=self._tick, name="sim-tick", daemon=True).start()
+        threading.Thread(target=self.httpd.serve_forever, name="sim-http", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.httpd.shutdown()
+
+    def ema_value(self) -> float:
+        # odraz "zapnutej" LED: dve hladiny so šumom
+        on = int(time.time() * 2) % 7 == 0
+        return (42.0 if on else 12.0) + random.uniform(-1.5, 1.5)
+
+    def _handler(self):
+        dev = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code: int, body: bytes, ctype: str):
+                self.send_response(code)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, obj, code=200):
+                self._send(code, json.dumps(obj).encode(), "application/json")
+
+            def _meter(self, parts):
+                try:
+                    return dev.meters[int(parts[1])]
+                except (IndexError, ValueError):
+                    return None
+
+            def do_GET(self):
+                dev.requests += 1
+                path = urlparse(self.path).path
+                parts = path.strip("/").split("/")
+                if parts[0] == "m" and len(parts) == 3:
+                    m = self._meter(parts)
+                    if m is None:
+                        return self._send(404, b"no such meter", "text/plain")
+                    if parts[2] == "shot.jpg":
+                        return self._send(200, m.jpeg(), "image/jpeg")
+                    if parts[2] == "stream.mjpg":
+                        return self._stream(m)
+                if path == "/pulse":
+                    return self._json({"counter": dev.meters[0].pulses if dev.meters else 0})
+                if path == "/config":
+                    return self._json({"ema_R": round(dev.ema_value(), 2)})
+                if parts[0] == "hdo":
+                    return self._json(dev.hdo)
+                self._send(404, b"not found", "text/plain")
+
+            def do_POST(self):
+                dev.requests += 1
+                n = int(self.headers.get("Content-Length", "0") or 0)
+                body = self.rfile.read(n) if n else b""
+                if urlparse(self.path).path == "/config":
+                    try:
+                        dev.ema_posts.append(json.loads(body or b"{}"))
+                    except ValueError:
+                        return self._json({"ok": False}, 400)
+                    return self._json({"ok": True})
+                self._send(404, b"not found", "text/plain")
+
+            def _stream(self, m):
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                try:
+                    while not dev._stop.is_set():
+                        body = m.jpeg()
+                        self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                         f"Content-Length: {len(body)}\r\n\r\n".encode())
+                        self.wfile.write(body + b"\r\n")
+                        time.sleep(1.0 / dev.fps)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                self.close_connection = True
+
+        return Handler
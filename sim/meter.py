@@ -0,0 +1,146 @@
+# sim/meter.py
+import bisect, datetime, threading, time
+
+import cv2
+import numpy as np
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    from backports.zoneinfo import ZoneInfo
+
+CEZ_TIMEZONE = ZoneInfo("Europe/Prague")
+
+# segmenty a..g pre číslice 0-9
+_SEGMENTS = {
+    "0": "abcdef", "1": "bc", "2": "abdeg", "3": "abcdg", "4": "bcfg",
+    "5": "acdfg", "6": "acdefg", "7": "abc", "8": "abcdefg", "9": "abcdfg",
+}
+
+
+def parse_windows(spec: str):
+    """'00:00-06:00,13:00-15:00' → [(time, time), ...] (T2 / HDO okná)."""
+    out = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        a, b = part.split("-")
+        out.append((datetime.datetime.strptime(a, "%H:%M").time(),
+                    datetime.datetime.strptime(b, "%H:%M").time()))
+    return out
+
+
+def in_windows(windows, when: datetime.datetime) -> bool:
+    x = when.time()
+    for start, end in windows:
+        if (start <= x <= end) if start <= end else (start <= x or x <= end):
+            return True
+    return False
+
+
+def hdo_fixture(windows) -> dict:
+    """Odpoveď v tvare CEZ distHdo API (čo číta app.tariff.Tariff)."""
+    row = {"PLATNOST": "Po - Ne"}
+    for i in range(1, 11):
+        start, end = windows[i - 1] if i <= len(windows) else (None, None)
+        row[f"CAS_ZAP_{i}"] = start.strftime("%H:%M") if start else None
+        row[f"CAS_VYP_{i}"] = end.strftime("%H:%M") if end else None
+    return {"data": [row]}
+
+
+def draw_digit(img, ch: str, x: int, y: int, w: int, h: int, color, thick: int):
+    segs = _SEGMENTS.get(ch, "")
+    m = h // 2
+    pts = {
+        "a": ((x, y), (x + w, y)),
+        "b": ((x + w, y), (x + w, y + m)),
+        "c": ((x + w, y + m), (x + w, y + h)),
+        "d": ((x, y + h), (x + w, y + h)),
+        "e": ((x, y + m), (x, y + h)),
+        "f": ((x, y), (x, y + m)),
+        "g": ((x, y + m), (x + w, y + m)),
+    }
+    for s in segs:
+        p1, p2 = pts[s]
+        cv2.line(img, p1, p2, color, thick, cv2.LINE_AA)
+
+
+class SimMeter:
+    """
+    Elektromer s registrami T1/T2, spoločnou spotrebou a pulzným výstupom.
+
+    - spotreba `power_kw` ide do T2 počas HDO okien, inak do T1,
+    - displej strieda T1 a T2 každých `alt_s` sekúnd (ako reálne elektromery),
+    - história (čas, t1, t2) slúži na meranie latencie end-to-end.
+    """
+
+    def __init__(self, t1: float, t2: float, power_kw: float = 2.0, imp_per_kwh: int = 1000,
+                 hdo=None, alt_s: float = 5.0, digits: int = 7, clock=time.time):
+        self.t1, self.t2 = float(t1), float(t2)
+        self.power_kw = power_kw
+        self.imp_per_kwh = imp_per_kwh
+        self.hdo = hdo or []
+        self.alt_s = alt_s
+        self.digits = digits
+        self.clock = clock
+        self.pulses = 0
+        self._pulse_frac = 0.0
+        self._last = clock()
+        self._lock = threading.Lock()
+        # história pre reached_at (monotónne rastúce → bisect)
+        self._h_t = [self._last]
+        self._h = {"t1": [self.t1], "t2": [self.t2]}
+
+    def is_t2(self, now: float = None) -> bool:
+        when = datetime.datetime.fromtimestamp(now or self.clock(), tz=CEZ_TIMEZONE)
+        return in_windows(self.hdo, when)
+
+    def advance(self, now: float = None):
+        now = now or self.clock()
+        with self._lock:
+            dt = now - self._last
+            if dt <= 0:
+                return
+            kwh = self.power_kw * dt / 3600.0
+            if self.is_t2(now):
+                self.t2 += kwh
+            else:
+                self.t1 += kwh
+            p = kwh * self.imp_per_kwh + self._pulse_frac
+            self.pulses += int(p)
+            self._pulse_frac = p - int(p)
+            self._last = now
+            self._h_t.append(now)
+            self._h["t1"].append(self.t1)
+            self._h["t2"].append(self.t2)
+
+    def reached_at(self, register: str, value: float):
+        """Kedy register prvýkrát dosiahol `value` (None ak ešte nie)."""
+        with self._lock:
+            vals = self._h[register]
+            i = bisect.bisect_left(vals, value)
+            return self._h_t[i] if i < len(vals) else None
+
+    def shown(self, now: float = None):
+        now = now or self.clock()
+        reg = "t1" if int(now / self.alt_s) % 2 == 0 else "t2"
+        return reg, int(self.t1 if reg == "t1" else self.t2)
+
+    def render(self, now: float = None, size=(800, 450), roi=(200, 160, 400, 110)) -> np.ndarray:
+        """Snímok kabinetu s LCD; číslice vo vnútri `roi` (x, y, w, h)."""
+        reg, val = self.shown(now)
+        w, h = size
+        img = np.full((h, w, 3), (60, 62, 58), np.uint8)
+        x, y, rw, rh = roi
+        cv2.rectangle(img, (x - 20, y - 40), (x + rw + 20, y + rh + 30), (200, 200, 195), -1)
+        cv2.rectangle(img, (x, y), (x + rw, y + rh), (70, 110, 60), -1)   # LCD pozadie
+        text = str(val).zfill(self.digits)[-self.digits:]
+        pad = 10
+        cw = (rw - 2 * pad) // self.digits
+        dw, dh = int(cw * 0.6), rh - 2 * pad
+        for i, ch in enumerate(text):
+            draw_digit(img, ch, x + pad + i * cw, y + pad, dw, dh, (20, 30, 15), max(3, cw // 8))
+        cv2.putText(img, reg.upper(), (x, y - 12), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (30, 30, 30), 2)
+        return img
+
+    def jpeg(self, now: float = None, quality: int = 85) -> bytes:
+        ok, buf = cv2.imencode(".jpg", self.render(now), [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        return buf.tobytes()
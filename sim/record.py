@@ -0,0 +1,65 @@
+# sim/record.py
+"""
+Nahrávanie datasetu pre sim.replay zo skutočných (alebo simulovaných) zariadení.
+
+Zapisuje do adresára sensors.yaml (kópia configu), hdo.json (aktuálny HDO
+kalendár), snap/*.jpg a events.jsonl s pulzmi a snímkami. Pravdu (truth)
+možno do events.jsonl doplniť ručne – napr. odpis z displeja.
+
+    python -m sim.record --config config/sensors.yaml --out rec/ --hours 2
+"""
+import argparse, json, os, shutil, time
+
+import cv2
+
+from app.config import load_config, validate_config
+from app.frames import source_for
+from app.pulse import Pulse
+from app.tariff import Tariff
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Record pulses and snapshots for sim.replay")
+    ap.add_argument("--config", default=os.getenv("CONFIG_PATH") or "/app/config/sensors.yaml")
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--hours", type=float, default=1.0)
+    ap.add_argument("--snapshot-every", type=float, default=10.0, help="s medzi snímkami")
+    args = ap.parse_args()
+
+    cfg = validate_config(load_config(args.config))
+    g = cfg["global"]
+    os.makedirs(os.path.join(args.out, "snap"), exist_ok=True)
+    shutil.copy(args.config, os.path.join(args.out, "sensors.yaml"))
+    with open(os.path.join(args.out, "hdo.json"), "w") as f:
+        json.dump({"data": Tariff().responseData}, f)
+
+    pulse = Pulse()
+    pulse_every = float(g.get("pulse_poll_s", 5))
+    end = time.time() + args.hours * 3600
+    next_pulse = next_snap = 0.0
+    n = 0
+    with open(os.path.join(args.out, "events.jsonl"), "a") as ev:
+        while time.time() < end:
+            now = time.time()
+            if now >= next_pulse and g.get("pulse_url"):
+                next_pulse = now + pulse_every
+                ev.write(json.dumps({"t": now, "type": "pulse",
+                                     "counter": pulse.get_pulse_count(g["pulse_url"])}) + "\n")
+            if now >= next_snap:
+                next_snap = now + args.snapshot_every
+                for s in cfg["sensors"]:
+                    try:
+                        img = source_for(s).read()
+                    except Exception as e:
+                        print(f"[{s['id']}] snapshot failed: {e}")
+                        continue
+                    name = f"snap/{s['id']}_{n:06d}.jpg"
+                    cv2.imwrite(os.path.join(args.out, name), img)
+                    ev.write(json.dumps({"t": now, "type": "snapshot", "sid": s["id"], "file": name}) + "\n")
+                n += 1
+            ev.flush()
+            time.sleep(0.2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# sim/replay.py
+"""
+Replay readera na virtuálnych hodinách (app.clock.VirtualClock).
+
+Spúšťa skutočné app.main.process_all nad nahratými alebo syntetickými
+vstupmi (pulzy, snímky, HDO kalendár) tak rýchlo, ako stíha CPU, a
+zapisuje trajektóriu t1/t2/total, ktorú možno porovnať s pravdou.
+
+Dataset (adresár, pozri sim.record):
+  sensors.yaml   config readera
+  hdo.json       CEZ fixture {"data": [...]}
+  events.jsonl   zoradené podľa t:
+                   {"t": ..., "type": "pulse", "counter": n}
+                   {"t": ..., "type": "snapshot", "sid": "...", "file": "snap/x.jpg"}
+                   {"t": ..., "type": "truth", "sid": "...", "t1": x, "t2": y}   (voliteľné)
+
+    python -m sim.replay --dataset rec/ --out traj.csv
+    python -m sim.replay --synthetic --days 2 --sensors 2 --out traj.csv
+"""
+import argparse, csv, json, os, tempfile, time
+
+import cv2
+
+from app import clock
+from app.clock import VirtualClock
+from app.config import load_config, validate_config
+from app.frames import register_source
+from app.history import History
+from app.state import State
+from app.tariff import Tariff
+from sim.meter import SimMeter, parse_windows, hdo_fixture
+
+
+class RecordingMqtt:
+    """Namiesto brokera si pamätá publikované hodnoty (s virtuálnym časom)."""
+
+    def __init__(self):
+        self.last = {}
+        self.count = 0
+
+    def pub(self, base_topic: str, key: str, value: str, retain: bool = False):
+        self.last[f"{base_topic}/{key}"] = value
+        self.count += 1
+
+    def loop(self, timeout: float = 0.1):
+        return
+
+
+class ReplayPulse:
+    def __init__(self):
+        self.counter = 0
+
+    def get_pulse_count(self, pulseUrl) -> int:
+        return self.counter
+
+
+class ReplayFrame:
+    """Zdroj snímkov pre jeden senzor; obraz nastavuje replay (súbor alebo render)."""
+
+    def __init__(self, sid: str, render=None):
+        self.key = f"replay:{sid}"
+        self.img = None
+        self._render = render
+
+    def read(self):
+        if self._render is not None:
+            return self._render(clock.now())
+        if self.img is None:
+            raise TimeoutError("no frame recorded yet")
+        return self.img
+
+    def close(self):
+        pass
+
+
+class CostlyOcr:
+    """
+    OCR modul, ktorý na virtuálnych hodinách trvá cost_s na každý spustený
+    variant – inak je OCR v replayi zadarmo a app.overload sa nikdy nespustí.
+    """
+
+    def __init__(self, mod, cost_s: float):
+        self._mod = mod
+        self.cost_s = cost_s
+
+    def __getattr__(self, name):
+        return getattr(self._mod, name)
+
+    def ocr_variants(self, *a, **kw):
+        res = self._mod.ocr_variants(*a, **kw)
+        clock.get_clock().advance(self.cost_s * len(res))
+        return res
+
+    def ocr_decode(self, *a, **kw):
+        res = self._mod.ocr_decode(*a, **kw)
+        clock.get_clock().advance(self.cost_s * res["variants_run"])
+        return res
+
+
+def dataset_inputs(path: str):
+    cfg = validate_config(load_config(os.path.join(path, "sensors.yaml")))
+    with open(os.path.join(path, "hdo.json")) as f:
+        hdo = json.load(f)["data"]
+
+    def events():
+        with open(os.path.join(path, "events.jsonl")) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    first = next(events(), None)
+    if first is None:
+        raise SystemExit("empty dataset")
+    feeds = {s["id"]: ReplayFrame(s["id"]) for s in cfg["sensors"]}
+    return cfg, hdo, events(), feeds, first["t"], None
+
+
+def synthetic_inputs(args):
+    windows = parse_windows(args.hdo)
+    start = time.time() - args.days * 86400 if args.start is None else args.start
+    clock.get_clock().set(start)
+    vclock = clock.get_clock()
+    meters = [SimMeter(10000 + 1000 * i + 0.5, 20000 + 1000 * i + 0.5, args.power_kw,
+                       args.imp_per_kwh, windows, clock=vclock.time) for i in range(args.sensors)]
+    sensors = [{
+        "id": f"sim_{i}",
+        "snapshot_url": f"replay://sim_{i}",
+        "mqtt_topic_base": f"sim/m{i}",
+        "roi_display": [200, 160, 400, 110],
+        "initial_t1": int(m.t1),
+        "initial_t2": int(m.t2),
+    } for i, m in enumerate(meters)]
+    cfg = {"global": {"poll_interval_s": 4, "ocr_idle_interval_s": 60, "conf_threshold": 0.6,
+                      "roi_upscale": 2, "max_step_kwh": 3, "imp_per_kwh": args.imp_per_kwh,
+                      "pulse_poll_s": 5, "pulse_url": "replay://pulse", "publish_interval": 10},
+           "sensors": sensors}
+    if args.config:
+        cfg["global"].update(validate_config(load_config(args.config))["global"])
+    feeds = {s["id"]: ReplayFrame(s["id"], render=m.render) for s, m in zip(sensors, meters)}
+    return cfg, hdo_fixture(windows)["data"], None, feeds, start, meters
+
+
+def run(cfg, hdo, events, feeds, t0, t_end, step_s, meters=None, out=None, snap_dir=".",
+        ocr_cost_s: float = 0.0):
+    import app.main as reader   # až po nastavení hodín (moduly si berú čas pri importe)
+
+    vclock = clock.get_clock()
+    work = tempfile.mkdtemp(prefix="vg-replay.")
+    st = State(os.path.join(work, "state.json"), autoflush=False)
+    mqtt = RecordingMqtt()
+    pulse = ReplayPulse()
+    tariff = Tariff(data=hdo)
+    poll = reader.poll_from(cfg)
+    reader.load_ocr()
+    if ocr_cost_s > 0:
+        reader.ocr = CostlyOcr(reader.ocr, ocr_cost_s)
+    reader.history = History(os.path.join(work, "history.db"))
+    for s in cfg["sensors"]:
+        register_source(s, feeds[s["id"]])
+
+    writer = csv.writer(out) if out else None
+    if writer:
+        writer.writerow(["t", "sid", "t1", "t2", "t1_pub", "t2_pub", "total_pub", "truth_t1", "truth_t2"])
+
+    truth = {}
+    pending = next(events, None) if events is not None else None
+    last_row = {}
+    errors = {s["id"]: {"max_t1": 0.0, "max_t2": 0.0} for s in cfg["sensors"]}
+    steps = 0
+    wall0 = time.perf_counter()
+
+    t = t0
+    while t <= t_end:
+        vclock.set(t)
+        # vstupy do času t
+        while pending is not None and pending["t"] <= t:
+            ev = pending
+            if ev["type"] == "pulse":
+                pulse.counter = int(ev["counter"])
+            elif ev["type"] == "snapshot":
+                feeds[ev["sid"]].img = cv2.imread(os.path.join(snap_dir, ev["file"]))
+            elif ev["type"] == "truth":
+                truth[ev["sid"]] = (float(ev["t1"]), float(ev["t2"]))
+            pending = next(events, None)
+        if meters:
+            for s, m in zip(cfg["sensors"], meters):
+                m.advance(t)
+                truth[s["id"]] = (m.t1, m.t2)
+            pulse.counter = meters[0].pulses
+
+        reader.process_all(mqtt, cfg, st, pulse, tariff, poll)
+        steps += 1
+
+        for s in cfg["sensors"]:
+            sid = s["id"]
+            row = (st.get(f"{sid}.t1"), st.get(f"{sid}.t2"),
+                   st.get(f"{sid}.t1_pub"), st.get(f"{sid}.t2_pub"), st.get(f"{sid}.total_pub"))
+            tt = truth.get(sid)
+            if tt and row[2] is not None:
+                errors[sid]["max_t1"] = max(errors[sid]["max_t1"], abs(float(row[2]) - tt[0]))
+                errors[sid]["max_t2"] = max(errors[sid]["max_t2"], abs(float(row[3]) - tt[1]))
+            if writer and row != last_row.get(sid):
+                writer.writerow([f"{t:.1f}", sid, *row, *(tt or ("", ""))])
+                last_row[sid] = row
+        t = max(t + step_s, vclock.time())    # dlhý cyklus (cena OCR) posunie ďalší krok
+
+    wall = time.perf_counter() - wall0
+    reader.history.flush()
+    summary = {"simulated_s": round(t_end - t0, 1), "wall_s": round(wall, 2), "work_dir": work,
+               "speedup": round((t_end - t0) / max(wall, 1e-9), 1), "steps": steps,
+               "mqtt_publishes": mqtt.count, "sensors": {},
+               "overload": dict(reader.overload.stats, level=reader.overload.name,
+                                cycle_s_max=round(reader.overload.cycle_s_max, 3))}
+    for s in cfg["sensors"]:
+        sid = s["id"]
+        tt = truth.get(sid)
+        t1p, t2p = st.get(f"{sid}.t1_pub"), st.get(f"{sid}.t2_pub")
+        final = None
+        if tt and t1p is not None:
+            final = {"t1": round(tt[0] - float(t1p), 4), "t2": round(tt[1] - float(t2p), 4)}
+        summary["sensors"][sid] = {"t1_pub": t1p, "t2_pub": t2p, "truth": tt,
+                                   "final_lag_kwh": final, "max_abs_err_kwh": errors[sid]}
+    return summary
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fast-forward replay of the reader on a virtual clock")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--dataset", help="adresár s nahratými dátami (sim.record)")
+    src.add_argument("--synthetic", action="store_true", help="syntetické elektromery (sim.meter)")
+    ap.add_argument("--days", type=float, default=1.0, help="dĺžka syntetického behu")
+    ap.add_argument("--start", type=float, help="začiatok (unix čas), default teraz - days")
+    ap.add_argument("--sensors", type=int, default=1)
+    ap.add_argument("--power-kw", type=float, default=1.5)
+    ap.add_argument("--imp-per-kwh", type=int, default=1000)
+    ap.add_argument("--hdo", default="00:00-06:00,13:00-15:00")
+    ap.add_argument("--config", help="prepíše global sekciu syntetického configu")
+    ap.add_argument("--step", type=float, default=1.0, help="krok virtuálneho času (s)")
+    ap.add_argument("--ocr-cost-s", type=float, default=0.25,
+                    help="virtuálny čas na jeden OCR variant (0 = OCR zadarmo)")
+    ap.add_argument("--out", help="CSV trajektória")
+    args = ap.parse_args()
+
+    clock.set_clock(VirtualClock(0.0))
+    if args.dataset:
+        cfg, hdo, events, feeds, t0, meters = dataset_inputs(args.dataset)
+        with open(os.path.join(args.dataset, "events.jsonl")) as f:
+            t_end = max(json.loads(l)["t"] for l in f if l.strip())
+    else:
+        cfg, hdo, events, feeds, t0, meters = synthetic_inputs(args)
+        t_end = t0 + args.days * 86400
+    clock.get_clock().set(t0)
+
+    out = open(args.out, "w", newline="") if args.out else None
+    try:
+        summary = run(cfg, hdo, events, feeds, t0, t_end, args.step, meters, out,
+                      snap_dir=args.dataset or ".", ocr_cost_s=args.ocr_cost_s)
+    finally:
+        if out:
+            out.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+# sim/run.py
+"""
+Záťažový driver: spustí simulované zariadenia + lokálny broker, vygeneruje
+config pre N senzorov, pustí proti nim app.main ako podproces a meria:
+
+  - latenciu end-to-end: kedy elektromer reálne dosiahol hodnotu
+    → kedy prišla na MQTT (t1/t2),
+  - CPU a RSS procesu readera.
+
+S --instances N beží N readerov so SHARD_ID=r0..r<N-1> (app.shard);
+--kill-after S jeden z nich po S sekundách zabije (SIGKILL) a meria,
+za ako dlho jeho senzory prevezmú ostatní. Publikované t1/t2 nesmú
+nikdy klesnúť (regressions).
+
+    python -m sim.run --sensors 4 --duration 120
+    python -m sim.run --sensors 6 --instances 3 --kill-after 20 --duration 60
+"""
+import argparse, json, os, signal, statistics, subprocess, sys, tempfile, threading, time
+
+import yaml
+import paho.mqtt.client as mqtt
+
+from sim.broker import Broker
+from sim.devices import Devices
+from sim.meter import SimMeter, parse_windows
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROI = (200, 160, 400, 110)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Run app.main against simulated devices")
+    p.add_argument("--sensors", type=int, default=1)
+    p.add_argument("--duration", type=float, default=60.0, help="dĺžka behu (s)")
+    p.add_argument("--power-kw", type=float, default=30.0,
+                   help="spotreba (vysoká, aby sa celé kWh menili rýchlo)")
+    p.add_argument("--imp-per-kwh", type=int, default=1000)
+    p.add_argument("--hdo", default="00:00-06:00,13:00-15:00", help="T2 okná HH:MM-HH:MM")
+    p.add_argument("--source", default="snapshot", choices=["snapshot", "mjpeg"])
+    p.add_argument("--poll", type=float, default=2.0, help="global.poll_interval_s")
+    p.add_argument("--instances", type=int, default=1, help="počet readerov (>1 = sharding)")
+    p.add_argument("--kill-after", type=float, help="po S sekundách zabi reader r0 (SIGKILL)")
+    p.add_argument("--json", action="store_true", help="výsledok ako JSON")
+    p.add_argument("--keep", action="store_true", help="nemaž pracovný adresár")
+    return p.parse_args()
+
+
+def write_config(path, args, base_url, meters):
+    sensors = []
+    for i, m in enumerate(meters):
+        s = {
+            "id": f"sim_{i}",
+            "snapshot_url": f"{base_url}/m/{i}/shot.jpg",
+            "mqtt_topic_base": f"sim/m{i}",
+            "roi_display": list(ROI),
+            "initial_t1": int(m.t1),
+            "initial_t2": int(m.t2),
+        }
+        if args.source == "mjpeg":
+            s["source"] = "mjpeg"
+            s["stream_url"] = f"{base_url}/m/{i}/stream.mjpg"
+        sensors.append(s)
+    cfg = {
+        "global": {
+            "poll_interval_s": args.poll,
+            "conf_threshold": 0.6,
+            "roi_upscale": 2,
+            "max_step_kwh": 3,
+            "imp_per_kwh": args.imp_per_kwh,
+            "pulse_poll_s": 1,
+            "pulse_url": f"{base_url}/pulse",
+            "publish_interval": 10,
+            "shard_heartbeat_s": 1,
+            "shard_lease_s": 4,
+        },
+        "sensors": sensors,
+    }
+    with open(path, "w") as f:
+        yaml.safe_dump(cfg, f, sort_keys=False)
+
+
+class ProcSampler:
+    """CPU (utime+stime) a RSS procesu z /proc každú sekundu."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.samples = []   # (čas, cpu_s, rss_mb)
+        self._stop = threading.Event()
+        self._tck = os.sysconf("SC_CLK_TCK")
+
+    def _sample(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / self._tck
+        rss = 0.0
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) / 1024.0
+        self.samples.append((time.time(), cpu, rss))
+
+    def _run(self):
+        while not self._stop.wait(1.0):
+            try:
+                self._sample()
+            except (FileNotFoundError, ProcessLookupError, IndexError):
+                return
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+class Observer:
+    """Odoberá sim/# a páruje publikované t1/t2 s časom, kedy ich elektromer dosiahol."""
+
+    def __init__(self, port: int, meters):
+        self.meters = meters
+        self.latency = {"t1": [], "t2": []}
+        self.messages = 0
+        self.first_t = None
+        self.status = {}          # posledný readiness status readera (sim/reader/status)
+        self.status_t = {}        # stav → kedy prišiel prvýkrát
+        self.last = {}            # téma t1/t2 → posledná hodnota
+        self.regressions = []     # (téma, predtým, teraz) – publikovaná hodnota klesla
+        self.owners = {}          # inštancia → senzory z jej heartbeatu (sim/reader/shard/members/<id>)
+        self.owners_t = 0.0       # kedy sa naposledy zmenilo priradenie
+        self.cli = mqtt.Client()
+        self.cli.on_message = self._on_message
+        self.cli.connect("127.0.0.1", port)
+        self.cli.subscribe("sim/#")
+        self.cli.loop_start()
+
+    def _on_message(self, client, userdata, msg):
+        now = time.time()
+        self.messages += 1
+        if msg.topic == "sim/reader/status":
+            try:
+                self.status = json.loads(msg.payload)
+                self.status_t.setdefault(self.status.get("state"), now)
+            except ValueError:
+                pass
+            return
+        if msg.topic.startswith("sim/reader/shard/members/"):
+            mid = msg.topic.rsplit("/", 1)[1]
+            try:
+                sensors = json.loads(msg.payload)["sensors"] if msg.payload else None
+            except (ValueError, KeyError):
+                return
+            if self.owners.get(mid) != sensors:
+                self.owners[mid] = sensors
+                self.owners_t = now
+            return
+        parts = msg.topic.split("/")   # sim/m<i>/<key>
+        if len(parts) != 3 or parts[2] not in ("t1", "t2"):
+            return
+        try:
+            value = float(msg.payload)
+            meter = self.meters[int(parts[1][1:])]
+        except (ValueError, IndexError):
+            return
+        prev = self.last.get(msg.topic)
+        if prev is not None and value < prev:
+            self.regressions.append((msg.topic, prev, value))
+        self.last[msg.topic] = max(value, prev or value)
+        if self.first_t is None:
+            self.first_t = now
+        reached = meter.reached_at(parts[2], value)
+        if reached is not None and reached <= now:
+            self.latency[parts[2]].append(now - reached)
+
+    def stop(self):
+        self.cli.loop_stop()
+        self.cli.disconnect()
+
+
+def pct(xs, p):
+    if not xs:
+        return None
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+def main():
+    args = parse_args()
+    work = tempfile.mkdtemp(prefix="vg-sim.")
+
+    broker = Broker(port=0).start()
+    hdo = parse_windows(args.hdo)
+    meters = [SimMeter(10000 + 1000 * i + 0.5, 20000 + 1000 * i + 0.5, args.power_kw,
+                       args.imp_per_kwh, hdo) for i in range(args.sensors)]
+    devices = Devices(meters, hdo).start()
+
+    cfg_path = os.path.join(work, "sensors.yaml")
+    write_config(cfg_path, args, devices.base_url, meters)
+
+    observer = Observer(broker.port, meters)
+
+    t_start = time.time()
+    procs, logs = [], []
+    for n in range(args.instances):
+        name = f"r{n}" if args.instances > 1 else ""
+        state = os.path.join(work, name, "state")
+        env = dict(os.environ)
+        env.update({
+            "PYTHONPATH": ROOT,
+            "CONFIG_PATH": cfg_path,
+            "STATE_PATH": os.path.join(state, "state.json"),
+            "LIVE_SOCKET": os.path.join(work, name, "live.sock"),
+            "PROFILE_SOCKET": os.path.join(state, "profile.sock"),
+            "MQTT_HOST": "127.0.0.1",
+            "MQTT_PORT": str(broker.port),
+            "EMA_URL": f"{devices.base_url}/config",
+            "CEZ_URL": f"{devices.base_url}/hdo/",
+            "HDO_CACHE": os.path.join(state, "hdo.json"),
+            "HISTORY_PATH": os.path.join(state, "history.db"),
+            "STATUS_TOPIC": "sim/reader",
+            "SHARD_ID": name,
+            "APP_DEBUG": "0",
+        })
+        os.makedirs(state, exist_ok=True)
+        logs.append(open(os.path.join(work, f"reader{'-' + name if name else ''}.log"), "w"))
+        procs.append(subprocess.Popen([sys.executable, "-m", "app.main"], cwd=ROOT, env=env,
+                                      stdout=logs[-1], stderr=subprocess.STDOUT))
+    proc = procs[0]
+    sampler = ProcSampler(proc.pid).start()
+    killed_t, victim, taken_t = None, [], None
+    try:
+        while time.time() - t_start < args.duration and all(p.poll() is None for p in procs[1:]):
+            if killed_t is None and args.kill_after and time.time() - t_start >= args.kill_after:
+                victim = list(observer.owners.get("r0") or [])
+                proc.kill()
+                killed_t = time.time()
+            elif killed_t is None and proc.poll() is not None:
+                break
+            if killed_t is not None and taken_t is None:
+                taken = set()
+                for m, v in list(observer.owners.items()):
+                    if m != "r0" and v:
+                        taken |= set(v)
+                if set(victim) <= taken:
+                    taken_t = observer.owners_t
+            time.sleep(0.5)
+        owners = dict(observer.owners)
+        status_end = observer.status.get("state")
+    finally:
+        sampler.stop()
+        for p in procs:
+            if p.poll() is None:
+                p.send_signal(signal.SIGTERM)
+        for p in procs:
+            try:
+                p.wait(10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        observer.stop()
+        devices.stop()
+        broker.stop()
+        for f in logs:
+            f.close()
+
+    s = sampler.samples
+    cpu_pct = None
+    if len(s) >= 2:
+        cpu_pct = 100.0 * (s[-1][1] - s[0][1]) / max(s[-1][0] - s[0][0], 1e-6)
+    lat_all = observer.latency["t1"] + observer.latency["t2"]
+    shard = None
+    if args.instances > 1:
+        shard = {"owners": owners, "killed_sensors": victim, "status_at_end": status_end,
+                 "reassigned_s": round(taken_t - killed_t, 2) if taken_t and killed_t else None,
+                 "regressions": observer.regressions[:10]}
+    report = {
+        "sensors": args.sensors,
+        "instances": args.instances,
+        "duration_s": round(time.time() - t_start, 1),
+        "reader_exit": proc.returncode,
+        "first_reading_s": round(observer.first_t - t_start, 2) if observer.first_t else None,
+        "first_status_s": {k: round(v - t_start, 2) for k, v in observer.status_t.items()},
+        "reader_timings": observer.status.get("timings"),
+        "mqtt_messages": observer.messages,
+        "readings": len(lat_all),
+        "latency_p50_s": pct(lat_all, 0.5),
+        "latency_p95_s": pct(lat_all, 0.95),
+        "latency_max_s": max(lat_all) if lat_all else None,
+        "latency_mean_s": statistics.mean(lat_all) if lat_all else None,
+        "cpu_pct": round(cpu_pct, 1) if cpu_pct is not None else None,
+        "rss_mb_peak": round(max(x[2] for x in s), 1) if s else None,
+        "device_requests": devices.requests,
+        "broker_msgs_in": broker.msgs_in,
+        "regressions": len(observer.regressions),
+        "shard": shard,
+        "workdir": work,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for k, v in report.items():
+            if isinstance(v, float):
+                v = f"{v:.3f}"
+            print(f"{k:>16}: {v}")
+    if not args.keep:
+        for root, dirs, files in os.walk(work, topdown=False):
+            for f in files:
+                if not (f.startswith("reader") and f.endswith(".log")):
+                    os.remove(os.path.join(root, f))
+
+
+if __name__ == "__main__":
+    main()
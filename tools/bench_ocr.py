@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Porovnanie OCR enginov (app.ocr_engine) na replay datasete (sim.record).
+
+Každý engine beží vo vlastnom procese (RSS sa nemieša) nad všetkými
+snímkami datasetu s výrezom ako v readeri (roi_quad / roi_display)
+a rovnakým ocr_decode bez prioru. Vypíše zhodu číslic s referenčným
+enginom (default paddle), latenciu na výrez a pamäť.
+
+    python tools/bench_ocr.py --dataset rec/ --engines paddle,onnx,cv2
+    OCR_REC_MODEL=models/rec.int8.onnx python tools/bench_ocr.py --dataset rec/ --engines paddle,onnx
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return 0.0
+
+
+def snapshots(dataset, limit=None):
+    n = 0
+    with open(os.path.join(dataset, "events.jsonl")) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            ev = json.loads(line)
+            if ev.get("type") != "snapshot":
+                continue
+            yield ev
+            n += 1
+            if limit and n >= limit:
+                return
+
+
+def worker(args):
+    """Beží v podprocese s OCR_ENGINE=<engine>; výsledky po riadkoch do args.out."""
+    import cv2
+    from app.config import load_config, validate_config
+    from app.rectify import rect_map
+    from app.utils import crop
+
+    cfg = validate_config(load_config(os.path.join(args.dataset, "sensors.yaml")))
+    sensors = {s["id"]: s for s in cfg["sensors"]}
+    upscale = int(cfg["global"].get("roi_upscale", 2))
+    rss0 = rss_mb()
+
+    t0 = time.perf_counter()
+    from app import ocr_paddle
+    ocr_paddle.get_reader()
+    load_s = time.perf_counter() - t0
+    rss_loaded = rss_mb()
+
+    with open(args.out, "w") as out:
+        for ev in snapshots(args.dataset, args.limit):
+            s = sensors.get(ev["sid"])
+            img = cv2.imread(os.path.join(args.dataset, ev["file"]))
+            if s is None or img is None:
+                continue
+            rmap = rect_map(s)
+            roi = rmap.apply(img) if rmap is not None else crop(img, s["roi_display"])
+            t = time.perf_counter()
+            res = ocr_paddle.ocr_decode(roi, upscale=upscale)
+            ms = (time.perf_counter() - t) * 1000.0
+            out.write(json.dumps({"file": ev["file"], "digits": res["digits"],
+                                  "conf": round(res["conf"], 3), "ms": round(ms, 2)}) + "\n")
+        out.write(json.dumps({"summary": True, "load_s": round(load_s, 2), "rss_base_mb": round(rss0, 1),
+                              "rss_loaded_mb": round(rss_loaded, 1), "rss_end_mb": round(rss_mb(), 1),
+                              "rss_peak_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)})
+                  + "\n")
+
+
+def run_engine(engine, args):
+    fd, path = tempfile.mkstemp(prefix=f"bench_ocr.{engine}.", suffix=".jsonl")
+    os.close(fd)
+    env = dict(os.environ, OCR_ENGINE=engine, PYTHONPATH=ROOT)
+    if args.threads:
+        env["OCR_CPU_THREADS"] = str(args.threads)
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--dataset", args.dataset, "--out", path]
+    if args.limit:
+        cmd += ["--limit", str(args.limit)]
+    r = subprocess.run(cmd, env=env)
+    if r.returncode != 0:
+        print(f"{engine}: worker failed (exit {r.returncode})")
+        return None
+    rows, summary = {}, {}
+    with open(path) as f:
+        for line in f:
+            d = json.loads(line)
+            if d.get("summary"):
+                summary = d
+            else:
+                rows[d["file"]] = d
+    os.unlink(path)
+    return rows, summary
+
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare OCR engines on a replay dataset")
+    ap.add_argument("--dataset", required=True)
+    ap.add_argument("--engines", default="paddle,onnx")
+    ap.add_argument("--reference", default="paddle", help="engine, voči ktorému sa meria zhoda")
+    ap.add_argument("--threads", type=int, help="OCR_CPU_THREADS pre všetky enginy")
+    ap.add_argument("--limit", type=int, help="max. počet snímok")
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--out", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        worker(args)
+        return 0
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    if args.reference not in engines:
+        engines.insert(0, args.reference)
+    results = {e: run_engine(e, args) for e in engines}
+    ref = results.get(args.reference)
+
+    ok = True
+    for e in engines:
+        if results[e] is None:
+            ok = False
+            continue
+        rows, sm = results[e]
+        ms = [r["ms"] for r in rows.values()]
+        line = (f"{e:>7}: n={len(rows)} load={sm.get('load_s')}s "
+                f"rss={sm.get('rss_loaded_mb')}MB (base {sm.get('rss_base_mb')}, peak {sm.get('rss_peak_mb')})")
+        if ms:
+            line += f" ocr mean={statistics.mean(ms):.1f}ms p50={pct(ms, .5):.1f}ms p95={pct(ms, .95):.1f}ms"
+        if ref is not None and e != args.reference:
+            common = [f for f in rows if f in ref[0]]
+            same = sum(rows[f]["digits"] == ref[0][f]["digits"] for f in common)
+            pos = sum(len(ref[0][f]["digits"]) for f in common) or 1
+            pos_same = sum(a == b for f in common for a, b in zip(rows[f]["digits"], ref[0][f]["digits"]))
+            line += (f" | vs {args.reference}: {same}/{len(common)} identical"
+                     f" ({100.0 * same / max(1, len(common)):.1f}%), digits {100.0 * pos_same / pos:.1f}%")
+            for f in [f for f in common if rows[f]["digits"] != ref[0][f]["digits"]][:5]:
+                line += f"\n         {f}: {ref[0][f]['digits'] or '∅'} → {rows[f]['digits'] or '∅'}"
+        print(line)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark zdieľaného state.json pod súbežnými zapisovateľmi.
+
+Simuluje reader (odložené zápisy + flush raz za cyklus) a niekoľko
+"roi_web" procesov (priame merge zápisy a CAS s retry). Na konci overí,
+že sa nestratil žiadny zápis a vypíše priepustnosť a latenciu.
+
+Konflikt na rovnakom kľúči: reader drží "shared.t1" v pamäti (ako
+SensorRecord) a každý cyklus ho zvýši a zapíše; korekčný proces doň
+zapisuje ručné korekcie. Reader musí každú korekciu prevziať (refresh
+alebo flush → listener), inak ju ďalší cyklus prepíše starou hodnotou.
+
+    python tools/bench_state.py --writers 4 --ops 500
+"""
+import argparse
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.state import State  # noqa: E402
+
+
+CORRECTION = 1_000_000
+
+
+def reader_proc(path, cycles, keys, out, corrected):
+    st = State(path, autoflush=False)
+    shared = [int(st.get("shared.t1", 0))]
+
+    def on_state(changes):
+        if "shared.t1" in changes:
+            shared[0] = int(changes["shared.t1"])   # ručná korekcia (SensorRecord.set_external)
+    st.subscribe(on_state)
+
+    lat = []
+    i = 0
+    # beží aspoň `cycles` cyklov a ešte jeden po poslednej korekcii
+    while True:
+        last = i >= cycles and corrected.is_set()
+        st.refresh()
+        for k in range(keys):
+            st[f"sensor{k}.t1"] = i
+        shared[0] += 1
+        st["shared.t1"] = shared[0]
+        t0 = time.perf_counter()
+        st.flush()
+        lat.append(time.perf_counter() - t0)
+        i += 1
+        if last:
+            break
+    out.put(("reader", lat, shared[0]))
+
+
+def correction_proc(path, ops, out, corrected):
+    # ručné korekcie rovnakého kľúča, ktorý reader zapisuje každý cyklus
+    st = State(path)
+    lat, overwritten = [], 0
+    for i in range(ops):
+        # reader pokračuje od predchádzajúcej korekcie – nikdy pod ňu
+        st.refresh()
+        if int(st.get("shared.t1", 0)) < CORRECTION * i:
+            overwritten += 1
+        t0 = time.perf_counter()
+        st["shared.t1"] = CORRECTION * (i + 1)
+        lat.append(time.perf_counter() - t0)
+        time.sleep(0.001)
+    corrected.set()
+    out.put(("correction", lat, overwritten))
+
+
+def writer_proc(path, wid, ops, out):
+    st = State(path)
+    lat = []
+    for i in range(ops):
+        t0 = time.perf_counter()
+        st[f"manual{wid}.t1"] = i
+        lat.append(time.perf_counter() - t0)
+    out.put((f"writer{wid}", lat))
+
+
+def cas_proc(path, ops, out):
+    # zdieľaný počítadlo cez CAS – každý inkrement musí prežiť
+    st = State(path)
+    lat, retries = [], 0
+    for _ in range(ops):
+        t0 = time.perf_counter()
+        while True:
+            st.refresh()
+            cur = int(st.get("counter", 0))
+            ok, _ = st.compare_and_update({"counter": cur + 1}, st.version)
+            if ok:
+                break
+            retries += 1
+        lat.append(time.perf_counter() - t0)
+    out.put(("cas", lat, retries))
+
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] * 1000.0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--cas", type=int, default=2, help="počet CAS procesov")
+    ap.add_argument("--ops", type=int, default=300)
+    ap.add_argument("--keys", type=int, default=20, help="kľúče readera za cyklus")
+    args = ap.parse_args()
+
+    d = tempfile.mkdtemp(prefix="bench_state.")
+    path = os.path.join(d, "state.json")
+    State(path)
+
+    out = mp.Queue()
+    corrected = mp.Event()
+    procs = [mp.Process(target=reader_proc, args=(path, args.ops, args.keys, out, corrected))]
+    procs += [mp.Process(target=writer_proc, args=(path, w, args.ops, out)) for w in range(args.writers)]
+    procs += [mp.Process(target=cas_proc, args=(path, args.ops, out)) for _ in range(args.cas)]
+    procs.append(mp.Process(target=correction_proc, args=(path, args.ops, out, corrected)))
+
+    t0 = time.perf_counter()
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    wall = time.perf_counter() - t0
+
+    total_ops = 0
+    for r in results:
+        name, lat = r[0], r[1]
+        total_ops += len(lat)
+        extra = f" retries={r[2]}" if r[0] == "cas" else ""
+        extra = f" overwritten={r[2]}" if r[0] == "correction" else extra
+        print(f"{name:>9}: n={len(lat)} mean={statistics.mean(lat)*1000:.2f}ms "
+              f"p50={pct(lat, .5):.2f}ms p99={pct(lat, .99):.2f}ms{extra}")
+    print(f"total: {total_ops} writes in {wall:.2f}s → {total_ops / wall:.0f} writes/s")
+
+    final = State(path).snapshot()
+    lost = [w for w in range(args.writers) if final.get(f"manual{w}.t1") != args.ops - 1]
+    counter_ok = final.get("counter") == args.ops * args.cas
+    print(f"lost manual writes: {lost or 'none'}; CAS counter {final.get('counter')} "
+          f"(expected {args.ops * args.cas}) {'OK' if counter_ok else 'MISMATCH'}")
+    # posledná korekcia nesmie byť prepísaná nižšou hodnotou z pamäte readera
+    shared = final.get("shared.t1", 0)
+    reader_mem = next(r[2] for r in results if r[0] == "reader")
+    overwritten = next(r[2] for r in results if r[0] == "correction")
+    shared_ok = (not overwritten and shared >= CORRECTION * args.ops
+                 and reader_mem >= CORRECTION * args.ops)
+    print(f"same-key corrections: {overwritten} overwritten by reader; file {shared}, "
+          f"reader memory {reader_mem} (>= {CORRECTION * args.ops} expected) "
+          f"{'OK' if shared_ok else 'LOST'}")
+    sys.exit(0 if not lost and counter_ok and shared_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
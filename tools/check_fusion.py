@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kontrola hlasovania app.fusion.DigitVoter na umelých čítaniach.
+
+Fúzovaná konfidencia musí ostať konfidenciou rekognizéra: jednomyseľné,
+ale neisté čítania nesmú prejsť prahom conf_threshold v main.py.
+
+    python tools/check_fusion.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.fusion import DigitVoter  # noqa: E402
+
+CONF_THRESHOLD = 0.6     # default global.conf_threshold
+
+
+def reads(digits, conf, pad=0):
+    return [("0", 0.0)] * pad + [(ch, conf) for ch in digits]
+
+
+def case(name, frames, expect_digits, accept, voter=None):
+    voter = voter or DigitVoter(frames=5)
+    for chars in frames:
+        voter.push("s", "t1", chars)
+    res = voter.vote("s", "t1")
+    digits, conf = res if res else (None, 0.0)
+    ok = digits == expect_digits and (conf >= CONF_THRESHOLD) == accept
+    print(f"{'OK ' if ok else 'BAD'} {name}: digits={digits} conf={conf:.2f} "
+          f"({'accepted' if conf >= CONF_THRESHOLD else 'rejected'})")
+    return ok
+
+
+def main():
+    results = [
+        case("unanimous, confident", [reads("1234567", 0.9)] * 5, "1234567", True),
+        case("unanimous, low confidence", [reads("1234567", 0.3)] * 5, "1234567", False),
+        case("padded zeros don't dilute conf", [reads("34567", 0.9, pad=2)] * 5, "0034567", True),
+        case("split vote", [reads("1234567", 0.9)] * 2 + [reads("1234568", 0.9)] * 2, None, False,
+             DigitVoter(frames=4)),
+        case("majority, mixed", [reads("1234567", 0.9)] * 4 + [reads("1234568", 0.9)], "1234567", True),
+    ]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kontrola celočíselnej aritmetiky registrov v app.records.SensorRecord.
+
+Pulzy t1_p/t2_p sú pravda o registri: load (aj po zmene imp_per_kwh
+medzi behmi), anchor, add_pulses, rescale a merge musia zachovať kWh.
+
+    python tools/check_records.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.records import Records, SensorRecord  # noqa: E402
+from app.state import State  # noqa: E402
+
+S = {"id": "m", "mqtt_topic_base": "x/m"}
+
+
+def check(name, got, want):
+    ok = got == want
+    print(f"{'OK ' if ok else 'BAD'} {name}: {got!r}" + ("" if ok else f" (expected {want!r})"))
+    return ok
+
+
+def saved(path, imp, t1_ocr, t1_p):
+    """Záznam uložený readerom s daným imp_per_kwh."""
+    st = State(path)
+    recs = Records(st, imp)
+    rec = recs.of(S)
+    rec.t1_ocr, rec.t1_p = t1_ocr, t1_p
+    rec.settle()
+    recs.sync()
+    st.flush()
+
+
+def restarted(path, imp):
+    rec = Records(State(path), imp).of(S)
+    rec.settle()
+    return rec
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    results = []
+
+    # reštart 1000 → 500 imp/kWh: 12 kWh na displeji, 12.5 kWh v pulzoch
+    path = os.path.join(tmp, "a.json")
+    saved(path, 1000, 12, 12500)
+    rec = restarted(path, 500)
+    results += [check("1000→500 t1", rec.t1, 12.5),
+                check("1000→500 pending", rec.pending("t1"), 0)]
+    rec.add_pulses("t1", 100)
+    rec.settle()
+    results += [check("1000→500 +100 pulses t1", rec.t1, 12.7),
+                check("1000→500 lost", rec.lost, 0)]
+
+    # reštart 500 → 1000: počítadlo sa nesmie prepadnúť pod kotvu
+    path = os.path.join(tmp, "b.json")
+    saved(path, 500, 12, 6250)
+    rec = restarted(path, 1000)
+    results.append(check("500→1000 t1", rec.t1, 12.5))
+    rec.anchor("t1", 12)
+    rec.settle()
+    results.append(check("500→1000 anchor keeps t1", rec.t1, 12.5))
+
+    # starší state bez <sid>.imp: pulzy v aktuálnych jednotkách, imp sa doplní
+    path = os.path.join(tmp, "c.json")
+    st = State(path)
+    st.update(**{"m.t1_ocr": 12, "m.t1_p": 12500})
+    st.flush()
+    st = State(path)
+    recs = Records(st, 1000)
+    rec = recs.of(S)
+    rec.settle()
+    recs.sync()
+    st.flush()
+    results += [check("legacy t1", rec.t1, 12.5),
+                check("legacy imp persisted", State(path).get("m.imp"), 1000)]
+
+    # čakanie na OCR: najviac 1 kWh, zvyšok do lost; anchor prenesie čakajúce
+    rec = SensorRecord("m", 1000)
+    rec.t1_ocr, rec.t1_p, rec.t2_ocr, rec.t2_p = 12, 12500, 0, 0
+    rec.add_pulses("t1", 1000)
+    rec.settle()
+    results += [check("cap t1", rec.t1, 12.999),
+                check("pending", rec.pending("t1"), 501)]
+    rec.add_pulses("t1", 700)
+    results += [check("limit", rec.t1_p, 13999), check("lost", rec.lost, 201)]
+    rec.anchor("t1", 13)
+    rec.settle()
+    results.append(check("anchor carries pending", rec.t1, 13.999))
+
+    # zmena imp počas behu
+    rec = SensorRecord("m", 1000)
+    rec.t1_ocr, rec.t1_p, rec.t2_ocr, rec.t2_p = 12, 12500, 0, 0
+    rec.rescale(500)
+    rec.settle()
+    results += [check("rescale t1_p", rec.t1_p, 6250), check("rescale t1", rec.t1, 12.5),
+                check("rescale persists imp", rec.changes().get("m.imp"), 500)]
+
+    # handoff snapshot z inštancie s iným imp
+    rec = SensorRecord("m", 500)
+    rec.t1_ocr, rec.t1_p, rec.t2_ocr, rec.t2_p = 12, 6000, 0, 0
+    rec.merge({"t1_ocr": 12, "t1_p": 12500, "imp": 1000})
+    results += [check("merge t1", rec.t1, 12.5), check("merge keeps imp", rec.imp, 500)]
+
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
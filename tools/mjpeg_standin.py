@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lokálna náhrada kamery pre testovanie zdrojov snímkov (app/frames.py).
+
+    python tools/mjpeg_standin.py --port 8081 [--images dir/] [--fps 5]
+
+  /stream.mjpg  – multipart/x-mixed-replace MJPEG stream
+  /shot.jpg     – jeden snímok (ako snapshot_url)
+
+Bez --images generuje snímky s počítadlom, takže je vidno, že sa obraz mení.
+"""
+import argparse
+import glob
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import cv2
+import numpy as np
+
+BOUNDARY = "frame"
+
+
+class FrameFeed:
+    def __init__(self, images_dir=None, size=(640, 360)):
+        self.files = sorted(glob.glob(os.path.join(images_dir, "*.jpg"))) if images_dir else []
+        self.size = size
+        self.n = 0
+        self._lock = threading.Lock()
+
+    def next_jpeg(self) -> bytes:
+        with self._lock:
+            self.n += 1
+            n = self.n
+        if self.files:
+            with open(self.files[n % len(self.files)], "rb") as f:
+                return f.read()
+        w, h = self.size
+        img = np.full((h, w, 3), 30, np.uint8)
+        cv2.putText(img, f"{n:07d}", (40, h // 2), cv2.FONT_HERSHEY_SIMPLEX, 2.5, (80, 255, 80), 6)
+        ok, buf = cv2.imencode(".jpg", img)
+        return buf.tobytes()
+
+
+def make_handler(feed: FrameFeed, fps: float):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.startswith("/shot.jpg"):
+                body = feed.next_jpeg()
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if self.path.startswith("/stream.mjpg"):
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.end_headers()
+                try:
+                    while True:
+                        body = feed.next_jpeg()
+                        self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                         f"Content-Length: {len(body)}\r\n\r\n".encode())
+                        self.wfile.write(body + b"\r\n")
+                        time.sleep(1.0 / fps)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+            self.send_error(404)
+
+    return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--images", help="adresár s *.jpg (inak syntetické snímky)")
+    ap.add_argument("--fps", type=float, default=5.0)
+    args = ap.parse_args()
+    srv = ThreadingHTTPServer((args.host, args.port), make_handler(FrameFeed(args.images), args.fps))
+    print(f"MJPEG stand-in on http://{args.host}:{args.port}/stream.mjpg")
+    srv.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
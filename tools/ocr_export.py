@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Export PP-OCR rekognizéra do ONNX pre OCR_ENGINE=onnx / cv2.
+
+Z inference modelu, ktorý si stiahol PaddleOCR (~/.paddleocr), vyrobí
+rec.onnx (paddle2onnx), voliteľne rec.int8.onnx (dynamická int8
+kvantizácia ONNX Runtime) a skopíruje slovník znakov.
+
+    pip install paddle2onnx onnxruntime
+    python tools/ocr_export.py --out models/ --int8
+
+Potom v docker-compose: OCR_ENGINE=onnx, OCR_REC_MODEL=/app/models/rec.int8.onnx
+(a ./models:/app/models ako volume).
+"""
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+
+DEFAULT_MODEL_DIR = os.path.expanduser("~/.paddleocr/whl/rec/en")
+
+
+def find_model_dir(root):
+    for pd in sorted(glob.glob(os.path.join(root, "**", "inference.pdmodel"), recursive=True)):
+        return os.path.dirname(pd)
+    raise SystemExit(f"no inference.pdmodel under {root} (run the paddle engine once to download it)")
+
+
+def find_dict():
+    import paddleocr
+    path = os.path.join(os.path.dirname(paddleocr.__file__), "ppocr", "utils", "en_dict.txt")
+    if not os.path.exists(path):
+        raise SystemExit(f"dictionary not found: {path} (use --dict)")
+    return path
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Export the PaddleOCR recognizer to ONNX")
+    ap.add_argument("--model-dir", default=DEFAULT_MODEL_DIR, help="adresár s inference.pdmodel")
+    ap.add_argument("--dict", help="slovník znakov (default en_dict.txt z paddleocr)")
+    ap.add_argument("--out", default="models")
+    ap.add_argument("--opset", type=int, default=11)
+    ap.add_argument("--int8", action="store_true", help="aj int8 kvantizovaný model")
+    args = ap.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    src = find_model_dir(args.model_dir)
+    onnx_path = os.path.join(args.out, "rec.onnx")
+    subprocess.run([
+        "paddle2onnx", "--model_dir", src,
+        "--model_filename", "inference.pdmodel", "--params_filename", "inference.pdiparams",
+        "--save_file", onnx_path, "--opset_version", str(args.opset), "--enable_onnx_checker", "True",
+    ], check=True)
+    print(f"exported {src} → {onnx_path}")
+
+    dict_path = os.path.join(args.out, "rec_dict.txt")
+    shutil.copy(args.dict or find_dict(), dict_path)
+    print(f"dictionary → {dict_path}")
+
+    if args.int8:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        q_path = os.path.join(args.out, "rec.int8.onnx")
+        quantize_dynamic(onnx_path, q_path, weight_type=QuantType.QInt8)
+        mb = lambda p: os.path.getsize(p) / 1e6
+        print(f"int8 → {q_path} ({mb(onnx_path):.1f} MB → {mb(q_path):.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())